@@ -1,153 +1,596 @@
 # agents/classifier_agent.py
 from .base_agent import BaseAgent
-import spacy
-import re
+from memory.result_cache import PIPELINE_VERSION
+from utils.metrics import attach_timings, collect_timings, timed
+from utils.pattern_matcher import PatternMatcher
+from utils.text_chunks import iter_chunks
+from collections import Counter
+from functools import cached_property
+from importlib import metadata as importlib_metadata
+import os
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+MODEL_NAME = "en_core_web_sm"
+
+# spaCy pipelines are loaded once per process and shared by every agent.
+# Loading before workers fork (e.g. gunicorn --preload) lets them share the
+# model's pages copy-on-write instead of each paying the load cost.
+_models = {}
+_models_lock = threading.Lock()
+
+
+def load_model(name: str = MODEL_NAME):
+    if name not in _models:
+        with _models_lock:
+            if name not in _models:
+                import spacy
+
+                start = time.perf_counter()
+                _models[name] = spacy.load(name)
+                logger.info("Loaded spaCy model %s in %.2fs", name, time.perf_counter() - start)
+    return _models[name]
+
+
+def model_loaded(name: str = MODEL_NAME) -> bool:
+    return name in _models
+
+EMAIL_SIGNATURE_PATTERNS = {
+    "signature": [
+        r"^dear\s+\w+",
+        r"regards,\s*$",
+        r"sent\s+from\s+my\s+\w+",
+    ]
+}
+SIGNATURE_MATCHER = PatternMatcher({"email_signature": EMAIL_SIGNATURE_PATTERNS})
+
 
 class ClassifierAgent(BaseAgent):
-    def __init__(self, shared_memory):
+    # Pipeline components key-phrase extraction reads from (noun chunks need
+    # tagger/parser, entities need ner); everything else is switched off.
+    PHRASE_PIPES = {"tok2vec", "tagger", "attribute_ruler", "parser", "ner"}
+    PHRASE_ENTITY_LABELS = {"ORG", "PRODUCT", "EVENT", "LAW"}
+    JSON_FILE_TYPES = {"json", "ndjson", "jsonl"}
+    # PDFs are classified from their first pages; the rest is only decoded
+    # when the preview is inconclusive or the email agent needs the full text.
+    PDF_PREVIEW_PAGES = int(os.getenv("PDF_PREVIEW_PAGES", "3"))
+    PDF_PREVIEW_CHARS = int(os.getenv("PDF_PREVIEW_CHARS", "20000"))
+    # The intent model replaced a learn/study/course keyword fallback; other
+    # intents need a pattern hit, the model is too eager on unseen prose.
+    MODEL_INTENTS = ("syllabus",)
+    # Longer texts are parsed in chunks of this size (cut at page or
+    # paragraph breaks), so spaCy's memory use stays bounded by the chunk.
+    NLP_CHUNK_CHARS = int(os.getenv("NLP_CHUNK_CHARS", "50000"))
+    NLP_CHUNK_PROCESSES = int(os.getenv("NLP_CHUNK_PROCESSES", "1"))
+    # Chunked parsing stops once this many occurrences make every kept
+    # phrase a safe pick.
+    PHRASE_CONFIDENT_COUNT = 3
+
+    def __init__(self, shared_memory, result_cache=None, template_index=None, search_index=None):
         super().__init__(shared_memory)
+        self.result_cache = result_cache
+        self.template_index = template_index
+        self.search_index = search_index
 
         from .email_agent import EmailAgent
-        from .json_agent import JSONAgent
-        from .pdf_agent import PDFAgent
-
-        self.email_agent = EmailAgent(shared_memory)
-        self.json_agent = JSONAgent(shared_memory)
-        self.pdf_agent = PDFAgent(shared_memory)
-
-        self.nlp = spacy.load("en_core_web_sm")
 
         self.intent_patterns = {
             "invoice":    [r"\binvoice\b",  r"\bpayment\b",        r"due\s+date"],
-            "rfq":        [r"\brfq\b",      r"request\s+for\s+quote", r"\bquotation\b"],
-            "complaint":  [r"\bcomplaint\b", r"\bdissatisfied\b",  r"\bissue\b"],
+            "rfq":        [r"\brfq\b",      r"request(?:ing)?\s+(?:for\s+)?a?\s*quote", r"\bquotation\b"],
+            "complaint":  [r"\bcomplain(?:t|ing)?\b", r"\bdissatisfied\b", r"\bissue\b"],
             "regulation": [r"\bregulation\b", r"\bcompliance\b",  r"\bstandard\b"],
             "syllabus":   [r"\bsyllabus\b", r"\bcurriculum\b",    r"course\s+outline"],
         }
 
-    @staticmethod
-    def is_email_content(text: str) -> bool:
-        email_patterns = [
-            r"^dear\s+\w+",
-            r"regards,\s*$",
-            r"sent\s+from\s+my\s+\w+",
-        ]
-        return any(
-            re.search(pat, text, re.IGNORECASE | re.MULTILINE)
-            for pat in email_patterns
+        # One alternation covering intents, email signatures and the email
+        # agent's urgency keywords, so each document is scanned exactly once.
+        self.matcher = PatternMatcher(
+            patterns={
+                "intent": self.intent_patterns,
+                "email_signature": EMAIL_SIGNATURE_PATTERNS,
+            },
+            keywords={"urgency": {"high": EmailAgent.URGENT_KEYWORDS}},
         )
 
-    def detect_intent(self, text: str) -> str:
-        lowered = text.lower()
-        for intent, patterns in self.intent_patterns.items():
-            if any(re.search(pat, lowered) for pat in patterns):
-                return intent
+    # spaCy and the sub-agents are built on first use, so a worker that only
+    # ever sees JSON never loads the model.
+    @property
+    def nlp(self):
+        return load_model()
 
-        doc = self.nlp(lowered)
-        if any(tok.text in {"learn", "study", "course"} for tok in doc):
-            return "syllabus"
+    @cached_property
+    def phrase_disabled(self):
+        return [name for name in self.nlp.pipe_names if name not in self.PHRASE_PIPES]
 
-        return "unknown"
+    @cached_property
+    def intent_model(self):
+        from utils.intent_model import load_model as load_intent_model
 
-    def extract_key_phrases(self, text: str, limit: int = 5) -> list:
-        doc = self.nlp(text)
-        phrases = set()
+        return load_intent_model()
 
-        phrases.update(
-            chunk.text.strip()
-            for chunk in doc.noun_chunks
-            if len(chunk.text.split()) > 1
-        )
+    @cached_property
+    def email_agent(self):
+        from .email_agent import EmailAgent
 
-        phrases.update(
-            ent.text.strip()
-            for ent in doc.ents
-            if ent.label_ in {"ORG", "PRODUCT", "EVENT", "LAW"}
-        )
+        return EmailAgent(self.shared_memory)
 
-        return list(phrases)[:limit]
+    @cached_property
+    def json_agent(self):
+        from .json_agent import JSONAgent
 
-    def process(self, content, file_type: str, doc_id: str, metadata=None):
-        metadata = metadata or {}
+        return JSONAgent(self.shared_memory)
+
+    @cached_property
+    def pdf_agent(self):
+        from .pdf_agent import PDFAgent
+
+        return PDFAgent(self.shared_memory)
+
+    @cached_property
+    def pipeline_version(self) -> str:
+        try:
+            model_version = importlib_metadata.version(MODEL_NAME)
+        except importlib_metadata.PackageNotFoundError:
+            model_version = "unknown"
+        intent_model = self.intent_model.digest if self.intent_model is not None else "none"
+        return f"{PIPELINE_VERSION}:{MODEL_NAME}-{model_version}:intent-{intent_model}"
+
+    @property
+    def is_ready(self) -> bool:
+        return model_loaded()
+
+    def warm_up(self) -> dict:
+        """Load the model, parsers and sub-agents now; returns seconds per step."""
+        timings = {}
+
+        start = time.perf_counter()
+        self.phrase_disabled
+        timings["model"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.intent_model
+        timings["intent_model"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        import utils.email_parser  # noqa: F401
+        import utils.pdf_parser  # noqa: F401
+        timings["parsers"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.email_agent, self.json_agent, self.pdf_agent
+        timings["agents"] = time.perf_counter() - start
+
+        return timings
+
+    def scan(self, text: str):
+        with timed("scan"):
+            return self.matcher.scan(text)
+
+    @staticmethod
+    def is_email_content(text: str, matches=None) -> bool:
+        if matches is None:
+            matches = SIGNATURE_MATCHER.scan(text)
+        return matches.count("email_signature") > 0
+
+    def analyze(self, text: str):
+        """Parse ``text`` once and return the spaCy Doc key-phrase extraction reads."""
+        with timed("nlp"):
+            return self.nlp(text, disable=self.phrase_disabled)
+
+    def is_long_text(self, text: str) -> bool:
+        return len(text) > self.NLP_CHUNK_CHARS
+
+    def iter_docs(self, text: str):
+        """spaCy Docs covering ``text``: one for normal texts, one per chunk for long ones.
+
+        Chunks are parsed lazily through ``nlp.pipe`` (``NLP_CHUNK_PROCESSES``
+        processes), so a consumer that stops early skips the rest.
+        """
+        if not self.is_long_text(text):
+            yield self.analyze(text)
+            return
+        docs = self.nlp.pipe(iter_chunks(text, self.NLP_CHUNK_CHARS), batch_size=1, n_process=self.NLP_CHUNK_PROCESSES,
+                             disable=self.phrase_disabled)
+        try:
+            while True:
+                with timed("nlp"):
+                    doc = next(docs, None)
+                if doc is None:
+                    return
+                yield doc
+        finally:
+            close = getattr(docs, "close", None)
+            if close is not None:
+                close()
+
+    def detect_intent(self, text: str, matches=None) -> str:
+        """Highest-scoring intent by pattern hits; ties keep ``intent_patterns`` order."""
+        return self.detect_intents([text], [matches])[0]
+
+    def detect_intents(self, texts, matches=None) -> list:
+        """``detect_intent`` for many texts at once.
+
+        Texts without a pattern hit are scored together by the hashed TF-IDF
+        intent model (one matrix multiply, no spaCy); below its threshold,
+        outside ``MODEL_INTENTS``, or without the model artifact, they are
+        "unknown".
+        """
+        matches = matches or [None] * len(texts)
+        intents = []
+        for text, text_matches in zip(texts, matches):
+            if text_matches is None:
+                text_matches = self.scan(text)
+            intents.append(text_matches.best("intent", self.intent_patterns))
+
+        undecided = [index for index, intent in enumerate(intents) if intent is None]
+        if undecided and self.intent_model is not None:
+            with timed("intent_model"):
+                predicted = self.intent_model.predict(
+                    [texts[index] for index in undecided], labels=self.MODEL_INTENTS
+                )
+            for index, intent in zip(undecided, predicted):
+                intents[index] = intent
+        return [intent or "unknown" for intent in intents]
+
+    def extract_key_phrases(self, text: str, limit: int = 5, doc=None) -> list:
+        """Most frequent multi-word noun chunks and named entities, ties in order of appearance."""
+        docs = [doc] if doc is not None else self.iter_docs(text)
+        counts = Counter()
+        for doc in docs:
+            counts.update(
+                chunk.text.strip()
+                for chunk in doc.noun_chunks
+                if len(chunk.text.split()) > 1
+            )
+            counts.update(
+                ent.text.strip()
+                for ent in doc.ents
+                if ent.label_ in self.PHRASE_ENTITY_LABELS
+            )
+            ranked = counts.most_common(limit)
+            if len(ranked) == limit and ranked[-1][1] >= self.PHRASE_CONFIDENT_COUNT:
+                break
+
+        return [phrase for phrase, _ in counts.most_common(limit)]
+
+    def classify_text(self, text: str, doc=None, matches=None, intent=None) -> dict:
+        """Single analysis stage: patterns (or the intent model) give the intent, spaCy the key phrases.
+
+        ``intent`` skips detection when the caller already has it, e.g. from
+        ``detect_intents`` over a batch. Long texts are parsed chunk by chunk.
+        """
+        if intent is None:
+            with timed("intent"):
+                intent = self.detect_intent(text, matches=matches)
+        if doc is None and not self.is_long_text(text):
+            doc = self.analyze(text)
+        with timed("key_phrases"):
+            key_phrases = self.extract_key_phrases(text, doc=doc)
+        return {"intent": intent, "key_phrases": key_phrases}
+
+    def match_template(self, text: str):
+        """Look ``text`` up in the template index; None when the index is disabled."""
+        if self.template_index is None:
+            return None
+        with timed("template"):
+            return self.template_index.lookup(text)
+
+    def reusable_template(self, lookup, matches):
+        """The matched template, unless the document's own patterns point to another intent."""
+        if lookup is None or lookup.template is None:
+            return None
+        intent = matches.best("intent", self.intent_patterns)
+        if intent is not None and intent != lookup.template.intent:
+            return None
+        return lookup.template
+
+    def extract_text(self, content, file_type: str, metadata: dict) -> str:
+        """Turn raw PDF/EML/TXT content into text; email headers go into ``metadata``.
+
+        ``content`` may be bytes, str, a binary file handle or a path; the
+        parsers read from it directly.
+        """
+        with timed("extract"):
+            if file_type == "pdf":
+                from utils.pdf_parser import PAGE_SEPARATOR, extract_pages
+
+                pages, failed_pages = extract_pages(content)
+                if failed_pages:
+                    metadata["failed_pages"] = failed_pages
+                return PAGE_SEPARATOR.join(pages)
+
+            if file_type == "eml":
+                from utils.email_parser import parse_email
+
+                email_data = parse_email(content)
+                metadata |= email_data
+                return email_data["body"]
+
+            if file_type == "txt":
+                from utils.file_utils import read_text
+
+                return read_text(content)
+
+        raise ValueError(f"Unsupported file_type '{file_type}'")
+
+    def process_text(self, text: str, file_type: str, doc_id: str, metadata: dict, doc=None,
+                     matches=None, page_count=None, template=None, intent=None, search_text=None):
+        """Classify extracted text and hand it to the email or PDF agent.
+
+        A document matching a known template takes the template's intent and
+        key phrases instead of running spaCy; ``template`` is a lookup done by
+        the caller, otherwise the index is consulted here. The text (or
+        ``search_text`` when the caller extracted more than it classifies)
+        is queued for the full-text search index.
+        """
+        if matches is None:
+            matches = self.scan(text)
+        if template is None:
+            template = self.match_template(text)
+        matched = self.reusable_template(template, matches)
+        if matched is not None:
+            analysis = {"intent": matched.intent, "key_phrases": list(matched.key_phrases)}
+        else:
+            analysis = self.classify_text(text, doc=doc, matches=matches, intent=intent)
+            if template is not None and template.signature is not None:
+                self.template_index.add(doc_id, template.signature, analysis["intent"], analysis["key_phrases"])
         result = {
             "document_id": doc_id,
             "file_type": file_type,
             "metadata": metadata,
             "processing_steps": [],
-            "key_phrases": [],
+            "intent": analysis["intent"],
+            "key_phrases": analysis["key_phrases"],
+            "intent_scores": matches.counts("intent"),
         }
+        if matched is not None:
+            result["template"] = {"id": matched.id, "similarity": template.similarity}
+
+        if file_type == "pdf" and not self.is_email_content(text, matches):
+            agent_name = "pdf_agent"
+            with timed(agent_name):
+                agent_result = self.pdf_agent.process(text, doc_id, metadata | analysis, page_count=page_count)
+        else:
+            agent_name = "email_agent"
+            with timed(agent_name):
+                agent_result = self.email_agent.process(
+                    text, doc_id, metadata | analysis, matches=matches
+                )
+        result["processing_steps"].append({"agent": agent_name, "result": agent_result})
 
-        intent = "unknown"
+        self.record_classification(doc_id, file_type, analysis["intent"], result["key_phrases"], metadata,
+                                   template_id=matched.id if matched is not None else None)
+        if self.search_index is not None:
+            with timed("search_index"):
+                self.search_index.add(doc_id, search_text or text, file_type)
+        return result
+
+    def record_classification(self, doc_id, file_type, intent, key_phrases, metadata, template_id=None):
+        classification = {
+            "file_type": file_type,
+            "intent": intent,
+            "key_phrases": key_phrases,
+        }
+        if template_id is not None:
+            classification["template_id"] = template_id
+        self.update_memory(doc_id, {"classification": classification, "metadata": metadata})
+
+    def process(self, content, file_type: str, doc_id: str, metadata=None):
+        """Classify one document and run its agent.
+
+        With metrics enabled the result carries a ``timings`` block: seconds
+        per pipeline stage plus ``total``.
+        """
+        metadata = metadata or {}
 
         try:
-            if file_type == "pdf":
-                from utils.pdf_parser import extract_text_from_pdf
-
-                text_content = extract_text_from_pdf(content)
-                intent = self.detect_intent(text_content)
-                result["key_phrases"] = self.extract_key_phrases(text_content)
-
-                if self.is_email_content(text_content):
-                    agent_result = self.email_agent.process(
-                        text_content, doc_id, metadata | {"intent": intent}
-                    )
-                    result["processing_steps"].append(
-                        {"agent": "email_agent", "result": agent_result}
-                    )
-                else:
-                    agent_result = self.pdf_agent.process(
-                        text_content, doc_id, metadata | {"intent": intent}
-                    )
-                    result["processing_steps"].append(
-                        {"agent": "pdf_agent", "result": agent_result}
-                    )
-
-            elif file_type == "json":
-                intent = metadata.get("intent", "unknown")
+            # Every agent's memory writes for this document are merged and
+            # flushed once when the buffer closes.
+            with collect_timings() as timings, self.shared_memory.write_buffer():
+                result = self._process(content, file_type, doc_id, metadata)
+            return attach_timings(result, timings)
+
+        except Exception as exc:
+            logger.exception("Classification failed for %s: %s", doc_id, exc)
+            raise
+
+    def _process(self, content, file_type: str, doc_id: str, metadata: dict) -> dict:
+        cache_key = self.cache_key(content, file_type)
+        if cache_key is not None:
+            with timed("cache"):
+                cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return self.replay_cached(cached, doc_id, metadata)
+
+        if file_type == "pdf":
+            result = self.process_pdf(content, doc_id, metadata)
+        elif file_type not in self.JSON_FILE_TYPES:
+            text_content = self.extract_text(content, file_type, metadata)
+            result = self.process_text(text_content, file_type, doc_id, metadata)
+        else:
+            intent = metadata.get("intent", "unknown")
+            with timed("json_agent"):
                 agent_result = self.json_agent.process(content, doc_id, metadata)
-                result["processing_steps"].append(
-                    {"agent": "json_agent", "result": agent_result}
-                )
+            intent = agent_result.get("intent", intent)
+            self.record_classification(doc_id, file_type, intent, [], metadata)
+            result = {
+                "document_id": doc_id,
+                "file_type": file_type,
+                "metadata": metadata,
+                "processing_steps": [{"agent": "json_agent", "result": agent_result}],
+                "intent": intent,
+                "key_phrases": [],
+            }
 
-            elif file_type in {"eml", "txt"}:
-                if file_type == "eml":
-                    from utils.email_parser import parse_email
+        with timed("cache"):
+            self.cache_result(cache_key, doc_id, result)
+        return result
 
-                    email_data = parse_email(content)
-                    content = email_data["body"]
-                    metadata |= email_data
+    def process_pdf(self, content, doc_id: str, metadata: dict) -> dict:
+        """Classify a PDF from its first pages, stopping early when that decides it.
 
-                intent = self.detect_intent(content)
-                result["key_phrases"] = self.extract_key_phrases(content)
+        Up to ``PDF_PREVIEW_PAGES`` pages or ``PDF_PREVIEW_CHARS`` characters
+        are decoded first. If they yield an intent and do not look like an
+        email, the PDF agent only needs the page count and the remaining
+        pages are never decoded (unless the search index needs the full
+        text); otherwise extraction carries on to the end.
+        """
+        from utils.pdf_parser import PAGE_SEPARATOR, extract_pages, iter_pdf_pages, open_pdf
 
-                agent_result = self.email_agent.process(
-                    content, doc_id, metadata | {"intent": intent}
-                )
-                result["processing_steps"].append(
-                    {"agent": "email_agent", "result": agent_result}
-                )
+        with timed("extract"):
+            reader = open_pdf(content)
+            page_count = len(reader.pages)
+            preview, chars = [], 0
+            for page in iter_pdf_pages(reader):
+                preview.append(page)
+                chars += len(page)
+                if len(preview) >= self.PDF_PREVIEW_PAGES or chars >= self.PDF_PREVIEW_CHARS:
+                    break
 
+        text = PAGE_SEPARATOR.join(preview)
+        matches = self.scan(text)
+        decided = (
+            matches.best("intent", self.intent_patterns) is not None
+            and not self.is_email_content(text, matches)
+        )
+        search_text = None
+        if len(preview) < page_count and (not decided or self.search_index is not None):
+            with timed("extract"):
+                rest, failed_pages = extract_pages(content, start=len(preview), reader=reader)
+            if failed_pages:
+                metadata["failed_pages"] = failed_pages
+            if decided:
+                # Classified from the preview; only the index sees every page.
+                search_text = PAGE_SEPARATOR.join(preview + rest)
             else:
-                raise ValueError(f"Unsupported file_type '{file_type}'")
-
-            self.update_memory(
-                doc_id,
-                {
-                    "classification": {
-                        "file_type": file_type,
-                        "intent": intent,
-                        "key_phrases": result["key_phrases"],
-                    },
-                    "metadata": metadata,
-                },
-            )
+                text = PAGE_SEPARATOR.join(preview + rest)
+                matches = None
 
-            return result
+        return self.process_text(text, "pdf", doc_id, metadata, matches=matches, page_count=page_count,
+                                 search_text=search_text)
 
-        except Exception as exc:
-            logger.exception("Classification failed for %s: %s", doc_id, exc)
-            raise
+    def cache_key(self, content, file_type: str):
+        from utils.file_utils import is_file_like
+
+        if self.result_cache is None:
+            return None
+        if not isinstance(content, (bytes, str, os.PathLike)) and not is_file_like(content):
+            return None
+        return self.result_cache.make_key(content, file_type, self.pipeline_version)
+
+    def cache_result(self, cache_key, doc_id: str, result: dict):
+        if cache_key is None:
+            return
+        result["cache_hit"] = False
+        # Failed agent runs are retried on the next upload rather than replayed.
+        if any(step["result"].get("status") == "failed" for step in result["processing_steps"]):
+            return
+        record = self.shared_memory.get_document_history(doc_id)
+        self.result_cache.put(cache_key, {"result": result, "memory": record["data"] if record else {}})
+
+    def replay_cached(self, cached: dict, doc_id: str, metadata: dict) -> dict:
+        """Serve a cached result under a new doc_id and register it in memory."""
+        source_id = cached["result"]["document_id"]
+        result = self._rebind(cached["result"], doc_id)
+        result["metadata"] = result.get("metadata", {}) | metadata
+        result["cache_hit"] = True
+
+        memory_data = self._rebind(cached["memory"], doc_id)
+        memory_data["metadata"] = memory_data.get("metadata", {}) | metadata
+        memory_data["cache"] = {"hit": True, "source_document_id": source_id}
+        self.update_memory(doc_id, memory_data)
+        return result
+
+    @classmethod
+    def _rebind(cls, value, doc_id: str):
+        if isinstance(value, dict):
+            return {
+                key: doc_id if key == "document_id" else cls._rebind(item, doc_id)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [cls._rebind(item, doc_id) for item in value]
+        return value
+
+    def process_batch(self, documents, batch_size: int = 32, n_process: int = 1) -> list:
+        """Process many documents, running all text through one ``nlp.pipe`` stream.
+
+        ``documents`` is an iterable of dicts with ``content``, ``file_type``,
+        ``doc_id`` and optional ``metadata``. Results come back in input order;
+        a document that fails gets a ``status: failed`` entry instead of
+        aborting the batch. Documents matching a known template skip the
+        stream entirely.
+        """
+        documents = list(documents)
+        results = [None] * len(documents)
+        texts, pending = [], []
+
+        # The whole batch reaches SharedMemory in one flush, so per-document
+        # timings cover everything but that write.
+        with self.shared_memory.write_buffer():
+            for index, document in enumerate(documents):
+                file_type, doc_id = document["file_type"], document["doc_id"]
+                metadata = document.get("metadata") or {}
+                try:
+                    if file_type in self.JSON_FILE_TYPES:
+                        results[index] = self.process(document["content"], file_type, doc_id, metadata)
+                        continue
+
+                    with collect_timings() as timings:
+                        cache_key = self.cache_key(document["content"], file_type)
+                        with timed("cache"):
+                            cached = self.result_cache.get(cache_key) if cache_key is not None else None
+                        if cached is None:
+                            text = self.extract_text(document["content"], file_type, metadata)
+                            matches = self.scan(text)
+                            template = self.match_template(text)
+                    if cached is not None:
+                        results[index] = attach_timings(self.replay_cached(cached, doc_id, metadata), timings)
+                        continue
+                    # Long texts are parsed in chunks by process_text instead.
+                    in_pipe = self.reusable_template(template, matches) is None and not self.is_long_text(text)
+                    if in_pipe:
+                        texts.append(text)
+                    pending.append((index, file_type, doc_id, metadata, cache_key, timings,
+                                    text, matches, template, in_pipe))
+                except Exception as exc:
+                    results[index] = self.failed_result(doc_id, file_type, exc)
+
+            # Texts without a pattern hit share one intent-model pass.
+            intents = self.detect_intents([entry[6] for entry in pending], [entry[7] for entry in pending])
+            docs = iter(self.nlp.pipe(
+                texts,
+                batch_size=batch_size,
+                n_process=n_process,
+                disable=self.phrase_disabled,
+            ))
+            for (index, file_type, doc_id, metadata, cache_key, timings, text, matches, template,
+                 in_pipe), intent in zip(pending, intents):
+                try:
+                    with collect_timings(timings):
+                        doc = None
+                        if in_pipe:
+                            with timed("nlp"):
+                                doc = next(docs)
+                        result = self.process_text(text, file_type, doc_id, metadata, doc=doc,
+                                                   matches=matches, template=template, intent=intent)
+                        with timed("cache"):
+                            self.cache_result(cache_key, doc_id, result)
+                    results[index] = attach_timings(result, timings)
+                except Exception as exc:
+                    results[index] = self.failed_result(doc_id, file_type, exc)
+
+        return results
+
+    @staticmethod
+    def failed_result(doc_id: str, file_type: str, exc: Exception) -> dict:
+        logger.error("Batch item %s failed: %s", doc_id, exc)
+        return {
+            "document_id": doc_id,
+            "file_type": file_type,
+            "status": "failed",
+            "error": str(exc),
+        }
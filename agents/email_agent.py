@@ -1,16 +1,32 @@
 from agents.base_agent import BaseAgent
+from utils.pattern_matcher import PatternMatcher
 import re
+from itertools import islice
 from typing import Dict, Any
 import logging
 
 logger = logging.getLogger("EmailAgent")
 
+# Addresses and dates are scanned separately: a date run into an address
+# ("12/05/2024@host") must still yield both. Only the first matches are used,
+# so neither scan reads further than it needs to.
+EMAIL_RE = re.compile(r'[\w\.-]+@[\w\.-]+')
+DATE_RE = re.compile(r'\d{1,2}/\d{1,2}/\d{2,4}|\d{1,2}\s+[A-Za-z]+\s+\d{4}')
+QUESTION_RE = re.compile(
+    r'\b(how|what|when|where|why|who|can|could|would|will)\b[\w\s,]*\?', re.IGNORECASE
+)
+
 
 class EmailAgent(BaseAgent):
+    URGENT_KEYWORDS = ['urgent', 'asap', 'immediately', 'important']
+
     def __init__(self, shared_memory):
         super().__init__(shared_memory)
+        self.matcher = PatternMatcher(keywords={"urgency": {"high": self.URGENT_KEYWORDS}})
 
-    def extract_entities(self, text: str) -> Dict[str, Any]:
+    def extract_entities(self, text: str, matches=None) -> Dict[str, Any]:
+        """``matches`` is a ``MatchResult`` already holding urgency hits, if the
+        caller has scanned the text."""
         entities = {
             "sender": None,
             "recipient": None,
@@ -19,24 +35,22 @@ class EmailAgent(BaseAgent):
             "key_phrases": []
         }
 
-        email_pattern = r'[\w\.-]+@[\w\.-]+'
-        emails = re.findall(email_pattern, text)
+        emails = [match.group() for match in islice(EMAIL_RE.finditer(text), 2)]
         if emails:
             entities["sender"] = emails[0]  # First email is likely sender
             if len(emails) > 1:
                 entities["recipient"] = emails[1]
 
-        date_pattern = r'\d{1,2}/\d{1,2}/\d{2,4}|\d{1,2}\s+[A-Za-z]+\s+\d{4}'
-        dates = re.findall(date_pattern, text)
-        if dates:
-            entities["date"] = dates[0]
+        date = DATE_RE.search(text)
+        if date:
+            entities["date"] = date.group()
 
-        urgent_keywords = ['urgent', 'asap', 'immediately', 'important']
-        if any(keyword in text.lower() for keyword in urgent_keywords):
+        if matches is None:
+            matches = self.matcher.scan(text)
+        if matches.count("urgency"):
             entities["urgency"] = "high"
 
-        question_pattern = r'\b(how|what|when|where|why|who|can|could|would|will)\b[\w\s,]*\?'
-        questions = re.findall(question_pattern, text, re.IGNORECASE)
+        questions = QUESTION_RE.findall(text)
         entities["key_phrases"] = questions[:3]  # Limit to 3 questions
 
         return entities
@@ -60,11 +74,11 @@ class EmailAgent(BaseAgent):
 
         return action_map.get(intent, action_map["default"])
 
-    def process(self, content: str, doc_id: str, metadata=None) -> Dict[str, Any]:
+    def process(self, content: str, doc_id: str, metadata=None, matches=None) -> Dict[str, Any]:
         """Enhanced email processing"""
         metadata = metadata or {}
         try:
-            entities = self.extract_entities(content)
+            entities = self.extract_entities(content, matches)
             intent = metadata.get("intent", "unknown")
             phrases = metadata.get("key_phrases", [])
 
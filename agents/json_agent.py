@@ -1,58 +1,80 @@
 from agents.base_agent import BaseAgent
 import json
-from typing import Dict, Any
+import os
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache
+from itertools import chain, islice
+from typing import Dict, Any, Iterable
 import logging
 
+from utils.file_utils import open_content
+from utils.json_stream import JSONRecordReader
+from utils.schema_engine import CompiledSchema, SchemaEngine
+
 logger = logging.getLogger("JSONAgent")
+_NO_RECORD = object()
+
+
+@lru_cache(maxsize=128)
+def _compiled_spec(spec_json: str) -> CompiledSchema:
+    return CompiledSchema("", json.loads(spec_json))
+
+
 class JSONAgent(BaseAgent):
+    # Invalid records reported individually for a record collection; the
+    # rest only show up in the aggregate stats.
+    MAX_INVALID_SAMPLES = 100
+    # Records validated per SchemaEngine.validate_batch call.
+    VALIDATION_BATCH = 1000
+
     def __init__(self, shared_memory):
         super().__init__(shared_memory)
 
+        # The first required field doubles as the discriminator: a record
+        # carrying it is of that kind (checked in this order).
         self.target_schemas = {
             "invoice": {
                 "required": ["invoice_number", "date", "total_amount", "vendor"],
-                "optional": ["due_date", "tax_amount", "line_items"]
+                "optional": ["due_date", "tax_amount", "line_items"],
+                "types": {"total_amount": "number", "tax_amount": "number", "line_items": "array"}
             },
             "rfq": {
                 "required": ["rfq_number", "request_date", "items"],
-                "optional": ["delivery_date", "special_requirements"]
+                "optional": ["delivery_date", "special_requirements"],
+                "types": {"items": "array"}
             },
             "complaint": {
                 "required": ["complaint_id", "date_received", "description"],
-                "optional": ["customer_info", "resolution_requested"]
+                "optional": ["customer_info", "resolution_requested"],
+                "types": {"description": "string", "customer_info": "object"}
             }
         }
+        self.target_schemas.update(SchemaEngine.load_specs(os.getenv("JSON_SCHEMAS_PATH")))
+        self.schemas = SchemaEngine(self.target_schemas)
 
     def validate_json(self, json_data: Dict[str, Any], schema: Dict[str, Any]) -> Dict[str, Any]:
-        validation_result = {
-            "is_valid": True,
-            "missing_fields": [],
-            "anomalies": []
-        }
+        """Validate against a schema spec, compiled once per distinct spec."""
+        for name, spec in self.target_schemas.items():
+            if spec is schema:
+                return self.schemas.schemas[name].validate(json_data)
+        return _compiled_spec(json.dumps(schema, sort_keys=True)).validate(json_data)
 
-        for field in schema["required"]:
-            if field not in json_data:
-                validation_result["is_valid"] = False
-                validation_result["missing_fields"].append(field)
+    def detect_intent(self, json_data: Dict[str, Any]) -> str:
+        schema = self.schemas.detect(json_data)
+        return schema.name if schema is not None else "unknown"
 
-        expected_fields = set(schema["required"] + schema["optional"])
-        for field in json_data.keys():
-            if field not in expected_fields:
-                validation_result["anomalies"].append(f"Unexpected field: {field}")
+    def validate_batch(self, records: Iterable[Any]):
+        """Validate many records in one call; see ``SchemaEngine.validate_batch``."""
+        return self.schemas.validate_batch(records)
 
-        return validation_result
+    def process(self, content, doc_id: str, metadata=None) -> Dict[str, Any]:
+        """Validate a JSON document, or stream a collection of records.
 
-    def detect_intent(self, json_data: Dict[str, Any]) -> str:
-        if "invoice_number" in json_data:
-            return "invoice"
-        elif "rfq_number" in json_data:
-            return "rfq"
-        elif "complaint_id" in json_data:
-            return "complaint"
-        else:
-            return "unknown"
-
-    def process(self, content: str, doc_id: str, metadata=None) -> Dict[str, Any]:
+        A single top-level object is echoed back in ``extracted_fields``. A
+        top-level array or NDJSON input is parsed record by record and only
+        aggregate stats plus a sample of invalid records are returned.
+        """
         metadata = metadata or {}
         result = {
             "document_id": doc_id,
@@ -63,13 +85,19 @@ class JSONAgent(BaseAgent):
         }
 
         try:
-            json_data = json.loads(content)
-
-            intent = self.detect_intent(json_data)
-
-            schema = self.target_schemas.get(intent, {})
-
-            validation_result = self.validate_json(json_data, schema)
+            with open_content(content) as fh:
+                reader = JSONRecordReader(fh)
+                records = iter(reader)
+                json_data = next(records, _NO_RECORD)
+                following = next(records, _NO_RECORD) if reader.format == "stream" else _NO_RECORD
+                if reader.format == "array" or following is not _NO_RECORD:
+                    collection = (record for record in (json_data, following) if record is not _NO_RECORD)
+                    return self.process_records(chain(collection, records), doc_id, reader.format, result)
+            if json_data is _NO_RECORD:
+                raise json.JSONDecodeError("Expecting value", "", 0)
+
+            validation_result = self.schemas.validate(json_data)
+            intent = validation_result.pop("intent")
 
             result.update({
                 "intent": intent,
@@ -106,4 +134,68 @@ class JSONAgent(BaseAgent):
                 "status": "failed"
             })
             self.update_memory(doc_id, {"error": str(e)})
-            return result
\ No newline at end of file
+            return result
+
+    def process_records(self, records: Iterable[Any], doc_id: str, record_format: str,
+                        result: Dict[str, Any]) -> Dict[str, Any]:
+        """Aggregate per-record validation over a record collection.
+
+        Records are validated ``VALIDATION_BATCH`` at a time; only records
+        whose bitmask flags something are expanded into readable summaries.
+        """
+        intents = Counter()
+        missing_fields = defaultdict(Counter)
+        anomalies = defaultdict(Counter)
+        invalid_records = []
+        count = valid = 0
+
+        start = time.perf_counter()
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.VALIDATION_BATCH))
+            if not chunk:
+                break
+            batch = self.schemas.validate_batch(chunk)
+            summary = batch.summary()
+            intents.update(summary["intents"])
+            valid += summary["valid"]
+            for intent, fields in summary["missing_fields"].items():
+                missing_fields[intent].update(fields)
+
+            for index in [i for i, mask in enumerate(batch.masks) if mask]:
+                record_result = {"index": count + index, "intent": batch.intent(index),
+                                 **batch.describe(index, chunk[index])}
+                if record_result["anomalies"]:
+                    anomalies[record_result["intent"]].update(record_result["anomalies"])
+                if not record_result["is_valid"] and len(invalid_records) < self.MAX_INVALID_SAMPLES:
+                    invalid_records.append(record_result)
+            count += len(chunk)
+        elapsed = time.perf_counter() - start
+
+        stats = {
+            "records": count,
+            "valid": valid,
+            "invalid": count - valid,
+            "intents": dict(intents),
+            "missing_fields": {intent: dict(fields) for intent, fields in missing_fields.items()},
+            "anomalies": {intent: dict(found) for intent, found in anomalies.items()},
+            "records_per_second": round(count / elapsed) if elapsed else None,
+        }
+        intent = intents.most_common(1)[0][0] if intents else "unknown"
+        result.update({
+            "intent": intent,
+            "format": "array" if record_format == "array" else "ndjson",
+            "stats": stats,
+            "invalid_records": invalid_records,
+            "validation": {"is_valid": valid == count, "missing_fields": [], "anomalies": []},
+            "status": "processed"
+        })
+        self.update_memory(doc_id, {
+            "validation_summary": stats,
+            "processing_result": {
+                "agent": "json_agent",
+                "intent": intent,
+                "records": count
+            }
+        })
+        return result
@@ -1,18 +1,25 @@
 from agents import BaseAgent
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 class PDFAgent(BaseAgent):
     def __init__(self, shared_memory):
         super().__init__(shared_memory)
 
-    def process(self, content: str, doc_id: str, metadata=None) -> Dict[str, Any]:
-        """Process PDF content"""
+    def process(self, content: str, doc_id: str, metadata=None, page_count: Optional[int] = None) -> Dict[str, Any]:
+        """Process PDF content
+
+        ``content`` holds the extracted pages separated by form feeds. When
+        only the first pages were extracted, ``page_count`` gives the real
+        total.
+        """
         metadata = metadata or {}
+        pages_extracted = content.count('\f') + 1
         result = {
             "document_id": doc_id,
             "agent": "pdf_agent",
             "content_type": "pdf",
-            "pages": len(content.split('\f')) if '\f' in content else 1,
+            "pages": page_count if page_count is not None else pages_extracted,
+            "pages_extracted": pages_extracted,
             "status": "processed"
         }
 
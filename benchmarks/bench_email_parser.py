@@ -0,0 +1,57 @@
+"""Parse time of an email carrying a large PDF attachment.
+
+"before" is the old path: ``message_from_bytes`` building the full MIME
+tree and decoding the text part. "after" is ``parse_email`` and
+"headers" is ``parse_email_headers``.
+
+    python -m benchmarks.bench_email_parser --attachment-mb 20
+"""
+import argparse
+import os
+import sys
+import time
+from email import message_from_bytes
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import make_email  # noqa: E402
+from utils.email_parser import parse_email, parse_email_headers  # noqa: E402
+
+
+def legacy_parse(raw: bytes) -> str:
+    msg = message_from_bytes(raw)
+    for part in msg.walk():
+        if part.get_content_type() == "text/plain":
+            return part.get_payload(decode=True).decode("latin-1")
+    return ""
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attachment-mb", type=float, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    raw = make_email(int(args.attachment_mb * 1024 * 1024))
+    print(f"{len(raw) / 1024 / 1024:.1f} MiB email")
+
+    before = best_of(lambda: legacy_parse(raw), args.repeat)
+    after = best_of(lambda: parse_email(raw), args.repeat)
+    headers = best_of(lambda: parse_email_headers(raw), args.repeat)
+
+    print(f"{'before':10} {before * 1000:9.2f}ms")
+    print(f"{'after':10} {after * 1000:9.2f}ms  {before / after:7.1f}x")
+    print(f"{'headers':10} {headers * 1000:9.2f}ms  {before / headers:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Records/sec and peak memory of JSONAgent on large record collections.
+
+"before" is the old path: ``json.loads`` of the whole export followed by
+per-record validation. "after" is ``JSONAgent.process``
+streaming the file from disk.
+
+    python -m benchmarks.bench_json_stream --records 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.json_agent import JSONAgent  # noqa: E402
+from benchmarks.corpus import erp_records, write_records  # noqa: E402
+from memory.shared_memory import SharedMemory  # noqa: E402
+
+
+def legacy(agent: JSONAgent, path: Path) -> int:
+    records = json.loads(path.read_bytes())
+    for record in records:
+        agent.schemas.validate(record)
+    return len(records)
+
+
+def streaming(agent: JSONAgent, path: Path) -> int:
+    return agent.process(path, "bench")["stats"]["records"]
+
+
+def measure(fn, *args):
+    start = time.perf_counter()
+    count = fn(*args)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count / elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    agent = JSONAgent(SharedMemory())
+    directory = tempfile.mkdtemp()
+    print(f"{'input':8} {'path':8} {'records/s':>12} {'peak MiB':>10}")
+    for record_format in ("array", "ndjson"):
+        path = Path(directory) / f"export.{record_format}"
+        write_records(str(path), erp_records(args.records), record_format)
+        paths = [("before", legacy), ("after", streaming)] if record_format == "array" else [("after", streaming)]
+        for name, fn in paths:
+            rate, peak = measure(fn, agent, path)
+            print(f"{record_format:8} {name:8} {rate:12,.0f} {peak:10.1f}")
+        path.unlink()
+
+
+if __name__ == "__main__":
+    main()
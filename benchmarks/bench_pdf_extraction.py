@@ -0,0 +1,74 @@
+"""Serial vs parallel page extraction on a synthetic multi-page PDF.
+
+"before" is the old ``text += page.extract_text()`` loop, "serial" is
+``extract_pages`` on one core and "parallel" splits the page range across
+``--workers`` processes.
+
+    python -m benchmarks.bench_pdf_extraction --pages 500 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PdfReader  # noqa: E402
+
+from benchmarks.corpus import make_pdf  # noqa: E402
+from utils import pdf_parser  # noqa: E402
+
+PAGE_LINES = [
+    "Section {page}.{line}: Operators shall maintain records of compliance",
+    "with the applicable standard and report any deviation within 30 days.",
+]
+
+
+def legacy_extract(pdf_bytes: bytes) -> str:
+    reader = PdfReader(BytesIO(pdf_bytes))
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() + "\n"
+    return text.strip()
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=40, help="text lines per page")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = [
+        "\n".join(PAGE_LINES[line % 2].format(page=page, line=line) for line in range(args.lines))
+        for page in range(1, args.pages + 1)
+    ]
+    pdf = make_pdf(pages)
+    print(f"{args.pages} pages, {len(pdf) / 1024:.0f} KiB, {args.workers} workers")
+
+    # Start the pool outside the timed runs.
+    pdf_parser.extract_pages(pdf, start=args.pages - pdf_parser.PARALLEL_MIN_PAGES, workers=args.workers)
+
+    before = best_of(lambda: legacy_extract(pdf), args.repeat)
+    serial = best_of(lambda: pdf_parser.extract_pages(pdf, workers=1), args.repeat)
+    parallel = best_of(lambda: pdf_parser.extract_pages(pdf, workers=args.workers), args.repeat)
+    pdf_parser.shutdown_pool()
+
+    print(f"{'before':10} {before:8.2f}s")
+    print(f"{'serial':10} {serial:8.2f}s  {before / serial:5.2f}x")
+    print(f"{'parallel':10} {parallel:8.2f}s  {before / parallel:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
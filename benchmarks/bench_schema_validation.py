@@ -0,0 +1,74 @@
+"""Validation throughput of JSONAgent on already-parsed records.
+
+"before" replays the old path per record (if/elif ``detect_intent``, then a
+``validate_json`` that rebuilds the expected-field set every call); "single"
+is ``SchemaEngine.validate`` per record and "batch" is ``validate_batch``
+plus its summary.
+
+    python -m benchmarks.bench_schema_validation --records 500000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.json_agent import JSONAgent  # noqa: E402
+from benchmarks.corpus import erp_records  # noqa: E402
+from memory.shared_memory import SharedMemory  # noqa: E402
+
+
+def legacy_detect(record):
+    if "invoice_number" in record:
+        return "invoice"
+    elif "rfq_number" in record:
+        return "rfq"
+    elif "complaint_id" in record:
+        return "complaint"
+    return "unknown"
+
+
+def legacy_validate(record, schema):
+    result = {"is_valid": True, "missing_fields": [], "anomalies": []}
+    for field in schema["required"]:
+        if field not in record:
+            result["is_valid"] = False
+            result["missing_fields"].append(field)
+    expected = set(schema["required"] + schema["optional"])
+    for field in record.keys():
+        if field not in expected:
+            result["anomalies"].append(f"Unexpected field: {field}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=500_000)
+    args = parser.parse_args()
+
+    agent = JSONAgent(SharedMemory())
+    records = list(erp_records(args.records))
+
+    def before():
+        for record in records:
+            schema = agent.target_schemas.get(legacy_detect(record))
+            if schema is not None:
+                legacy_validate(record, schema)
+
+    def single():
+        for record in records:
+            agent.schemas.validate(record)
+
+    def batch():
+        agent.validate_batch(records).summary()
+
+    for name, fn in (("before", before), ("single", single), ("batch", batch)):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        print(f"{name:8} {args.records / elapsed:12,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
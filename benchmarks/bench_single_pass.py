@@ -0,0 +1,69 @@
+"""Per-document cost of the spaCy analysis stage on ``sample_inputs``.
+
+"before" replays the old path (``nlp(lowered)`` for the intent fallback and
+``nlp(text)`` again for key phrases); "after" is ``ClassifierAgent.classify_text``
+which parses each document once with unused pipes disabled.
+
+    python -m benchmarks.bench_single_pass --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.classifier_agent import ClassifierAgent  # noqa: E402
+from memory.shared_memory import SharedMemory  # noqa: E402
+from utils.email_parser import parse_email  # noqa: E402
+from utils.pdf_parser import extract_text_from_pdf  # noqa: E402
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_inputs")
+
+
+def load_texts(sample_dir: str) -> dict:
+    texts = {}
+    for name in sorted(os.listdir(sample_dir)):
+        path = os.path.join(sample_dir, name)
+        with open(path, "rb") as fh:
+            raw = fh.read()
+        if name.endswith(".pdf"):
+            texts[name] = extract_text_from_pdf(raw)
+        elif name.endswith(".eml"):
+            texts[name] = parse_email(raw)["body"]
+        elif name.endswith(".txt"):
+            texts[name] = raw.decode("utf-8", errors="replace")
+    return texts
+
+
+def legacy_analysis(agent: ClassifierAgent, text: str) -> None:
+    agent.nlp(text.lower())
+    doc = agent.nlp(text)
+    list(doc.noun_chunks)
+    list(doc.ents)
+
+
+def time_per_doc(fn, text: str, repeat: int) -> float:
+    fn(text)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--samples", default=SAMPLE_DIR)
+    args = parser.parse_args()
+
+    agent = ClassifierAgent(SharedMemory())
+    print(f"{'document':45} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name, text in load_texts(args.samples).items():
+        before = time_per_doc(lambda t: legacy_analysis(agent, t), text, args.repeat)
+        after = time_per_doc(agent.classify_text, text, args.repeat)
+        print(f"{name:45} {before:10.2f} {after:10.2f} {before / after:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
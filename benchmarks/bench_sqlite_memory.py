@@ -0,0 +1,89 @@
+"""Insert throughput and lookup latency of the SQLite memory backend.
+
+Writes ``--records`` documents through ``SharedMemory`` (batched by the
+background writer), then measures point lookups by doc_id and indexed audit
+queries ("complaints from the last week").
+
+    python -m benchmarks.bench_sqlite_memory --records 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory.shared_memory import SharedMemory  # noqa: E402
+
+INTENTS = ["invoice", "rfq", "complaint", "regulation", "syllabus", "unknown"]
+FILE_TYPES = ["pdf", "eml", "json", "txt"]
+ACTIONS = ["create_billing_record", "create_opportunity", "create_support_case", "create_ticket"]
+
+
+def make_record(i: int) -> dict:
+    return {
+        "classification": {"intent": INTENTS[i % len(INTENTS)], "file_type": FILE_TYPES[i % len(FILE_TYPES)],
+                           "key_phrases": ["purchase order", "Acme Corp"]},
+        "email_processing": {"crm_action": ACTIONS[i % len(ACTIONS)],
+                             "extracted_fields": {"sender": f"user{i % 5000}@example.com", "urgency": "normal"}},
+        "metadata": {"filename": f"doc-{i}.eml", "size": 2048 + i % 1000},
+    }
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50": statistics.median(samples) * 1000,
+        "p99": samples[int(len(samples) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--path", default=None, help="database file (default: temp dir)")
+    args = parser.parse_args()
+
+    path = args.path or os.path.join(tempfile.mkdtemp(), "memory.db")
+    memory = SharedMemory(sqlite_path=path)
+
+    start = time.perf_counter()
+    for i in range(args.records):
+        memory.update(f"doc-{i}", make_record(i))
+    memory.store.flush()
+    elapsed = time.perf_counter() - start
+    print(f"inserted {args.records} records in {elapsed:.1f}s: {args.records / elapsed:,.0f} inserts/sec")
+    print(f"batches committed: {memory.store.batches}")
+
+    point = []
+    for _ in range(args.lookups):
+        doc_id = f"doc-{random.randrange(args.records)}"
+        t = time.perf_counter()
+        memory.get_document_history(doc_id)
+        point.append(time.perf_counter() - t)
+    print("point lookup ms: p50 {p50:.3f}  p99 {p99:.3f}".format(**percentiles(point)))
+
+    week_ago = time.time() - 7 * 86400
+    queries = []
+    for i in range(200):
+        t = time.perf_counter()
+        memory.query(intent=INTENTS[i % len(INTENTS)], since=week_ago, limit=100)
+        queries.append(time.perf_counter() - t)
+    print("audit query (intent + last week, 100 rows) ms: p50 {p50:.3f}  p99 {p99:.3f}".format(**percentiles(queries)))
+
+    sender = []
+    for i in range(200):
+        t = time.perf_counter()
+        memory.query(sender=f"user{i}@example.com", limit=100)
+        sender.append(time.perf_counter() - t)
+    print("sender query ms: p50 {p50:.3f}  p99 {p99:.3f}".format(**percentiles(sender)))
+
+    memory.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Import and first-request timings of ``main`` for each STARTUP_MODE.
+
+Every mode runs in a fresh interpreter so module and model caches are cold.
+
+    python -m benchmarks.bench_startup
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+timings = {}
+for name, filename, content in [
+    ("first_json_s", "probe.json", b'{"invoice_number": "INV-1"}'),
+    ("first_text_s", "probe.txt", b"Please find the invoice attached."),
+]:
+    start = time.perf_counter()
+    client.post("/process", files={"file": (filename, content)})
+    timings[name] = time.perf_counter() - start
+print(json.dumps({"import_s": imported, **timings}))
+"""
+
+
+def measure(mode: str) -> dict:
+    env = dict(os.environ, STARTUP_MODE=mode, CLASSIFIER_BACKEND="inline")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{'mode':12} {'import s':>9} {'1st json s':>11} {'1st text s':>11}")
+    for mode in ("lazy", "background", "eager"):
+        t = measure(mode)
+        print(f"{mode:12} {t['import_s']:9.2f} {t['first_json_s']:11.3f} {t['first_text_s']:11.3f}")
+
+
+if __name__ == "__main__":
+    main()
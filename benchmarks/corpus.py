@@ -0,0 +1,190 @@
+"""Synthetic documents for benchmarks and tests.
+
+``make_pdf`` writes a minimal text PDF by hand (one Helvetica content stream
+per page), so large multi-page inputs can be generated without extra
+dependencies. ``erp_records`` yields the invoice/RFQ/complaint records of an
+ERP export and ``make_email`` a MIME message with an optional attachment.
+``generate_corpus`` writes a seeded mix of all of them to a directory.
+"""
+import json
+import random
+from email.message import EmailMessage
+from pathlib import Path
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages) -> bytes:
+    """Build a PDF whose page ``i`` shows the lines of ``pages[i]``."""
+    pages = list(pages)
+    first_page = 4
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for number, text in enumerate(pages):
+        page_obj = first_page + 2 * number
+        kids.append(f"{page_obj} 0 R")
+        lines = "".join(f"({_escape(line)}) Tj T* " for line in text.splitlines())
+        stream = f"BT /F1 11 Tf 14 TL 72 760 Td {lines}ET".encode("latin-1", errors="replace")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_obj + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def erp_records(count: int, invalid_every: int = 10):
+    """``count`` JSON records; every ``invalid_every``-th one misses a field."""
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            record = {"invoice_number": f"INV-{i}", "date": "2024-01-31", "total_amount": 100.0 + i,
+                      "vendor": "Acme Corp", "line_items": [{"sku": "A-1", "qty": 2}]}
+        elif kind == 1:
+            record = {"rfq_number": f"RFQ-{i}", "request_date": "2024-01-31",
+                      "items": [{"sku": "B-2", "qty": 10}], "delivery_date": "2024-03-01"}
+        else:
+            record = {"complaint_id": f"C-{i}", "date_received": "2024-01-31",
+                      "description": "Late delivery", "customer_info": {"name": "Jane"}}
+        if invalid_every and i % invalid_every == 0:
+            # Drop the first required field after the record's id.
+            record.pop(list(record)[1])
+        yield record
+
+
+def write_records(path: str, records, record_format: str = "array"):
+    """Write ``records`` as a top-level JSON array or as NDJSON."""
+    with open(path, "w", encoding="utf-8") as fh:
+        if record_format == "ndjson":
+            for record in records:
+                fh.write(json.dumps(record))
+                fh.write("\n")
+            return
+        fh.write("[")
+        for i, record in enumerate(records):
+            if i:
+                fh.write(",\n")
+            fh.write(json.dumps(record))
+        fh.write("]")
+
+
+def make_email(attachment_size: int = 0, html: bool = False, body: str = None, rng=None) -> bytes:
+    """A complaint email, HTML-only if ``html``, with a random PDF attachment."""
+    rng = rng or random.Random(0)
+    msg = EmailMessage()
+    msg["From"] = "=?utf-8?q?J=C3=BCrgen_M=C3=BCller?= <juergen@example.com>"
+    msg["To"] = "support@company.com"
+    msg["Subject"] = "=?iso-8859-1?q?R=E9clamation:?= damaged order #12345"
+    msg["Date"] = "Mon, 13 Nov 2023 14:25:30 +0000"
+    body = body or "Dear Support Team,\n\nThe order arrived damaged. Please respond ASAP.\n\nRegards,\nJürgen"
+    if html:
+        markup = "".join(f"<p>{line}</p>" for line in body.split("\n"))
+        msg.set_content(f"<html><body>{markup}</body></html>", subtype="html", charset="iso-8859-1")
+    else:
+        msg.set_content(body, charset="iso-8859-1")
+    if attachment_size:
+        msg.add_attachment(rng.randbytes(attachment_size), maintype="application", subtype="pdf",
+                           filename="damage-report.pdf")
+        # Fixed boundary: the generator would otherwise pick a random one.
+        msg.set_boundary(f"===={rng.getrandbits(64):016x}====")
+    return msg.as_bytes()
+
+
+INTENT_SENTENCES = {
+    "invoice": "Invoice {n} from {company}: payment of ${amount} is due by the due date of {date}.",
+    "rfq": "Request for quote {n}: please send a quotation for {amount} units of the {product}.",
+    "complaint": "Complaint about order #{n}: the {product} arrived damaged and we are dissatisfied.",
+    "regulation": "Regulation {n} requires compliance with the {company} safety standard by {date}.",
+}
+FILLER_SENTENCES = [
+    "The {product} was shipped by {company} on {date}.",
+    "Our team reviewed the account history for the last quarter.",
+    "Please keep the reference number {n} in all further correspondence.",
+    "The warehouse in the northern region handled {amount} orders this month.",
+    "Could you confirm the delivery address for the {product}?",
+]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Ltd", "Stark Industries"]
+PRODUCTS = ["industrial pump", "control valve", "sensor array", "steel frame", "conveyor belt"]
+DEFAULT_MIX = {"pdf": 2, "eml": 4, "json": 2, "txt": 2}
+
+
+def make_text(intent: str, sentences: int, rng: random.Random) -> str:
+    """Filler prose with an intent sentence in the first and every tenth line."""
+    lines = []
+    for i in range(sentences):
+        template = INTENT_SENTENCES[intent] if i % 10 == 0 else rng.choice(FILLER_SENTENCES)
+        lines.append(template.format(
+            n=rng.randint(1000, 99999),
+            company=rng.choice(COMPANIES),
+            product=rng.choice(PRODUCTS),
+            amount=rng.randint(1, 5000),
+            date=f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        ))
+    return "\n".join(lines)
+
+
+def parse_mix(spec: str) -> dict:
+    """``"pdf=2,eml=4"`` -> ``{"pdf": 2, "eml": 4}``."""
+    mix = {}
+    for item in filter(None, spec.split(",")):
+        file_type, _, weight = item.partition("=")
+        if file_type not in DEFAULT_MIX:
+            raise ValueError(f"Unknown corpus file type '{file_type}'")
+        mix[file_type] = float(weight or 1)
+    return mix
+
+
+def generate_corpus(directory, documents: int = 40, mix: dict = None, seed: int = 0,
+                    max_pdf_pages: int = 20, max_attachment_kb: int = 256,
+                    json_records: int = 2000) -> list:
+    """Write ``documents`` files of the weighted ``mix`` of types into ``directory``.
+
+    The same arguments always produce the same files. Returns (and writes to
+    ``manifest.json``) one ``{"name", "file_type", "intent", "size"}`` entry
+    per file.
+    """
+    rng = random.Random(seed)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    mix = mix or DEFAULT_MIX
+    file_types = rng.choices(list(mix), weights=list(mix.values()), k=documents)
+    intents = list(INTENT_SENTENCES)
+
+    manifest = []
+    for number, file_type in enumerate(file_types):
+        intent = rng.choice(intents)
+        path = directory / f"{number:05d}_{intent}.{file_type}"
+        if file_type == "pdf":
+            pages = [make_text(intent, 30, rng) for _ in range(rng.randint(1, max_pdf_pages))]
+            path.write_bytes(make_pdf(pages))
+        elif file_type == "eml":
+            attachment = rng.randint(0, max_attachment_kb) * 1024 if rng.random() < 0.5 else 0
+            path.write_bytes(make_email(attachment, html=rng.random() < 0.3,
+                                        body=make_text(intent, 12, rng), rng=rng))
+        elif file_type == "json":
+            write_records(str(path), erp_records(rng.randint(json_records // 2, json_records)))
+            intent = "mixed"
+        else:
+            path.write_text(make_text(intent, rng.randint(20, 200), rng), encoding="utf-8")
+        manifest.append({"name": path.name, "file_type": file_type, "intent": intent,
+                         "size": path.stat().st_size})
+
+    (directory / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
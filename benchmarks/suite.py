@@ -0,0 +1,329 @@
+"""Per-stage and end-to-end benchmarks over a generated corpus.
+
+Each stage (PDF extraction, email parsing, intent detection, key phrases,
+JSON validation, memory writes, the FastAPI app end to end) runs
+``--repeat`` times over the same seeded corpus; results are written as JSON.
+With ``--compare`` the run is checked against a stored result and stages
+more than ``--threshold`` slower are flagged (exit status 1).
+
+    python -m benchmarks.suite --documents 40 --output baseline.json
+    python -m benchmarks.suite --documents 40 --compare baseline.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import DEFAULT_MIX, generate_corpus, parse_mix  # noqa: E402
+
+STAGES = {}
+
+
+class StageSkipped(Exception):
+    pass
+
+
+def stage(name: str):
+    """Register ``fn(corpus) -> (run, items)``; ``run()`` is what gets timed."""
+    def register(fn):
+        STAGES[name] = fn
+        return fn
+    return register
+
+
+class Corpus:
+    """Generated files grouped by type, read into memory once."""
+
+    def __init__(self, directory: Path, manifest: list):
+        self.directory = directory
+        self.manifest = manifest
+        self.raw = {entry["name"]: (directory / entry["name"]).read_bytes() for entry in manifest}
+        self._texts = None
+        # Stores and clients a stage opened, closed once every stage has run.
+        self.closing = contextlib.ExitStack()
+
+    def files(self, file_type: str) -> list:
+        return [(entry["name"], self.raw[entry["name"]]) for entry in self.manifest
+                if entry["file_type"] == file_type]
+
+    @property
+    def texts(self) -> list:
+        """Extracted text of every PDF, email and text file."""
+        if self._texts is None:
+            from utils.email_parser import parse_email
+            from utils.file_utils import read_text
+            from utils.pdf_parser import extract_text_from_pdf
+
+            self._texts = (
+                [extract_text_from_pdf(raw, workers=1) for _, raw in self.files("pdf")]
+                + [parse_email(raw)["body"] for _, raw in self.files("eml")]
+                + [read_text(raw) for _, raw in self.files("txt")]
+            )
+        return self._texts
+
+
+def _classifier():
+    from agents.classifier_agent import ClassifierAgent
+    from memory.shared_memory import SharedMemory
+
+    agent = ClassifierAgent(SharedMemory())
+    try:
+        agent.nlp
+    except (ImportError, OSError) as e:
+        raise StageSkipped(f"spaCy model unavailable: {e}")
+    return agent
+
+
+@stage("pdf_extraction")
+def pdf_extraction(corpus: Corpus):
+    from utils.pdf_parser import extract_pages, open_pdf
+
+    pdfs = [raw for _, raw in corpus.files("pdf")]
+    if not pdfs:
+        raise StageSkipped("no PDFs in the corpus")
+    pages = sum(len(open_pdf(raw).pages) for raw in pdfs)
+
+    def run():
+        for raw in pdfs:
+            extract_pages(raw, workers=1)
+    return run, pages
+
+
+@stage("email_parsing")
+def email_parsing(corpus: Corpus):
+    from utils.email_parser import parse_email
+
+    emails = [raw for _, raw in corpus.files("eml")]
+
+    def run():
+        for raw in emails:
+            parse_email(raw)
+    return run, len(emails)
+
+
+@stage("intent_detection")
+def intent_detection(corpus: Corpus):
+    agent = _classifier()
+    texts = corpus.texts
+
+    def run():
+        for text in texts:
+            agent.detect_intent(text)
+    return run, len(texts)
+
+
+@stage("key_phrases")
+def key_phrases(corpus: Corpus):
+    agent = _classifier()
+    texts = corpus.texts
+
+    def run():
+        for text in texts:
+            agent.extract_key_phrases(text)
+    return run, len(texts)
+
+
+@stage("json_validation")
+def json_validation(corpus: Corpus):
+    from agents.json_agent import JSONAgent
+    from memory.shared_memory import SharedMemory
+
+    agent = JSONAgent(SharedMemory())
+    exports = [raw for _, raw in corpus.files("json")]
+    records = sum(agent.process(raw, "count")["stats"]["records"] for raw in exports)
+
+    def run():
+        for number, raw in enumerate(exports):
+            agent.process(raw, f"export-{number}")
+    return run, records
+
+
+def _memory_writes(shared_memory, corpus: Corpus, flush=None):
+    payloads = [
+        (f"doc-{number}", {
+            "classification": {"file_type": entry["file_type"], "intent": entry["intent"],
+                               "key_phrases": ["damaged order", "due date"]},
+            "metadata": {"filename": entry["name"], "size": entry["size"]},
+        })
+        for number, entry in enumerate(corpus.manifest * 25)
+    ]
+
+    corpus.closing.callback(shared_memory.close)
+
+    def run():
+        for doc_id, data in payloads:
+            shared_memory.update(doc_id, data)
+        if flush is not None:
+            flush()
+    return run, len(payloads)
+
+
+@stage("memory_writes")
+def memory_writes(corpus: Corpus):
+    from memory.shared_memory import SharedMemory
+
+    return _memory_writes(SharedMemory(), corpus)
+
+
+@stage("memory_writes_sqlite")
+def memory_writes_sqlite(corpus: Corpus):
+    from memory.shared_memory import SharedMemory
+
+    shared_memory = SharedMemory(sqlite_path=str(corpus.directory / "bench-memory.db"))
+    # Writes are committed on the store's writer thread; time them to the commit.
+    return _memory_writes(shared_memory, corpus, flush=shared_memory.store.flush)
+
+
+@stage("end_to_end")
+def end_to_end(corpus: Corpus):
+    # Measure real processing: no result cache, no background warm-up.
+    os.environ.setdefault("RESULT_CACHE_ENABLED", "0")
+    os.environ.setdefault("STARTUP_MODE", "lazy")
+    if any(entry["file_type"] != "json" for entry in corpus.manifest):
+        _classifier()
+    from fastapi.testclient import TestClient
+
+    import main
+
+    client = TestClient(main.app)
+    uploads = [(entry["name"], corpus.raw[entry["name"]]) for entry in corpus.manifest]
+
+    def run():
+        for name, raw in uploads:
+            response = client.post("/process", files={"file": (name, raw)})
+            response.raise_for_status()
+    return run, len(uploads)
+
+
+def measure(run, items: int, repeat: int) -> dict:
+    run()  # warm-up: lazy imports, model pipes, caches
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times)
+    return {
+        "status": "ok",
+        "items": items,
+        "min_s": round(min(times), 6),
+        "median_s": round(median, 6),
+        "items_per_second": round(items / median, 2) if median else None,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> dict:
+    """Median time of each stage relative to the baseline; slower than ``threshold`` is a regression."""
+    comparison = {}
+    for name, result in results["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if result["status"] != "ok" or not before or before.get("status") != "ok":
+            continue
+        change = result["median_s"] / before["median_s"] - 1 if before["median_s"] else 0.0
+        comparison[name] = {
+            "baseline_median_s": before["median_s"],
+            "median_s": result["median_s"],
+            "change": round(change, 4),
+            "regression": change > threshold,
+        }
+    return comparison
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--mix", default=",".join(f"{t}={w}" for t, w in DEFAULT_MIX.items()),
+                        help="file type weights, e.g. pdf=2,eml=4,json=2,txt=2")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-pdf-pages", type=int, default=20)
+    parser.add_argument("--max-attachment-kb", type=int, default=256)
+    parser.add_argument("--json-records", type=int, default=2000)
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of stages")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--corpus-dir", help="keep the generated corpus here instead of a temp dir")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    corpus_options = {
+        "documents": args.documents,
+        "mix": parse_mix(args.mix),
+        "seed": args.seed,
+        "max_pdf_pages": args.max_pdf_pages,
+        "max_attachment_kb": args.max_attachment_kb,
+        "json_records": args.json_records,
+    }
+    names = [name.strip() for name in args.stages.split(",") if name.strip()]
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(args.corpus_dir or tmp)
+        corpus = Corpus(directory, generate_corpus(directory, **corpus_options))
+        results = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "git_revision": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "repeat": args.repeat,
+                "corpus": corpus_options,
+            },
+            "stages": {},
+        }
+        with corpus.closing:
+            for name in names:
+                try:
+                    run, items = STAGES[name](corpus)
+                    results["stages"][name] = measure(run, items, args.repeat)
+                except StageSkipped as e:
+                    results["stages"][name] = {"status": "skipped", "reason": str(e)}
+                result = results["stages"][name]
+                if result["status"] == "ok":
+                    print(f"{name:22} {result['median_s']:9.4f}s  {result['items_per_second']:>12} items/s",
+                          file=sys.stderr)
+                else:
+                    print(f"{name:22} skipped: {result['reason']}", file=sys.stderr)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        if baseline.get("meta", {}).get("corpus") != corpus_options:
+            print("warning: baseline was measured on a different corpus", file=sys.stderr)
+        results["comparison"] = compare(results, baseline, args.threshold)
+        for name, change in results["comparison"].items():
+            flag = "REGRESSION" if change["regression"] else "ok"
+            print(f"{name:22} {change['change']:+8.1%}  {flag}", file=sys.stderr)
+        regressions = [name for name, change in results["comparison"].items() if change["regression"]]
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
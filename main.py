@@ -1,30 +1,250 @@
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
 import os
+import sys
+import gc
 import uuid
+import asyncio
 import logging
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 
+# Before the project imports: some of them read settings at import time.
+load_dotenv()
+
 from agents.classifier_agent import ClassifierAgent
+from memory.result_cache import ResultCache
+from memory.search_index import SearchIndex
+from memory.secondary_index import decode_cursor, encode_cursor
 from memory.shared_memory import SharedMemory
+from memory.template_index import TemplateIndex
+from utils.executor import ClassifierExecutor, ExecutorSaturated
+from utils.jobs import Job, JobQueue, QueueFull, job_priority
+from utils.mailbox_ingest import (
+    MAILBOX_BATCH_SIZE, MAILBOX_WORKERS, MailboxIngestor, default_checkpoint_path, mailbox_format,
+)
+from utils import metrics
+from utils.uploads import MAX_UPLOAD_BYTES, UploadLimitMiddleware, persist_upload
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
 app = FastAPI(
     title="Multi-Agent Document Processor",
     description="AI system for processing PDF, JSON, and Email documents",
     version="1.0.0"
 )
+app.add_middleware(UploadLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES)
+
+SUPPORTED_EXTENSIONS = ["pdf", "json", "ndjson", "jsonl", "txt", "eml"]
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "32"))
+BATCH_N_PROCESS = int(os.getenv("BATCH_N_PROCESS", "1"))
+# Upper bound on the n_process a client may ask for: each is a spaCy process.
+BATCH_N_PROCESS_MAX = int(os.getenv("BATCH_N_PROCESS_MAX", "0")) or os.cpu_count() or 1
+# lazy: load models on first use; background: warm up after startup;
+# eager: load at import, so pre-forked workers (gunicorn --preload) inherit them
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
+# Directory server-side mailboxes may be ingested from; unset disables the endpoint.
+MAILBOX_ROOT = os.getenv("MAILBOX_ROOT")
+
+startup_timings = {}
+ingesting = set()
+
+shared_memory = SharedMemory.from_env()
+result_cache = ResultCache.from_env(shared_memory)
+template_index = TemplateIndex.from_env()
+search_index = SearchIndex.from_env()
+classifier_agent = ClassifierAgent(shared_memory, result_cache, template_index, search_index)
+classifier_executor = ClassifierExecutor.from_env(classifier_agent)
+
+
+# file_type of jobs that ingest a server-side mailbox instead of an upload.
+MAILBOX_JOB = "mailbox"
+
+
+async def run_job(job: Job) -> dict:
+    """Classify a queued upload; waits for a free executor slot instead of failing."""
+    if job.file_type == MAILBOX_JOB:
+        return await asyncio.to_thread(ingest_mailbox_job, job, asyncio.get_running_loop())
+    try:
+        result = await run_classifier(
+            "process", content=job.content, file_type=job.file_type, doc_id=job.id, metadata=job.metadata
+        )
+    except asyncio.TimeoutError:
+        raise RuntimeError("Document processing timed out")
+    return finish_result(result, job.file_type, job.metadata["size"], timings=True)
+
+
+async def run_classifier(method: str, **kwargs):
+    """``classifier_executor.run`` that waits for a free slot instead of failing."""
+    while True:
+        try:
+            return await classifier_executor.run(method, **kwargs)
+        except ExecutorSaturated as e:
+            await asyncio.sleep(e.retry_after)
+
+
+def ingest_mailbox_job(job: Job, loop: asyncio.AbstractEventLoop) -> dict:
+    def process_batch(documents: list, batch_size: int) -> list:
+        # Single-worker runs share the classifier executor (and its backend
+        # and bound) with uploads instead of classifying in this thread.
+        try:
+            return asyncio.run_coroutine_threadsafe(
+                run_classifier("process_batch", documents=documents, batch_size=batch_size), loop
+            ).result()
+        except asyncio.TimeoutError:
+            raise RuntimeError("Mailbox batch processing timed out")
+
+    ingestor = MailboxIngestor(
+        classifier_agent,
+        batch_size=job.metadata["batch_size"],
+        workers=job.metadata["workers"],
+        checkpoint_path=default_checkpoint_path(job.content),
+        process_batch=process_batch,
+    )
+    return ingestor.ingest(job.content, resume=not job.metadata["restart"])
+
+
+async def finish_job(job: Job):
+    if job.file_type == MAILBOX_JOB:
+        # The content is the mailbox itself, not a stored upload.
+        ingesting.discard(job.content)
+    else:
+        discard_content(job.content)
+    if job.status == "failed":
+        metrics.record_error(job.file_type, "failed")
+    # Lets GET /jobs/{id} answer from memory once the job has left the queue's
+    # history; queued and running jobs are always in the queue itself.
+    await shared_memory.aupdate(job.id, {"job": job.to_dict(include_result=False)})
+
+
+job_queue = JobQueue(
+    run_job,
+    on_finish=finish_job,
+    retry_after=classifier_executor.retry_after,
+)
+
+
+def warm_up():
+    try:
+        start = time.perf_counter()
+        startup_timings["warm_up"] = classifier_agent.warm_up()
+        startup_timings["warm_up_s"] = time.perf_counter() - start
+        logger.info(f"Warm-up finished in {startup_timings['warm_up_s']:.2f}s")
+    except Exception as e:
+        logger.error(f"Warm-up failed: {str(e)}", exc_info=True)
+
+
+if STARTUP_MODE == "eager":
+    warm_up()
+    # Keep the preloaded objects out of the collector so forked workers do
+    # not dirty (and copy) their pages when gc runs.
+    gc.freeze()
+
+startup_timings["import_s"] = time.perf_counter() - IMPORT_STARTED
+logger.info(f"Imported in {startup_timings['import_s']:.2f}s (startup mode '{STARTUP_MODE}')")
+
+
+@app.on_event("startup")
+async def connect_memory():
+    await shared_memory.connect()
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    job_queue.start()
 
-shared_memory = SharedMemory()
-classifier_agent = ClassifierAgent(shared_memory)
+
+@app.on_event("startup")
+async def start_warm_up():
+    if STARTUP_MODE == "background" and not classifier_agent.is_ready:
+        asyncio.get_running_loop().run_in_executor(None, warm_up)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await job_queue.stop()
+    classifier_executor.shutdown()
+    # The PDF page pool only exists if a large PDF was ever extracted.
+    if "utils.pdf_parser" in sys.modules:
+        sys.modules["utils.pdf_parser"].shutdown_pool()
+    if search_index is not None:
+        # Writes the documents indexed since the last segment flush.
+        await asyncio.to_thread(search_index.close)
+    await shared_memory.aclose()
+
+
+async def run_classifier(method, *args, **kwargs):
+    try:
+        start = time.perf_counter()
+        result = await classifier_executor.run(method, *args, **kwargs)
+        if "first_request_s" not in startup_timings:
+            startup_timings["first_request_s"] = time.perf_counter() - start
+            logger.info(f"First request classified in {startup_timings['first_request_s']:.2f}s")
+        return result
+    except ExecutorSaturated as e:
+        metrics.record_error(kwargs.get("file_type", "batch"), "busy")
+        raise HTTPException(
+            status_code=503,
+            detail="Classifier is busy, retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except asyncio.TimeoutError:
+        metrics.record_error(kwargs.get("file_type", "batch"), "timeout")
+        raise HTTPException(status_code=504, detail="Document processing timed out")
+
+
+async def upload_content(file: UploadFile):
+    """What the classifier reads an upload from, without loading it into memory.
+
+    The multipart parser already spooled the body to a temp file; threads
+    read that handle directly, worker processes get a copy on disk by path.
+    """
+    if classifier_executor.backend == "process":
+        return await asyncio.to_thread(persist_upload, file.file)
+    return file.file
+
+
+def discard_content(content):
+    if isinstance(content, Path):
+        content.unlink(missing_ok=True)
+
+
+def finish_result(result: dict, file_type: str, size, timings: bool) -> dict:
+    """Record the result's metrics; its ``timings`` block is kept only on request."""
+    metrics.record_document(file_type, size, result)
+    if not timings:
+        result.pop("timings", None)
+    return result
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    ready = classifier_agent.is_ready or STARTUP_MODE == "lazy"
+    return JSONResponse(
+        {
+            "status": "ready" if ready else "loading",
+            "startup_mode": STARTUP_MODE,
+            "models_loaded": classifier_agent.is_ready,
+            "timings": startup_timings,
+        },
+        status_code=200 if ready else 503
+    )
 
 
 @app.post("/process")
-async def process_document(file: UploadFile = File(...)):
+async def process_document(file: UploadFile = File(...), timings: bool = False):
     try:
         if not file:
             raise HTTPException(status_code=400, detail="No file provided")
@@ -32,35 +252,311 @@ async def process_document(file: UploadFile = File(...)):
         filename = file.filename or "untitled"
         file_extension = filename.split('.')[-1].lower() if '.' in filename else ''
 
-        if file_extension not in ["pdf", "json", "txt", "eml"]:
+        if file_extension not in SUPPORTED_EXTENSIONS:
+            metrics.record_error("other", "unsupported")
             raise HTTPException(status_code=415, detail="Unsupported file type")
 
-        file_content = await file.read()
+        content = await upload_content(file)
+        try:
+            result = await run_classifier(
+                "process",
+                content=content,
+                file_type=file_extension,
+                doc_id=str(uuid.uuid4()),
+                metadata={
+                    "filename": filename,
+                    "size": file.size
+                }
+            )
+        finally:
+            discard_content(content)
+
+        return JSONResponse(finish_result(result, file_extension, file.size, timings))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Processing error: {str(e)}", exc_info=True)
+        metrics.record_error(file_extension, "failed")
+        raise HTTPException(status_code=500, detail="File processing failed")
+
+
+def queue_full(file_type: str) -> HTTPException:
+    metrics.record_error(file_type, "busy")
+    return HTTPException(
+        status_code=429,
+        detail="Job queue is full, retry later",
+        headers={"Retry-After": str(job_queue.retry_after)}
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...), priority: Optional[int] = None):
+    """Queue a document and return its job (and document) id right away.
+
+    Cheap, small documents are scheduled ahead of large PDFs unless
+    ``priority`` (lower runs first) is given. 429 when the queue is full.
+    """
+    filename = file.filename or "untitled"
+    file_extension = filename.split('.')[-1].lower() if '.' in filename else ''
+    if file_extension not in SUPPORTED_EXTENSIONS:
+        metrics.record_error("other", "unsupported")
+        raise HTTPException(status_code=415, detail="Unsupported file type")
+
+    if job_queue.full():
+        raise queue_full(file_extension)
+
+    # The spooled upload is closed with the request, so the job gets its own copy.
+    content = await asyncio.to_thread(persist_upload, file.file)
+    job = Job(
+        str(uuid.uuid4()),
+        content,
+        file_extension,
+        {"filename": filename, "size": file.size},
+        job_priority(file_extension, file.size) if priority is None else priority,
+    )
+    try:
+        job_queue.submit(job)
+    except QueueFull:
+        discard_content(content)
+        raise queue_full(file_extension)
+
+    return JSONResponse(
+        {**job.to_dict(), "status_url": f"/jobs/{job.id}"},
+        status_code=202,
+        headers={"Location": f"/jobs/{job.id}"}
+    )
+
+
+@app.get("/jobs")
+async def job_stats():
+    return job_queue.stats()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is not None:
+        return JSONResponse(job.to_dict())
 
-        result = classifier_agent.process(
-            content=file_content,
-            file_type=file_extension,
-            doc_id=str(uuid.uuid4()),
-            metadata={
+    record = await shared_memory.aget_document_history(job_id)
+    if not record or "job" not in record["data"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # Dropped from the in-process history: the outcome is in shared memory.
+    return JSONResponse({**record["data"]["job"], "memory": record["data"]})
+
+
+@app.post("/process/batch")
+async def process_batch(
+    files: List[UploadFile] = File(...),
+    batch_size: int = BATCH_SIZE,
+    n_process: int = Query(BATCH_N_PROCESS, ge=1, le=BATCH_N_PROCESS_MAX),
+    timings: bool = False,
+):
+    documents, results = [], [None] * len(files)
+    for index, file in enumerate(files):
+        filename = file.filename or "untitled"
+        file_extension = filename.split('.')[-1].lower() if '.' in filename else ''
+        doc_id = str(uuid.uuid4())
+
+        if file_extension not in SUPPORTED_EXTENSIONS:
+            metrics.record_error("other", "unsupported")
+            results[index] = {
+                "document_id": doc_id,
+                "file_type": file_extension,
+                "status": "failed",
+                "error": "Unsupported file type",
+            }
+            continue
+
+        documents.append((index, {
+            "content": await upload_content(file),
+            "file_type": file_extension,
+            "doc_id": doc_id,
+            "metadata": {
                 "filename": filename,
-                "size": len(file_content)
+                "size": file.size
             }
+        }))
+
+    try:
+        batch_results = await run_classifier(
+            "process_batch",
+            [document for _, document in documents],
+            batch_size=batch_size,
+            n_process=n_process,
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch processing error: {str(e)}", exc_info=True)
+        metrics.record_error("batch", "failed")
+        raise HTTPException(status_code=500, detail="Batch processing failed")
+    finally:
+        for _, document in documents:
+            discard_content(document["content"])
 
-        return JSONResponse(result)
+    for (index, document), result in zip(documents, batch_results):
+        results[index] = finish_result(
+            result, document["file_type"], document["metadata"]["size"], timings
+        )
 
-    except Exception as e:
-        logger.error(f"Processing error: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail="File processing failed")
+    return JSONResponse({"count": len(results), "results": results})
+
+
+@app.post("/ingest/mailbox", status_code=202)
+async def ingest_mailbox(
+    path: str,
+    restart: bool = False,
+    batch_size: int = Query(MAILBOX_BATCH_SIZE, ge=1, le=10000),
+    workers: int = Query(1, ge=1, le=MAILBOX_WORKERS),
+):
+    """Queue a job classifying every message of an mbox file or Maildir under ``MAILBOX_ROOT``.
+
+    Poll ``GET /jobs/{id}`` for the run totals. Progress is checkpointed next
+    to the mailbox; ingesting it again resumes after the last committed batch
+    unless ``restart`` is set.
+    """
+    if not MAILBOX_ROOT:
+        raise HTTPException(status_code=403, detail="Mailbox ingestion is disabled")
+
+    root = Path(MAILBOX_ROOT).resolve()
+    source = (root / path).resolve()
+    if not source.is_relative_to(root) or not source.exists():
+        raise HTTPException(status_code=404, detail="Mailbox not found")
+    if source in ingesting:
+        raise HTTPException(status_code=409, detail="Mailbox is already being ingested")
+    try:
+        mailbox_format(source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job = Job(
+        str(uuid.uuid4()),
+        source,
+        MAILBOX_JOB,
+        {"path": path, "restart": restart, "batch_size": batch_size, "workers": workers, "size": None},
+        job_priority(MAILBOX_JOB, source.stat().st_size if source.is_file() else None),
+    )
+    try:
+        job_queue.submit(job)
+    except QueueFull:
+        raise queue_full(MAILBOX_JOB)
+    ingesting.add(source)
+
+    return JSONResponse(
+        {**job.to_dict(), "status_url": f"/jobs/{job.id}"},
+        status_code=202,
+        headers={"Location": f"/jobs/{job.id}"}
+    )
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    if result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **result_cache.stats()}
+
+
+@app.get("/templates/stats")
+async def template_stats():
+    # With CLASSIFIER_BACKEND=process each worker keeps its own index; this
+    # one only sees documents classified in the API process.
+    if template_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **template_index.stats()}
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds or an ISO 8601 date/datetime (local time unless it has an offset)."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time '{value}': use epoch seconds or ISO 8601")
+
+
+@app.get("/memory")
+async def query_memory(
+    intent: Optional[str] = None,
+    file_type: Optional[str] = None,
+    crm_action: Optional[str] = None,
+    urgency: Optional[str] = None,
+    sender: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+):
+    """Documents matching every given attribute, newest first; pass ``next_cursor`` back for the next page."""
+    try:
+        records = await asyncio.to_thread(
+            shared_memory.query,
+            since=parse_time(since),
+            until=parse_time(until),
+            limit=limit,
+            cursor=decode_cursor(cursor) if cursor else None,
+            intent=intent,
+            file_type=file_type,
+            crm_action=crm_action,
+            urgency=urgency,
+            sender=sender,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    next_cursor = None
+    if len(records) == limit:
+        next_cursor = encode_cursor(records[-1]["timestamp"], records[-1]["doc_id"])
+    return {"items": records, "next_cursor": next_cursor}
+
+
+@app.get("/search")
+async def search(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=100),
+    file_type: Optional[str] = None,
+):
+    """Documents whose text matches ``q``, best BM25 score first."""
+    if search_index is None:
+        raise HTTPException(status_code=404, detail="Search is disabled (set SEARCH_INDEX_DIR)")
+    hits = await asyncio.to_thread(search_index.search, q, limit=limit, file_type=file_type)
+    return {"query": q, "hits": hits}
+
+
+@app.get("/search/stats")
+async def search_stats():
+    if search_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **search_index.stats()}
+
+
+@app.get("/memory/stats")
+async def memory_stats():
+    return await shared_memory.astats()
 
 
 @app.get("/memory/{doc_id}")
 async def get_memory(doc_id: str):
     try:
-        memory_data = shared_memory.get_document_history(doc_id)
+        memory_data = await shared_memory.aget_document_history(doc_id)
         if not memory_data:
             raise HTTPException(status_code=404, detail="Document not found")
         return JSONResponse(memory_data)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Memory retrieval failed: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
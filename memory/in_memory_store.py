@@ -0,0 +1,172 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional
+import logging
+
+
+class InMemoryStore:
+    """Bounded LRU store for ``SharedMemory`` records.
+
+    Limits are optional: ``max_entries``, ``max_bytes`` (approximate, measured
+    as the size of each record's JSON) and ``ttl`` in seconds. Entries pushed
+    out by the size limits are written to a small SQLite spill file when
+    ``spill_dir`` is set, so recently evicted documents can still be read.
+    ``on_remove(doc_id)`` is called for every record that is gone for good
+    (expired, cleared, or evicted without a spill file).
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None, spill_dir: Optional[str] = None,
+                 spill_max_entries: int = 100_000, on_remove: Optional[Callable[[str], None]] = None):
+        self.logger = logging.getLogger("InMemoryStore")
+        self.on_remove = on_remove
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_max_entries = spill_max_entries
+
+        self._entries = OrderedDict()  # doc_id -> (record, size, expires_at)
+        self._lock = threading.RLock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.spilled = 0
+        self.spill_hits = 0
+
+        self._spill = None
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._spill = sqlite3.connect(
+                os.path.join(spill_dir, "memory_spill.db"), check_same_thread=False
+            )
+            self._spill.execute(
+                "CREATE TABLE IF NOT EXISTS spill ("
+                "doc_id TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def get(self, doc_id: str, record_stats: bool = True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is not None and self._expired(entry[2]):
+                self._remove(doc_id)
+                self.expirations += 1
+                self._removed(doc_id)
+                entry = None
+
+            if entry is not None:
+                self._entries.move_to_end(doc_id)
+                self.hits += record_stats
+                return entry[0]
+
+            record = self._read_spill(doc_id)
+            if record is not None:
+                self.spill_hits += record_stats
+                return record
+
+            self.misses += record_stats
+            return None
+
+    def set(self, doc_id: str, record: Dict[str, Any]):
+        size = len(json.dumps(record, default=str))
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            if doc_id in self._entries:
+                self._remove(doc_id)
+            self._entries[doc_id] = (record, size, expires_at)
+            self.bytes += size
+            self._evict()
+
+    def items(self):
+        with self._lock:
+            return [(doc_id, entry[0]) for doc_id, entry in self._entries.items()
+                    if not self._expired(entry[2])]
+
+    def clear(self):
+        with self._lock:
+            doc_ids = list(self._entries)
+            self._entries.clear()
+            self.bytes = 0
+        for doc_id in doc_ids:
+            self._removed(doc_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._entries
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "spilled": self.spilled,
+                "spill_hits": self.spill_hits,
+            }
+
+    def _expired(self, expires_at: Optional[float]) -> bool:
+        return expires_at is not None and expires_at <= time.time()
+
+    def _remove(self, doc_id: str):
+        _, size, _ = self._entries.pop(doc_id)
+        self.bytes -= size
+
+    def _evict(self):
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            doc_id, (record, size, expires_at) = self._entries.popitem(last=False)
+            self.bytes -= size
+            if self._expired(expires_at):
+                self.expirations += 1
+                self._removed(doc_id)
+                continue
+            self.evictions += 1
+            if self._spill is None:
+                self._removed(doc_id)
+            self._write_spill(doc_id, record, expires_at)
+
+    def _removed(self, doc_id: str):
+        if self.on_remove is not None:
+            self.on_remove(doc_id)
+
+    def _write_spill(self, doc_id: str, record: Dict[str, Any], expires_at: Optional[float]):
+        if self._spill is None:
+            return
+        try:
+            with self._spill:
+                self._spill.execute(
+                    "INSERT OR REPLACE INTO spill (doc_id, payload, expires_at) VALUES (?, ?, ?)",
+                    (doc_id, json.dumps(record, default=str), expires_at),
+                )
+                self._spill.execute(
+                    "DELETE FROM spill WHERE rowid <= (SELECT MAX(rowid) FROM spill) - ?",
+                    (self.spill_max_entries,),
+                )
+            self.spilled += 1
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to spill document {doc_id}: {str(e)}")
+
+    def _read_spill(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        if self._spill is None:
+            return None
+        row = self._spill.execute(
+            "SELECT payload, expires_at FROM spill WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        if row is None or self._expired(row[1]):
+            return None
+        return json.loads(row[0])
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import logging
+
+# Bump whenever classification or agent output changes shape, so stale
+# cached results are never served.
+PIPELINE_VERSION = "3"
+
+
+class ResultCache:
+    """Content-addressed cache of classification results.
+
+    Entries are keyed by a SHA-256 of the uploaded bytes, the file type and the
+    pipeline/model version. The first tier is an in-process LRU bounded by the
+    total size of the stored JSON; the optional second tier is Redis, shared
+    through ``SharedMemory`` when it runs with ``use_redis=True``.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, shared_memory=None,
+                 redis_ttl: Optional[int] = 86400):
+        self.logger = logging.getLogger("ResultCache")
+        self.max_bytes = max_bytes
+        self.shared_memory = shared_memory
+        self.redis_ttl = redis_ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, shared_memory=None):
+        if os.getenv("RESULT_CACHE_ENABLED", "1") != "1":
+            return None
+        ttl = int(os.getenv("RESULT_CACHE_REDIS_TTL", "86400"))
+        return cls(
+            max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            shared_memory=shared_memory,
+            redis_ttl=ttl or None,
+        )
+
+    @staticmethod
+    def make_key(content, file_type: str, version: str) -> str:
+        """``content`` is bytes/str or anything ``open_content`` accepts."""
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        if isinstance(content, bytes):
+            digest = hashlib.sha256(content).hexdigest()
+        else:
+            from utils.file_utils import open_content
+
+            sha = hashlib.sha256()
+            with open_content(content) as fh:
+                for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+        return f"{version}:{file_type}:{digest}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+
+        if payload is None and self._redis_enabled():
+            payload = self.shared_memory.get_cached_result(key)
+            if payload is not None:
+                self._store_local(key, payload)
+
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # Every hit gets its own copy, so callers may rewrite ids freely.
+        return json.loads(payload)
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        payload = json.dumps(entry)
+        self._store_local(key, payload)
+        if self._redis_enabled():
+            try:
+                self.shared_memory.set_cached_result(key, payload, ttl=self.redis_ttl)
+            except Exception as e:
+                self.logger.error(f"Failed to write result cache to Redis: {str(e)}")
+
+    def _store_local(self, key: str, payload: str):
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous)
+            self._entries[key] = payload
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def _redis_enabled(self) -> bool:
+        return self.shared_memory is not None and self.shared_memory.use_redis
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "redis_tier": self._redis_enabled(),
+            }
@@ -0,0 +1,507 @@
+import json
+import math
+import os
+import queue
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("SearchIndex")
+
+# Unset disables full-text search.
+SEARCH_INDEX_DIR = os.getenv("SEARCH_INDEX_DIR")
+SEARCH_SEGMENT_DOCS = int(os.getenv("SEARCH_SEGMENT_DOCS", "10000"))
+SEARCH_FLUSH_SECONDS = float(os.getenv("SEARCH_FLUSH_SECONDS", "30"))
+SEARCH_MERGE_FACTOR = int(os.getenv("SEARCH_MERGE_FACTOR", "8"))
+
+MAX_INDEXED_CHARS = 1_000_000
+MANIFEST = "manifest.json"
+LOCK_FILE = "index.lock"
+_TOKENS = re.compile(r"\w+")
+_FLUSH = object()
+_STOP = object()
+
+
+class SearchIndexLocked(Exception):
+    def __init__(self, directory: str):
+        super().__init__(f"Search index {directory} is in use by another process")
+        self.directory = directory
+
+
+def _lock_directory(directory: str):
+    """Exclusive, non-blocking lock on ``directory`` held for as long as the returned file is open."""
+    fh = open(os.path.join(directory, LOCK_FILE), "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        raise SearchIndexLocked(directory)
+    return fh
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKENS.findall(text[:MAX_INDEXED_CHARS].lower())
+
+
+class MemorySegment:
+    """Mutable segment collecting newly indexed documents until it is flushed."""
+
+    def __init__(self):
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.doc_ids: List[str] = []
+        self.doc_types: List[str] = []
+        self.lengths = array("I")
+        self.started_at: Optional[float] = None
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    @property
+    def total_length(self) -> int:
+        return sum(self.lengths)
+
+    def add(self, doc_id: str, file_type: str, tokens: List[str]):
+        position = len(self.doc_ids)
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        self.doc_ids.append(doc_id)
+        self.doc_types.append(file_type)
+        self.lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array("I"), array("I"))
+            entry[0].append(position)
+            entry[1].append(tf)
+
+    def document_frequency(self, term: str) -> int:
+        entry = self.postings.get(term)
+        return len(entry[0]) if entry else 0
+
+    def term_postings(self, term: str):
+        entry = self.postings.get(term)
+        if entry is None:
+            return None
+        return np.frombuffer(entry[0], dtype=np.uint32).astype(np.int64), np.frombuffer(entry[1], dtype=np.uint32)
+
+    def doc_lengths(self) -> np.ndarray:
+        return np.frombuffer(self.lengths, dtype=np.uint32)
+
+    def types(self) -> np.ndarray:
+        return np.array(self.doc_types)
+
+
+class Segment:
+    """Immutable block of indexed documents, as loaded from one segment file.
+
+    The postings of term ``i`` are ``deltas[offsets[i]:offsets[i + 1]]``:
+    positions of the documents in this segment, delta-encoded, with the
+    term frequencies alongside in ``tfs``.
+    """
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, deltas: np.ndarray, tfs: np.ndarray,
+                 doc_ids: List[str], doc_types: np.ndarray, lengths: np.ndarray, name: Optional[str] = None):
+        self.term_index = {term: index for index, term in enumerate(terms)}
+        self.offsets = offsets
+        self.deltas = deltas
+        self.tfs = tfs
+        self.doc_ids = doc_ids
+        self._types = doc_types
+        self.lengths = lengths
+        self.total_length = int(lengths.sum())
+        self.name = name
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def document_frequency(self, term: str) -> int:
+        index = self.term_index.get(term)
+        return 0 if index is None else int(self.offsets[index + 1] - self.offsets[index])
+
+    def term_postings(self, term: str):
+        index = self.term_index.get(term)
+        if index is None:
+            return None
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return np.cumsum(self.deltas[start:end], dtype=np.int64), self.tfs[start:end]
+
+    def doc_lengths(self) -> np.ndarray:
+        return self.lengths
+
+    def types(self) -> np.ndarray:
+        return self._types
+
+    @classmethod
+    def build(cls, parts: Iterable, name: Optional[str] = None) -> "Segment":
+        """One segment holding the documents of ``parts`` (segments of either kind), in order."""
+        parts = list(parts)
+        bases = np.cumsum([0] + [len(part) for part in parts[:-1]])
+        terms = sorted(set().union(*(part.postings if isinstance(part, MemorySegment) else part.term_index
+                                     for part in parts)))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        deltas, tfs = [], []
+        for index, term in enumerate(terms):
+            positions, frequencies = [], []
+            for base, part in zip(bases, parts):
+                postings = part.term_postings(term)
+                if postings is not None:
+                    positions.append(postings[0] + base)
+                    frequencies.append(postings[1])
+            positions = np.concatenate(positions)
+            deltas.append(np.diff(positions, prepend=0).astype(np.uint32))
+            tfs.append(np.minimum(np.concatenate(frequencies), 65535).astype(np.uint16))
+            offsets[index + 1] = offsets[index] + len(positions)
+
+        return cls(
+            terms,
+            offsets,
+            np.concatenate(deltas) if deltas else np.zeros(0, dtype=np.uint32),
+            np.concatenate(tfs) if tfs else np.zeros(0, dtype=np.uint16),
+            [doc_id for part in parts for doc_id in part.doc_ids],
+            np.concatenate([part.types() for part in parts]) if parts else np.zeros(0, dtype="<U1"),
+            np.concatenate([part.doc_lengths() for part in parts]).astype(np.uint32),
+            name=name,
+        )
+
+    def save(self, path: str):
+        terms = sorted(self.term_index, key=self.term_index.get)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fh:
+            np.savez_compressed(
+                fh,
+                terms=np.frombuffer("\n".join(terms).encode(), dtype=np.uint8),
+                offsets=self.offsets,
+                deltas=self.deltas,
+                tfs=self.tfs,
+                doc_ids=np.frombuffer("\n".join(self.doc_ids).encode(), dtype=np.uint8),
+                doc_types=self._types,
+                lengths=self.lengths,
+            )
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Segment":
+        with np.load(path) as data:
+            terms = data["terms"].tobytes().decode()
+            doc_ids = data["doc_ids"].tobytes().decode()
+            return cls(
+                terms.split("\n") if terms else [],
+                data["offsets"],
+                data["deltas"],
+                data["tfs"],
+                doc_ids.split("\n") if doc_ids else [],
+                data["doc_types"],
+                data["lengths"],
+                name=os.path.basename(path),
+            )
+
+
+class SearchIndex:
+    """Incremental full-text index over processed document text, ranked by BM25.
+
+    ``add`` only queues the text; an indexer thread tokenizes it into an
+    in-memory segment that becomes searchable right away and is written to
+    ``directory`` as an immutable segment file every ``segment_docs``
+    documents (or ``flush_seconds`` after its first one). A merge thread
+    folds the smallest segments together once there are more than
+    ``merge_factor``. The manifest lists the live segment files; segment
+    files not in it are leftovers of an interrupted merge and are removed
+    on open. Only one process may have a directory open at a time
+    (``SearchIndexLocked`` otherwise), so none deletes another's segments.
+    A segment that fails to be written stays searchable in memory and is
+    written with the next flush. A document indexed twice under one id is
+    reported once, with
+    its best score.
+    """
+
+    def __init__(self, directory: str, segment_docs: int = SEARCH_SEGMENT_DOCS,
+                 flush_seconds: float = SEARCH_FLUSH_SECONDS, merge_factor: int = SEARCH_MERGE_FACTOR,
+                 k1: float = 1.2, b: float = 0.75, max_pending: int = 1000):
+        self.directory = directory
+        self.segment_docs = segment_docs
+        self.flush_seconds = flush_seconds
+        self.merge_factor = max(2, merge_factor)
+        self.k1 = k1
+        self.b = b
+        self.merges = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = _lock_directory(directory)
+        manifest = self._read_manifest()
+        self._next_id = manifest.get("next_id", 1)
+        self._segments: List[Any] = [Segment.load(os.path.join(directory, name)) for name in manifest.get("segments", [])]
+        live = set(manifest.get("segments", []))
+        for name in os.listdir(directory):
+            if name.startswith("segment-") and name not in live:
+                os.remove(os.path.join(directory, name))
+
+        self._memory = MemorySegment()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._merge_wanted = threading.Event()
+        self._closed = threading.Event()
+        self._indexer = threading.Thread(target=self._index_loop, name="search-indexer", daemon=True)
+        self._merger = threading.Thread(target=self._merge_loop, name="search-merger", daemon=True)
+        self._indexer.start()
+        self._merger.start()
+        logger.info(f"Search index at {directory}: {len(self)} documents in {len(self._segments)} segments")
+
+    @classmethod
+    def from_env(cls):
+        if not SEARCH_INDEX_DIR:
+            return None
+        try:
+            return cls(SEARCH_INDEX_DIR)
+        except SearchIndexLocked as e:
+            logger.error(f"Full-text search disabled: {str(e)}")
+            return None
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(segment) for segment in self._segments) + len(self._memory)
+
+    def add(self, doc_id: str, text: str, file_type: str):
+        """Queue a document for indexing; blocks only when the indexer is far behind."""
+        self._queue.put((doc_id, text, file_type))
+
+    def add_many(self, documents: Iterable[Tuple[str, str, str]]):
+        for doc_id, text, file_type in documents:
+            self.add(doc_id, text, file_type)
+
+    def flush(self):
+        """Index everything queued so far and write it to a segment file."""
+        done = threading.Event()
+        self._queue.put((_FLUSH, done, None))
+        done.wait()
+
+    def close(self):
+        self.flush()
+        self._closed.set()
+        self._queue.put((_STOP, None, None))
+        self._merge_wanted.set()
+        self._indexer.join()
+        self._merger.join()
+        self._lock_file.close()
+
+    def search(self, query: str, limit: int = 10, file_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Best ``limit`` documents for ``query`` by BM25, optionally of one file type."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or limit <= 0:
+            return []
+
+        with self._lock:
+            segments = list(self._segments)
+            memory = self._memory
+            documents = sum(len(segment) for segment in segments) + len(memory)
+            if not documents:
+                return []
+            total_length = sum(segment.total_length for segment in segments) + memory.total_length
+            frequencies = {
+                term: sum(segment.document_frequency(term) for segment in segments)
+                + memory.document_frequency(term)
+                for term in terms
+            }
+            idf = {term: math.log(1 + (documents - df + 0.5) / (df + 0.5)) for term, df in frequencies.items() if df}
+            average_length = total_length / documents
+            # The in-memory segment keeps changing, so it is scored under the lock.
+            hits = self._score(memory, idf, average_length, limit, file_type)
+
+        for segment in segments:
+            hits.extend(self._score(segment, idf, average_length, limit, file_type))
+
+        best = {}
+        for score, doc_id, doc_type in hits:
+            if doc_id not in best or score > best[doc_id][0]:
+                best[doc_id] = (score, doc_type)
+        ranked = sorted(best.items(), key=lambda item: (-item[1][0], item[0]))[:limit]
+        return [
+            {"document_id": doc_id, "score": round(score, 4), "file_type": doc_type}
+            for doc_id, (score, doc_type) in ranked
+        ]
+
+    def _score(self, segment, idf: Dict[str, float], average_length: float, limit: int,
+               file_type: Optional[str]) -> List[Tuple[float, str, str]]:
+        positions, scores = [], []
+        lengths = None
+        for term, weight in idf.items():
+            postings = segment.term_postings(term)
+            if postings is None:
+                continue
+            if lengths is None:
+                lengths = segment.doc_lengths()
+            term_positions, tfs = postings
+            tf = tfs.astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * lengths[term_positions] / average_length)
+            positions.append(term_positions)
+            scores.append(weight * tf * (self.k1 + 1) / (tf + norm))
+        if not positions:
+            return []
+
+        if len(positions) == 1:
+            documents, totals = positions[0], scores[0]
+        else:
+            documents, inverse = np.unique(np.concatenate(positions), return_inverse=True)
+            totals = np.bincount(inverse, weights=np.concatenate(scores))
+        types = segment.types()
+        if file_type is not None:
+            mask = types[documents] == file_type
+            documents, totals = documents[mask], totals[mask]
+        if len(documents) > limit:
+            top = np.argpartition(-totals, limit - 1)[:limit]
+            documents, totals = documents[top], totals[top]
+        return [(float(score), segment.doc_ids[doc], str(types[doc])) for doc, score in zip(documents, totals)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "documents": sum(len(segment) for segment in self._segments) + len(self._memory),
+                "segments": len(self._segments),
+                "unflushed": len(self._memory) + sum(
+                    len(segment) for segment in self._segments if isinstance(segment, MemorySegment)
+                ),
+                "queued": self._queue.qsize(),
+                "merges": self.merges,
+            }
+
+    def _index_loop(self):
+        while True:
+            try:
+                doc_id, text, file_type = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                self._flush_memory()
+                continue
+            if doc_id is _STOP:
+                return
+            if doc_id is _FLUSH:
+                self._flush_memory()
+                text.set()
+                continue
+
+            tokens = tokenize(text)
+            with self._lock:
+                self._memory.add(doc_id, file_type, tokens)
+                full = len(self._memory) >= self.segment_docs
+                stale = time.monotonic() - self._memory.started_at >= self.flush_seconds
+            if full or stale:
+                self._flush_memory()
+
+    def _flush_memory(self):
+        with self._lock:
+            if len(self._memory):
+                # Searchable while it is being written out.
+                self._segments.append(self._memory)
+                self._memory = MemorySegment()
+            # Includes segments whose earlier write failed.
+            unwritten = [segment for segment in self._segments if isinstance(segment, MemorySegment)]
+        if not unwritten:
+            return
+
+        try:
+            segment = self._write(Segment.build(unwritten, name=self._new_name()))
+        except (OSError, ValueError) as e:
+            documents = sum(len(part) for part in unwritten)
+            logger.error(f"Failed to write search segment, {documents} documents kept in memory: {str(e)}")
+            return
+        self._replace(unwritten, segment)
+        if len(self._segments) > self.merge_factor:
+            self._merge_wanted.set()
+
+    def _merge_loop(self):
+        # Pending merges are finished before close() returns.
+        while True:
+            self._merge_wanted.wait()
+            self._merge_wanted.clear()
+            while self._merge_smallest():
+                pass
+            if self._closed.is_set():
+                return
+
+    def _merge_smallest(self) -> bool:
+        """Merge the ``merge_factor`` smallest segment files into one, if there are too many."""
+        with self._lock:
+            persisted = sorted((s for s in self._segments if isinstance(s, Segment)), key=len)
+            if len(persisted) <= self.merge_factor:
+                return False
+            parts = persisted[:self.merge_factor]
+            # Keep document order (oldest first) within the merged segment.
+            parts.sort(key=self._segments.index)
+        try:
+            merged = self._write(Segment.build(parts, name=self._new_name()))
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to merge search segments: {str(e)}")
+            return False
+        self._replace(parts, merged)
+        self.merges += 1
+        for part in parts:
+            try:
+                os.remove(os.path.join(self.directory, part.name))
+            except OSError:
+                pass
+        logger.info(f"Merged {len(parts)} search segments into {merged.name} ({len(merged)} documents)")
+        return True
+
+    def _new_name(self) -> str:
+        with self._lock:
+            name = f"segment-{self._next_id:06d}.npz"
+            self._next_id += 1
+        return name
+
+    def _write(self, segment: Segment) -> Segment:
+        segment.save(os.path.join(self.directory, segment.name))
+        return segment
+
+    def _replace(self, old: List[Any], new: Segment):
+        """Swap ``old`` segments for ``new`` (at the position of the first) and persist the manifest."""
+        with self._lock:
+            position = min(self._segments.index(segment) for segment in old)
+            remaining = [segment for segment in self._segments if not any(segment is o for o in old)]
+            remaining.insert(position, new)
+            self._segments = remaining
+            names = [segment.name for segment in self._segments if isinstance(segment, Segment)]
+            self._write_manifest({"segments": names, "next_id": self._next_id})
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.directory, MANIFEST)) as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {}
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        path = os.path.join(self.directory, MANIFEST)
+        with open(f"{path}.tmp", "w") as fh:
+            json.dump(manifest, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(f"{path}.tmp", path)
+
+
+class SearchIndexBuffer:
+    """Stand-in for SearchIndex in worker processes: documents are held until
+    the parent drains them into its own index."""
+
+    def __init__(self):
+        self._documents: List[Tuple[str, str, str]] = []
+
+    def add(self, doc_id: str, text: str, file_type: str):
+        self._documents.append((doc_id, text, file_type))
+
+    def drain(self) -> List[Tuple[str, str, str]]:
+        documents, self._documents = self._documents, []
+        return documents
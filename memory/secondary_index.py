@@ -0,0 +1,114 @@
+import base64
+import json
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+# A position in the newest-first order of records: (timestamp, doc_id).
+# Pages continue strictly after the cursor, ties on timestamp broken by doc_id.
+Cursor = Tuple[float, str]
+
+
+def encode_cursor(timestamp: float, doc_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([timestamp, doc_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    try:
+        timestamp, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(timestamp), str(doc_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+
+
+def before_cursor(timestamp: float, doc_id: str, cursor: Optional[Cursor]) -> bool:
+    return cursor is None or (timestamp, doc_id) < cursor
+
+
+class SecondaryIndex:
+    """In-process secondary indexes over SharedMemory records.
+
+    Every record is kept in a time-ordered list of ``(timestamp, doc_id)``
+    and in one sorted posting list per attribute value, so a query walks
+    the smallest matching posting list newest-first from the cursor and
+    stops after ``limit`` hits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._time: List[Cursor] = []
+        self._postings: Dict[Tuple[str, str], List[Cursor]] = {}
+        self._documents: Dict[str, Tuple[float, Dict[str, str]]] = {}
+
+    def add(self, doc_id: str, timestamp: float, attributes: Dict[str, Optional[str]]):
+        values = {name: value for name, value in attributes.items() if value is not None}
+        with self._lock:
+            self._discard(doc_id)
+            entry = (timestamp, doc_id)
+            insort(self._time, entry)
+            for name, value in values.items():
+                insort(self._postings.setdefault((name, value), []), entry)
+            self._documents[doc_id] = (timestamp, values)
+
+    def discard(self, doc_id: str):
+        with self._lock:
+            self._discard(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self._time.clear()
+            self._postings.clear()
+            self._documents.clear()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def query(self, filters: Dict[str, str], since: Optional[float] = None, until: Optional[float] = None,
+              cursor: Optional[Cursor] = None, limit: int = 100) -> List[Cursor]:
+        """``(timestamp, doc_id)`` of up to ``limit`` matching records, newest first.
+
+        ``since`` is inclusive and ``until`` exclusive, as in the SQLite
+        backend's query.
+        """
+        with self._lock:
+            if filters:
+                lists = [self._postings.get(item, []) for item in filters.items()]
+                entries = min(lists, key=len)
+            else:
+                entries = self._time
+
+            position = len(entries)
+            if until is not None:
+                position = bisect_left(entries, (until, ""))
+            if cursor is not None:
+                position = min(position, bisect_left(entries, cursor))
+
+            found = []
+            while position > 0 and len(found) < limit:
+                position -= 1
+                timestamp, doc_id = entries[position]
+                if since is not None and timestamp < since:
+                    break
+                values = self._documents[doc_id][1]
+                if all(values.get(name) == value for name, value in filters.items()):
+                    found.append((timestamp, doc_id))
+            return found
+
+    def _discard(self, doc_id: str):
+        indexed = self._documents.pop(doc_id, None)
+        if indexed is None:
+            return
+        timestamp, values = indexed
+        entry = (timestamp, doc_id)
+        self._remove(self._time, entry)
+        for item in values.items():
+            postings = self._postings[item]
+            self._remove(postings, entry)
+            if not postings:
+                del self._postings[item]
+
+    @staticmethod
+    def _remove(entries: List[Cursor], entry: Cursor):
+        position = bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
@@ -1,65 +1,460 @@
 import json
+import os
+import threading
 import time
-from typing import Dict, Any, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
 import logging
 import redis
+import redis.asyncio as aioredis
+
+from memory.in_memory_store import InMemoryStore
+from memory.secondary_index import Cursor, SecondaryIndex, before_cursor
+from memory.sqlite_store import INDEXED_COLUMNS, SQLiteStore, document_attributes, normalize_sender
+from utils.metrics import timed
+
+# Redis layout: each document is a hash holding "timestamp", "doc_id" and one
+# "data:<field>" JSON value per top-level field; extracted_fields live in a
+# second hash so single fields can be merged atomically.
+# Secondary indexes: "index:time" and one "index:<attribute>:<value>" sorted
+# set per attribute value, scored by the document's timestamp, plus a
+# "<doc_id>:index" hash of the values a document is currently filed under.
+DATA_PREFIX = "data:"
+# Striped locks serialising the read-merge-write of in-process backends, so
+# concurrent writers to one document never lose each other's fields.
+WRITE_LOCK_STRIPES = 64
+FIELDS_MARKER = "has:extracted_fields"
+
+_write_buffer: ContextVar[Optional[Dict[str, Dict[str, Any]]]] = ContextVar(
+    "shared_memory_write_buffer", default=None
+)
 
 
 class SharedMemory:
-    def __init__(self, use_redis=False):
+    def __init__(self, use_redis=False, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, ttl: Optional[float] = None,
+                 spill_dir: Optional[str] = None, redis_url: str = "redis://localhost:6379/0",
+                 pool_size: int = 20, socket_timeout: Optional[float] = 5.0,
+                 connect_timeout: Optional[float] = 2.0, key_prefix: str = "",
+                 redis_client=None, async_redis_client=None, sqlite_path: Optional[str] = None):
         self.logger = logging.getLogger("SharedMemory")
         self.use_redis = use_redis
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self.redis_client = None
+        self.async_redis_client = None
+        self.index = None
+        self._write_locks = [threading.Lock() for _ in range(WRITE_LOCK_STRIPES)]
+        self._store_options = {
+            "max_entries": max_entries, "max_bytes": max_bytes, "ttl": ttl, "spill_dir": spill_dir
+        }
 
         if use_redis:
-            self.redis_client = redis.Redis(
-                host='localhost',
-                port=6379,
-                db=0,
-                decode_responses=True
+            pool_options = {
+                "max_connections": pool_size,
+                "socket_timeout": socket_timeout,
+                "socket_connect_timeout": connect_timeout,
+                "decode_responses": True,
+            }
+            # Both clients draw from explicit, bounded pools: the sync one
+            # serves agents running in worker threads, the async one the
+            # FastAPI handlers.
+            self.redis_client = redis_client or redis.Redis(
+                connection_pool=redis.ConnectionPool.from_url(redis_url, **pool_options)
+            )
+            self.async_redis_client = async_redis_client or aioredis.Redis(
+                connection_pool=aioredis.ConnectionPool.from_url(redis_url, **pool_options)
             )
             try:
                 self.redis_client.ping()
                 self.logger.info("Connected to Redis")
-            except redis.ConnectionError:
+            except redis.RedisError:
                 self.logger.error("Failed to connect to Redis, falling back to in-memory")
                 self.use_redis = False
 
-        if not use_redis:
-            self.in_memory_store = {}
-            self.logger.info("Using in-memory storage")
+        if not self.use_redis:
+            if sqlite_path:
+                self.store = SQLiteStore(sqlite_path)
+                self.logger.info(f"Using SQLite storage at {sqlite_path}")
+            else:
+                self._use_in_memory_store()
+                self.logger.info("Using in-memory storage")
+
+    @property
+    def in_memory_store(self):
+        return self.store
+
+    @classmethod
+    def from_env(cls):
+        def optional(name, cast):
+            value = os.getenv(name)
+            return cast(value) if value else None
+
+        backend = os.getenv("MEMORY_BACKEND", "memory")
+        return cls(
+            use_redis=backend == "redis",
+            sqlite_path=os.getenv("SQLITE_PATH", "memory.db") if backend == "sqlite" else None,
+            max_entries=optional("MEMORY_MAX_ENTRIES", int),
+            max_bytes=optional("MEMORY_MAX_BYTES", int),
+            ttl=optional("MEMORY_TTL", float),
+            spill_dir=optional("MEMORY_SPILL_DIR", str),
+            redis_url=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            pool_size=int(os.getenv("REDIS_POOL_SIZE", "20")),
+            socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", "5")),
+            connect_timeout=float(os.getenv("REDIS_CONNECT_TIMEOUT", "2")),
+            key_prefix=os.getenv("MEMORY_KEY_PREFIX", ""),
+        )
+
+    async def connect(self):
+        """Check the async pool at startup; fall back to in-memory if Redis is gone."""
+        if not self.use_redis:
+            return
+        try:
+            await self.async_redis_client.ping()
+        except redis.RedisError as e:
+            self.logger.error(f"Async Redis ping failed ({str(e)}), falling back to in-memory")
+            self._use_in_memory_store()
+            self.use_redis = False
+
+    def _use_in_memory_store(self):
+        self.index = SecondaryIndex()
+        self.store = InMemoryStore(**self._store_options, on_remove=self.index.discard)
+
+    async def aclose(self):
+        self.close()
+        if self.async_redis_client is not None:
+            await self.async_redis_client.aclose()
+
+    @contextmanager
+    def write_buffer(self):
+        """Coalesce writes made inside the block into one flush per document.
+
+        Agents keep calling ``update``/``append_to_document``; while a buffer is
+        open those calls merge into it (reads see the buffered data) and the
+        outermost block writes everything at once on exit. Nested blocks join
+        the outer buffer. The buffer is per context, so concurrent requests on
+        other threads or tasks never share one.
+        """
+        buffer = _write_buffer.get()
+        if buffer is not None:
+            yield buffer
+            return
+
+        buffer = {}
+        token = _write_buffer.set(buffer)
+        try:
+            yield buffer
+        finally:
+            _write_buffer.reset(token)
+            if buffer:
+                self._flush(buffer)
 
     def update(self, doc_id: str, data: Dict[str, Any]):
-        timestamp = time.time()
-        document_data = {
-            "timestamp": timestamp,
-            "data": data,
-            "doc_id": doc_id
-        }
+        """Set the given top-level fields of a document; other fields are kept."""
+        self._stage(doc_id, self._write(data, {}, False))
 
-        if self.use_redis:
-            self.redis_client.set(doc_id, json.dumps(document_data))
-        else:
-            self.in_memory_store[doc_id] = document_data
+    def update_many(self, documents: Dict[str, Dict[str, Any]]):
+        with self.write_buffer():
+            for doc_id, data in documents.items():
+                self.update(doc_id, data)
+
+    def append_to_document(self, doc_id: str, new_data: Dict[str, Any]):
+        """Like ``update``, but ``extracted_fields`` is merged key by key."""
+        data = {key: value for key, value in new_data.items() if key != "extracted_fields"}
+        self._stage(doc_id, self._write(data, new_data.get("extracted_fields", {}), True))
 
     def get_document_history(self, doc_id: str) -> Optional[Dict[str, Any]]:
         if self.use_redis:
-            data = self.redis_client.get(doc_id)
-            return json.loads(data) if data else None
+            pipe = self.redis_client.pipeline(transaction=False)
+            record = self._parse_record(self._queue_read(pipe, doc_id).execute())
         else:
-            return self.in_memory_store.get(doc_id)
+            record = self.store.get(doc_id)
 
-    def append_to_document(self, doc_id: str, new_data: Dict[str, Any]):
-        existing = self.get_document_history(doc_id)
-        if existing:
-            if "extracted_fields" in existing["data"]:
-                existing["data"]["extracted_fields"].update(new_data.get("extracted_fields", {}))
-            else:
-                existing["data"]["extracted_fields"] = new_data.get("extracted_fields", {})
+        buffer = _write_buffer.get()
+        if buffer and doc_id in buffer:
+            record = self._apply(record, doc_id, buffer[doc_id])
+        return record
 
-            for key, value in new_data.items():
-                if key != "extracted_fields":
-                    existing["data"][key] = value
+    # Async variants for the FastAPI handlers; in-memory mode runs them inline.
 
-            self.update(doc_id, existing["data"])
-        else:
-            self.update(doc_id, new_data)
\ No newline at end of file
+    async def aupdate(self, doc_id: str, data: Dict[str, Any]):
+        await self._aflush({doc_id: self._write(data, {}, False)})
+
+    async def aupdate_many(self, documents: Dict[str, Dict[str, Any]]):
+        await self._aflush({doc_id: self._write(data, {}, False) for doc_id, data in documents.items()})
+
+    async def aappend_to_document(self, doc_id: str, new_data: Dict[str, Any]):
+        data = {key: value for key, value in new_data.items() if key != "extracted_fields"}
+        await self._aflush({doc_id: self._write(data, new_data.get("extracted_fields", {}), True)})
+
+    async def aget_document_history(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        if not self.use_redis:
+            return self.store.get(doc_id)
+        pipe = self.async_redis_client.pipeline(transaction=False)
+        return self._parse_record(await self._queue_read(pipe, doc_id).execute())
+
+    @staticmethod
+    def _write(data, field_merge, touch_fields) -> Dict[str, Any]:
+        return {"data": dict(data), "field_merge": dict(field_merge), "touch_fields": touch_fields}
+
+    def _stage(self, doc_id, write):
+        buffer = _write_buffer.get()
+        if buffer is None:
+            self._flush({doc_id: write})
+            return
+
+        pending = buffer.get(doc_id)
+        if pending is None:
+            buffer[doc_id] = write
+            return
+        data, field_merge = write["data"], write["field_merge"]
+        if "extracted_fields" in data:
+            pending["field_merge"] = {}
+        elif "extracted_fields" in pending["data"] and field_merge:
+            pending["data"]["extracted_fields"] = pending["data"]["extracted_fields"] | field_merge
+            field_merge = {}
+        pending["data"].update(data)
+        pending["field_merge"].update(field_merge)
+        pending["touch_fields"] = pending["touch_fields"] or write["touch_fields"]
+
+    @staticmethod
+    def _apply(record, doc_id, write):
+        data = dict(record["data"]) if record else {}
+        data.update(write["data"])
+        if write["field_merge"] or write["touch_fields"]:
+            data["extracted_fields"] = dict(data.get("extracted_fields") or {}) | write["field_merge"]
+        return {"timestamp": time.time(), "data": data, "doc_id": doc_id}
+
+    def _flush(self, writes: Dict[str, Dict[str, Any]]):
+        with timed("memory_write"):
+            if not self.use_redis:
+                self._flush_in_memory(writes)
+                return
+            now = time.time()
+            pipe = self.redis_client.pipeline(transaction=True)
+            self._queue_writes(pipe, writes, now)
+            indexed = self._queue_index_reads(pipe, writes).execute()[-len(writes):]
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._queue_index_updates(pipe, writes, indexed, now).execute()
+
+    async def _aflush(self, writes: Dict[str, Dict[str, Any]]):
+        with timed("memory_write"):
+            if not self.use_redis:
+                self._flush_in_memory(writes)
+                return
+            now = time.time()
+            pipe = self.async_redis_client.pipeline(transaction=True)
+            self._queue_writes(pipe, writes, now)
+            indexed = (await self._queue_index_reads(pipe, writes).execute())[-len(writes):]
+            pipe = self.async_redis_client.pipeline(transaction=False)
+            await self._queue_index_updates(pipe, writes, indexed, now).execute()
+
+    def _flush_in_memory(self, writes: Dict[str, Dict[str, Any]]):
+        for doc_id, write in writes.items():
+            with self._write_locks[hash(doc_id) % WRITE_LOCK_STRIPES]:
+                existing = self.store.get(doc_id, record_stats=False)
+                record = self._apply(existing, doc_id, write)
+                self.store.set(doc_id, record)
+                if self.index is not None:
+                    self.index.add(doc_id, record["timestamp"], document_attributes(record["data"]))
+
+    def _queue_writes(self, pipe, writes: Dict[str, Dict[str, Any]], now: float):
+        """Queue one MULTI for every buffered document: only the changed hash
+        fields are written and extracted_fields merges happen server-side."""
+        for doc_id, write in writes.items():
+            data = dict(write["data"])
+            replaced_fields = data.pop("extracted_fields", None)
+            mapping = {"timestamp": now, "doc_id": doc_id}
+            mapping.update({DATA_PREFIX + key: json.dumps(value) for key, value in data.items()})
+
+            key, fields_key = self._key(doc_id), self._fields_key(doc_id)
+            field_values = dict(write["field_merge"])
+            if replaced_fields is not None:
+                pipe.delete(fields_key)
+                field_values = dict(replaced_fields) | field_values
+            if replaced_fields is not None or write["touch_fields"]:
+                mapping[FIELDS_MARKER] = 1
+            if field_values:
+                pipe.hset(fields_key, mapping={k: json.dumps(v) for k, v in field_values.items()})
+            pipe.hset(key, mapping=mapping)
+            if self.ttl:
+                pipe.expire(key, int(self.ttl))
+                pipe.expire(fields_key, int(self.ttl))
+        return pipe
+
+    def _queue_index_reads(self, pipe, writes: Dict[str, Dict[str, Any]]):
+        for doc_id in writes:
+            pipe.hgetall(self._attributes_key(doc_id))
+        return pipe
+
+    def _queue_index_updates(self, pipe, writes: Dict[str, Dict[str, Any]], indexed, now: float):
+        """File each written document under its attribute values at ``now``.
+
+        Writes only carry the fields they change, so attributes they do not
+        mention keep the values read from the document's index hash.
+        Entries left behind by concurrent writers are skipped and dropped at
+        query time, as are those of expired documents.
+        """
+        for (doc_id, write), old in zip(writes.items(), indexed):
+            new = dict(old)
+            new.update({
+                name: value for name, value in document_attributes(write["data"]).items() if value is not None
+            })
+            for name, value in old.items():
+                if new.get(name) != value:
+                    pipe.zrem(self._index_key(name, value), doc_id)
+            keys = [self._index_key(name, value) for name, value in new.items()] + [self._time_key()]
+            for key in keys:
+                pipe.zadd(key, {doc_id: now})
+                if self.ttl:
+                    pipe.zremrangebyscore(key, "-inf", f"({now - self.ttl!r}")
+            if new:
+                pipe.hset(self._attributes_key(doc_id), mapping=new)
+                if self.ttl:
+                    pipe.expire(self._attributes_key(doc_id), int(self.ttl))
+        return pipe
+
+    def _queue_read(self, pipe, doc_id: str):
+        pipe.hgetall(self._key(doc_id))
+        pipe.hgetall(self._fields_key(doc_id))
+        return pipe
+
+    @staticmethod
+    def _parse_record(replies) -> Optional[Dict[str, Any]]:
+        stored, fields = replies
+        if not stored:
+            return None
+
+        data = {
+            key[len(DATA_PREFIX):]: json.loads(value)
+            for key, value in stored.items()
+            if key.startswith(DATA_PREFIX)
+        }
+        if FIELDS_MARKER in stored:
+            data["extracted_fields"] = {key: json.loads(value) for key, value in fields.items()}
+        return {"timestamp": float(stored["timestamp"]), "data": data, "doc_id": stored["doc_id"]}
+
+    def _key(self, doc_id: str) -> str:
+        return f"{self.key_prefix}{doc_id}"
+
+    def _fields_key(self, doc_id: str) -> str:
+        return f"{self.key_prefix}{doc_id}:extracted_fields"
+
+    def _attributes_key(self, doc_id: str) -> str:
+        return f"{self.key_prefix}{doc_id}:index"
+
+    def _index_key(self, name: str, value: str) -> str:
+        return f"{self.key_prefix}index:{name}:{value}"
+
+    def _time_key(self) -> str:
+        return f"{self.key_prefix}index:time"
+
+    def stats(self) -> Dict[str, Any]:
+        if self.use_redis:
+            return {"backend": "redis", "entries": self.redis_client.dbsize()}
+        if isinstance(self.store, SQLiteStore):
+            return {"backend": "sqlite", **self.store.stats()}
+        return {"backend": "memory", **self.store.stats(), "indexed": len(self.index)}
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None, limit: int = 100,
+              cursor: Optional[Cursor] = None, **filters) -> List[Dict[str, Any]]:
+        """Records whose indexed attributes (``INDEXED_COLUMNS``) equal ``filters``, newest first.
+
+        ``since`` is inclusive, ``until`` exclusive; ``cursor`` is the
+        ``(timestamp, doc_id)`` of the last record of the previous page. Each
+        backend answers from its indexes, so the cost follows the size of
+        the page rather than of the store.
+        """
+        for name in filters:
+            if name not in INDEXED_COLUMNS:
+                raise ValueError(f"Cannot filter on '{name}'")
+        filters = {name: value for name, value in filters.items() if value is not None}
+        if "sender" in filters:
+            filters["sender"] = normalize_sender(filters["sender"])
+
+        if self.use_redis:
+            return self._query_redis(filters, since, until, cursor, limit)
+        if isinstance(self.store, SQLiteStore):
+            return self.store.query(since=since, until=until, limit=limit, cursor=cursor, **filters)
+
+        records = []
+        while len(records) < limit:
+            page = self.index.query(filters, since, until, cursor, limit - len(records))
+            if not page:
+                break
+            for _, doc_id in page:
+                record = self.store.get(doc_id, record_stats=False)
+                if record is None:
+                    self.index.discard(doc_id)  # dropped from the spill file
+                else:
+                    records.append(record)
+            cursor = page[-1]
+        return records
+
+    def _query_redis(self, filters, since, until, cursor, limit) -> List[Dict[str, Any]]:
+        keys = [self._index_key(name, value) for name, value in filters.items()] or [self._time_key()]
+        key = keys[0]
+        if len(keys) > 1:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for candidate in keys:
+                pipe.zcard(candidate)
+            key = min(zip(pipe.execute(), keys))[1]
+
+        upper = f"({until!r}" if until is not None else "+inf"
+        if cursor is not None and (until is None or cursor[0] < until):
+            upper = repr(cursor[0])  # inclusive; ties are cut by before_cursor
+        lower = repr(since) if since is not None else "-inf"
+
+        # Pages continue from the lowest score seen, skipping the entries
+        # already read at that score, so concurrent re-scoring cannot shift
+        # unread entries past us the way a plain offset would.
+        records, stale, skip = [], [], 0
+        while len(records) < limit:
+            page = self.redis_client.zrevrangebyscore(key, upper, lower, start=skip, num=limit,
+                                                      withscores=True)
+            if not page:
+                break
+            candidates = [(doc_id, score) for doc_id, score in page if before_cursor(score, doc_id, cursor)]
+            pipe = self.redis_client.pipeline(transaction=False)
+            for doc_id, _ in candidates:
+                self._queue_read(pipe, doc_id)
+            replies = pipe.execute()
+            for position, (doc_id, _) in enumerate(candidates):
+                record = self._parse_record(replies[2 * position:2 * position + 2])
+                if record is None:
+                    stale.append(doc_id)
+                elif len(records) < limit and all(
+                    document_attributes(record["data"]).get(name) == value for name, value in filters.items()
+                ):
+                    records.append(record)
+
+            last_score = page[-1][1]
+            ties = sum(1 for _, score in page if score == last_score)
+            skip = ties + (skip if upper == repr(last_score) else 0)
+            upper = repr(last_score)
+
+        if stale:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for index_key in {key, self._time_key()}:
+                pipe.zrem(index_key, *stale)
+            pipe.execute()
+        return records
+
+    def close(self):
+        if not self.use_redis and isinstance(self.store, SQLiteStore):
+            self.store.close()
+
+    async def astats(self) -> Dict[str, Any]:
+        if self.use_redis:
+            return {"backend": "redis", "entries": await self.async_redis_client.dbsize()}
+        return self.stats()
+
+    def get_cached_result(self, key: str) -> Optional[str]:
+        if not self.use_redis:
+            return None
+        return self.redis_client.get(f"{self.key_prefix}result_cache:{key}")
+
+    def set_cached_result(self, key: str, payload: str, ttl: Optional[int] = None):
+        if self.use_redis:
+            self.redis_client.set(f"{self.key_prefix}result_cache:{key}", payload, ex=ttl)
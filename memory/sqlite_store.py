@@ -0,0 +1,273 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from email.utils import parseaddr
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+
+# Columns pulled out of each record so audit queries hit an index instead of
+# parsing every JSON payload.
+INDEXED_COLUMNS = ("intent", "file_type", "crm_action", "urgency", "sender")
+
+_STOP = object()
+
+
+def normalize_sender(sender: Optional[str]) -> Optional[str]:
+    """Bare lower-case address of a From value, so "Ann <ann@x.com>" matches "ann@x.com"."""
+    if not sender:
+        return None
+    address = parseaddr(str(sender))[1]
+    return (address or str(sender)).strip().lower()
+
+
+def document_attributes(data: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """Indexed attributes of a SharedMemory record's ``data``."""
+    classification = data.get("classification") or {}
+    processing = data.get("processing_result") or {}
+    email = data.get("email_processing") or {}
+    email_fields = email.get("extracted_fields") or {}
+    metadata = data.get("metadata") or {}
+    # "unknown" is no answer: a more specific agent's intent takes precedence.
+    intents = (classification.get("intent"), processing.get("intent"))
+    return {
+        "intent": next((intent for intent in intents if intent and intent != "unknown"), None),
+        "file_type": classification.get("file_type"),
+        "crm_action": email.get("crm_action"),
+        "urgency": email_fields.get("urgency"),
+        "sender": normalize_sender(metadata.get("sender") or email_fields.get("sender")),
+    }
+
+
+class SQLiteStore:
+    """Durable SharedMemory backend on SQLite.
+
+    The database runs in WAL mode so readers never block the writer. Writes
+    are queued and a background thread commits them in batches of up to
+    ``batch_size`` rows (or whatever arrived within ``flush_interval``
+    seconds) per transaction. Until a write is committed it is served from
+    an in-process pending map, so readers always see their own writes.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1000, flush_interval: float = 0.05):
+        self.logger = logging.getLogger("SQLiteStore")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._local = threading.local()
+        self.batches = 0
+        self.rows_written = 0
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id     TEXT PRIMARY KEY,
+                timestamp  REAL NOT NULL,
+                intent     TEXT,
+                file_type  TEXT,
+                crm_action TEXT,
+                urgency    TEXT,
+                sender     TEXT,
+                payload    TEXT NOT NULL
+            );
+            """
+        )
+        self._migrate(conn)
+        conn.executescript(
+            """
+            CREATE INDEX IF NOT EXISTS idx_documents_timestamp ON documents (timestamp);
+            CREATE INDEX IF NOT EXISTS idx_documents_intent ON documents (intent, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_documents_file_type ON documents (file_type, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_documents_crm_action ON documents (crm_action, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_documents_urgency ON documents (urgency, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_documents_sender ON documents (sender, timestamp);
+            """
+        )
+
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+        self._writer.start()
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Bring databases created before the urgency column (and normalized senders) up to date."""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+        if "urgency" in columns:
+            return
+        conn.create_function("normalize_sender", 1, normalize_sender)
+        with conn:
+            conn.execute("ALTER TABLE documents ADD COLUMN urgency TEXT")
+            conn.execute(
+                "UPDATE documents SET sender = normalize_sender(sender), urgency = "
+                "json_extract(payload, '$.data.email_processing.extracted_fields.urgency')"
+            )
+        self.logger.info("Added the urgency column to the documents table")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, doc_id: str, record_stats: bool = True) -> Optional[Dict[str, Any]]:
+        with self._pending_lock:
+            record = self._pending.get(doc_id)
+        if record is None:
+            row = self._connection().execute(
+                "SELECT payload FROM documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+            record = json.loads(row[0]) if row else None
+
+        if record_stats:
+            if record is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return record
+
+    def set(self, doc_id: str, record: Dict[str, Any]):
+        with self._pending_lock:
+            self._pending[doc_id] = record
+        self._queue.put((doc_id, record))
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              limit: int = 100, cursor: Optional[Tuple[float, str]] = None, **filters) -> List[Dict[str, Any]]:
+        """Records matching ``filters`` (any of INDEXED_COLUMNS), newest first.
+
+        ``cursor`` is the ``(timestamp, doc_id)`` of the last record of the
+        previous page. Writes still waiting for the writer thread are matched
+        in Python and take the place of their committed rows.
+        """
+        clauses, params = [], []
+        for column, value in filters.items():
+            if column not in INDEXED_COLUMNS:
+                raise ValueError(f"Cannot filter on '{column}'")
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        filters = {column: value for column, value in filters.items() if value is not None}
+        if cursor is not None:
+            clauses.append("(timestamp < ? OR (timestamp = ? AND doc_id < ?))")
+            params.extend([cursor[0], cursor[0], cursor[1]])
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+
+        with self._pending_lock:
+            pending = dict(self._pending)
+        where = " AND ".join(clauses) or "1"
+        # Rows superseded by a pending write are skipped, so read that many more.
+        rows = self._connection().execute(
+            f"SELECT timestamp, doc_id, payload FROM documents WHERE {where} "
+            "ORDER BY timestamp DESC, doc_id DESC LIMIT ?",
+            params + [limit + len(pending)],
+        ).fetchall()
+        matches = [row for row in rows if row[1] not in pending]
+        for doc_id, record in pending.items():
+            timestamp = record.get("timestamp", time.time())
+            attributes = document_attributes(record.get("data") or {})
+            if (
+                all(attributes[column] == value for column, value in filters.items())
+                and (cursor is None or (timestamp, doc_id) < tuple(cursor))
+                and (since is None or timestamp >= since)
+                and (until is None or timestamp < until)
+            ):
+                matches.append((timestamp, doc_id, record))
+        matches.sort(key=lambda match: (match[0], match[1]), reverse=True)
+        return [json.loads(payload) if isinstance(payload, str) else payload
+                for _, _, payload in matches[:limit]]
+
+    def flush(self):
+        """Block until every queued write is committed."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._writer.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._pending_lock:
+            pending = len(self._pending)
+        entries = self._connection().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {
+            "path": self.path,
+            "entries": entries,
+            "pending": pending,
+            "batches": self.batches,
+            "rows_written": self.rows_written,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _write_loop(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._commit(conn, batch)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                self._queue.task_done()
+                break
+        conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch):
+        rows = []
+        for doc_id, record in batch:
+            attributes = document_attributes(record.get("data") or {})
+            rows.append((
+                doc_id,
+                record.get("timestamp", time.time()),
+                *(attributes[column] for column in INDEXED_COLUMNS),
+                json.dumps(record, default=str),
+            ))
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO documents "
+                    "(doc_id, timestamp, intent, file_type, crm_action, urgency, sender, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            self.batches += 1
+            self.rows_written += len(rows)
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to commit {len(rows)} documents: {str(e)}")
+
+        with self._pending_lock:
+            for doc_id, record in batch:
+                if self._pending.get(doc_id) is record:
+                    del self._pending[doc_id]
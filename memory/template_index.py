@@ -0,0 +1,149 @@
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+import logging
+
+import numpy as np
+
+# Digits are masked before shingling, so documents of one template that only
+# differ in amounts, dates and reference numbers get identical shingles.
+_DIGITS = re.compile(r"\d+")
+_WORDS = re.compile(r"\w+")
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+# Shingles are crc32 values below 2**32, so with a < 2**31 the product a * x
+# (and b on top) stays below 2**64 and uint64 arithmetic never wraps.
+_MAX_A = 2 ** 31
+
+
+class Template:
+    """A known document layout and the analysis of the first document seen with it."""
+
+    __slots__ = ("id", "signature", "intent", "key_phrases", "hits")
+
+    def __init__(self, template_id: str, signature: np.ndarray, intent: str, key_phrases: List[str]):
+        self.id = template_id
+        self.signature = signature
+        self.intent = intent
+        self.key_phrases = key_phrases
+        self.hits = 0
+
+
+class TemplateLookup(NamedTuple):
+    """Outcome of ``TemplateIndex.lookup``: the text's signature and the best match, if any."""
+    signature: Optional[np.ndarray]
+    template: Optional[Template]
+    similarity: float
+
+
+class TemplateIndex:
+    """Near-duplicate index of document templates (MinHash + LSH).
+
+    Text is reduced to word 3-gram shingles with digits masked and hashed
+    into a ``num_perm`` MinHash signature, split into ``bands`` LSH bands.
+    Templates sharing a band bucket with a new document are candidates; the
+    best one whose estimated Jaccard similarity reaches ``threshold`` is a
+    match. The index holds at most ``max_templates`` templates, least
+    recently matched dropped first.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, bands: int = 16,
+                 max_templates: int = 10000, min_words: int = 50, max_words: int = 20000, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.logger = logging.getLogger("TemplateIndex")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_templates = max_templates
+        self.min_words = min_words
+        self.max_words = max_words
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MAX_A, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+        self._templates: "OrderedDict[str, Template]" = OrderedDict()
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        self.matches = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        if os.getenv("TEMPLATE_INDEX_ENABLED", "1") != "1":
+            return None
+        return cls(
+            threshold=float(os.getenv("TEMPLATE_THRESHOLD", "0.9")),
+            max_templates=int(os.getenv("TEMPLATE_INDEX_MAX", "10000")),
+            min_words=int(os.getenv("TEMPLATE_MIN_WORDS", "50")),
+        )
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of ``text``; None for texts too short to identify a template."""
+        words = _WORDS.findall(_DIGITS.sub("0", text[:self.max_words * 16].lower()))[:self.max_words]
+        if len(words) < self.min_words:
+            return None
+        shingles = np.unique(np.fromiter(
+            (zlib.crc32(" ".join(words[i:i + 3]).encode()) for i in range(len(words) - 2)),
+            dtype=np.uint64, count=len(words) - 2,
+        ))
+        # One universal hash per permutation: (a * x + b) mod p over all shingles.
+        return ((self._a * shingles + self._b) % _PRIME).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def lookup(self, text: str) -> TemplateLookup:
+        signature = self.signature(text)
+        if signature is None:
+            return TemplateLookup(None, None, 0.0)
+
+        with self._lock:
+            candidates = set()
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(bucket.get(key, ()))
+            best, similarity = None, 0.0
+            for template_id in candidates:
+                template = self._templates[template_id]
+                score = float(np.count_nonzero(template.signature == signature)) / self.num_perm
+                if score > similarity:
+                    best, similarity = template, score
+
+            if best is None or similarity < self.threshold:
+                self.misses += 1
+                return TemplateLookup(signature, None, similarity)
+            best.hits += 1
+            self.matches += 1
+            self._templates.move_to_end(best.id)
+            return TemplateLookup(signature, best, similarity)
+
+    def add(self, template_id: str, signature: np.ndarray, intent: str, key_phrases: List[str]) -> Template:
+        template = Template(template_id, signature, intent, list(key_phrases))
+        with self._lock:
+            self._templates[template_id] = template
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                bucket.setdefault(key, []).append(template_id)
+            while len(self._templates) > self.max_templates:
+                self._remove(next(iter(self._templates)))
+        return template
+
+    def _remove(self, template_id: str):
+        template = self._templates.pop(template_id)
+        for bucket, key in zip(self._buckets, self._band_keys(template.signature)):
+            members = bucket.get(key)
+            if members is not None:
+                members.remove(template_id)
+                if not members:
+                    del bucket[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "templates": len(self._templates),
+                "matches": self.matches,
+                "misses": self.misses,
+                "threshold": self.threshold,
+            }
@@ -0,0 +1,34 @@
+from benchmarks.corpus import generate_corpus
+from benchmarks.suite import compare
+
+
+def test_corpus_is_reproducible(tmp_path):
+    options = {"documents": 12, "mix": {"pdf": 1, "eml": 1, "json": 1, "txt": 1},
+               "max_pdf_pages": 3, "max_attachment_kb": 8, "json_records": 50}
+    first = generate_corpus(tmp_path / "a", seed=7, **options)
+    second = generate_corpus(tmp_path / "b", seed=7, **options)
+
+    assert first == second
+    assert {entry["file_type"] for entry in first} <= {"pdf", "eml", "json", "txt"}
+    for entry in first:
+        assert (tmp_path / "a" / entry["name"]).read_bytes() == (tmp_path / "b" / entry["name"]).read_bytes()
+
+
+def test_compare_flags_slower_stages():
+    baseline = {"stages": {
+        "email_parsing": {"status": "ok", "median_s": 1.0},
+        "key_phrases": {"status": "ok", "median_s": 1.0},
+        "end_to_end": {"status": "skipped", "reason": "no model"},
+    }}
+    current = {"stages": {
+        "email_parsing": {"status": "ok", "median_s": 1.1},
+        "key_phrases": {"status": "ok", "median_s": 1.5},
+        "end_to_end": {"status": "ok", "median_s": 9.0},
+    }}
+
+    comparison = compare(current, baseline, threshold=0.2)
+
+    assert set(comparison) == {"email_parsing", "key_phrases"}
+    assert not comparison["email_parsing"]["regression"]
+    assert comparison["key_phrases"]["regression"]
+    assert comparison["key_phrases"]["change"] == 0.5
@@ -20,4 +20,59 @@ def test_detect_intent(classifier_agent):
 
     # Test complaint intent
     complaint_text = "I'm writing to complain about poor service received last week"
-    assert classifier_agent.detect_intent(complaint_text) == "complaint"
\ No newline at end of file
+    assert classifier_agent.detect_intent(complaint_text) == "complaint"
+
+def test_process_batch_keeps_order_and_isolates_errors(classifier_agent):
+    documents = [
+        {"content": b"Invoice INV-9 payment due date 2023-12-01", "file_type": "txt", "doc_id": "batch-1"},
+        {"content": b"not a pdf", "file_type": "pdf", "doc_id": "batch-2"},
+        {"content": '{"rfq_number": "RFQ-1"}', "file_type": "json", "doc_id": "batch-3"},
+    ]
+
+    results = classifier_agent.process_batch(documents, batch_size=2)
+
+    assert [r["document_id"] for r in results] == ["batch-1", "batch-2", "batch-3"]
+    assert results[0]["processing_steps"][0]["agent"] == "email_agent"
+    assert results[1]["status"] == "failed"
+    assert results[2]["processing_steps"][0]["agent"] == "json_agent"
+
+
+def test_pdf_classified_from_first_pages(classifier_agent):
+    from benchmarks.corpus import make_pdf
+
+    filler = ["Line items and totals continue on this page."] * 20
+    pdf = make_pdf(["Invoice INV-7\nPayment due date 2024-01-31"] + filler)
+
+    result = classifier_agent.process(pdf, "pdf", "pdf-1")
+
+    pdf_result = result["processing_steps"][0]["result"]
+    assert pdf_result["pages"] == 21
+    assert pdf_result["pages_extracted"] == classifier_agent.PDF_PREVIEW_PAGES
+    history = classifier_agent.shared_memory.get_document_history("pdf-1")
+    assert history["data"]["classification"]["intent"] == "invoice"
+
+
+def test_email_like_pdf_is_extracted_in_full(classifier_agent):
+    from benchmarks.corpus import make_pdf
+
+    pages = ["Dear Sam,\nPlease find our quotation attached."] + ["Terms."] * 5 + ["Regards,\nsam@example.com"]
+
+    result = classifier_agent.process(make_pdf(pages), "pdf", "pdf-2")
+
+    assert result["processing_steps"][0]["agent"] == "email_agent"
+    assert "sam@example.com" in str(result["processing_steps"][0]["result"])
+
+
+def test_search_index_gets_every_pdf_page(tmp_path):
+    from benchmarks.corpus import make_pdf
+    from memory.search_index import SearchIndex
+
+    search_index = SearchIndex(str(tmp_path))
+    classifier_agent = ClassifierAgent(SharedMemory(), search_index=search_index)
+    pages = ["Invoice INV-8\nPayment due date 2024-01-31"] + ["Line items."] * 10 + ["Purchase order PO-5531"]
+
+    result = classifier_agent.process(make_pdf(pages), "pdf", "pdf-3")
+    search_index.close()
+
+    assert result["intent"] == "invoice"
+    assert [hit["document_id"] for hit in search_index.search("PO-5531")] == ["pdf-3"]
@@ -24,4 +24,11 @@ def test_extract_entities(email_agent):
     assert entities["recipient"] == "recipient@company.com"
     assert entities["date"] == "15/11/2023"
     assert entities["urgency"] == "high"
-    assert len(entities["key_phrases"]) > 0
\ No newline at end of file
+    assert len(entities["key_phrases"]) > 0
+
+
+def test_date_run_into_an_address_still_yields_both(email_agent):
+    entities = email_agent.extract_entities("Reply to 12/05/2024@support.example.com")
+
+    assert entities["sender"] == "2024@support.example.com"
+    assert entities["date"] == "12/05/2024"
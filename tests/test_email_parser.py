@@ -0,0 +1,59 @@
+from benchmarks.corpus import make_email
+from utils.email_parser import html_to_text, parse_email, parse_email_headers
+
+
+def test_parse_email_decodes_charset_and_describes_attachments():
+    email_data = parse_email(make_email(attachment_size=300_000))
+
+    assert email_data["subject"] == "Réclamation: damaged order #12345"
+    assert email_data["sender"] == "Jürgen Müller <juergen@example.com>"
+    assert email_data["body"].startswith("Dear Support Team,")
+    assert email_data["body"].rstrip().endswith("Jürgen")
+    assert email_data["attachments"] == [
+        {"filename": "damage-report.pdf", "content_type": "application/pdf", "size": 300_000}
+    ]
+
+
+def test_html_only_email_falls_back_to_text():
+    email_data = parse_email(make_email(html=True))
+
+    assert "<p>" not in email_data["body"]
+    assert "The order arrived damaged. Please respond ASAP." in email_data["body"]
+    assert email_data["attachments"] == []
+    assert html_to_text("<style>p {}</style><p>A &amp; B</p><p>C</p>") == "A & B\nC"
+
+
+def test_headers_only_pass_and_plain_messages():
+    with open("sample_inputs/sample_email.eml", "rb") as fh:
+        raw = fh.read()
+
+    headers = parse_email_headers(raw)
+    assert headers["subject"] == "Urgent: Complaint about recent order #12345"
+    assert headers["sender"] == "john.doe@example.com"
+    assert "body" not in headers
+
+    email_data = parse_email(raw)
+    assert email_data["body"].startswith("Dear Support Team,")
+    assert email_data["headers"]["To"] == "sales@company.com"
+
+
+def test_files_and_handles_are_memory_mapped(tmp_path, monkeypatch):
+    import mmap
+    import tempfile
+    from utils import email_parser
+
+    raw = make_email(attachment_size=300_000)
+    path = tmp_path / "message.eml"
+    path.write_bytes(raw)
+    spooled = tempfile.SpooledTemporaryFile(max_size=len(raw) * 2)
+    spooled.write(raw)
+
+    mapped = []
+    parse_message = email_parser._parse_message
+    monkeypatch.setattr(email_parser, "_parse_message", lambda data: mapped.append(type(data)) or parse_message(data))
+    expected = parse_email(raw)
+    with open(path, "rb") as fh:
+        assert parse_email(path) == parse_email(fh) == parse_email(spooled) == expected
+
+    assert mapped == [bytes, mmap.mmap, mmap.mmap, bytes]
+    assert not spooled._rolled
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import pytest
+from agents.classifier_agent import ClassifierAgent
+from memory.shared_memory import SharedMemory
+from utils import executor as executor_module, pdf_parser
+from utils.executor import ClassifierExecutor, ExecutorSaturated
+
+
+class BlockingClassifier:
+    def __init__(self):
+        self.shared_memory = SharedMemory()
+        self.release = threading.Event()
+
+    def process(self, content, file_type, doc_id, metadata=None):
+        self.release.wait(5)
+        return {"document_id": doc_id}
+
+
+def test_thread_backend_rejects_when_saturated():
+    classifier = BlockingClassifier()
+    executor = ClassifierExecutor(classifier, backend="thread", max_workers=1, max_queue=1)
+
+    async def scenario():
+        first = asyncio.ensure_future(executor.run("process", b"", "txt", "doc-1"))
+        second = asyncio.ensure_future(executor.run("process", b"", "txt", "doc-2"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorSaturated):
+            await executor.run("process", b"", "txt", "doc-3")
+        classifier.release.set()
+        return await asyncio.gather(first, second)
+
+    results = asyncio.run(scenario())
+    executor.shutdown()
+    assert [r["document_id"] for r in results] == ["doc-1", "doc-2"]
+
+
+def test_thread_backend_times_out():
+    classifier = BlockingClassifier()
+    executor = ClassifierExecutor(classifier, backend="thread", max_workers=1, timeout=0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(executor.run("process", b"", "txt", "doc-1"))
+    classifier.release.set()
+    executor.shutdown()
+
+
+def test_worker_processes_extract_pdfs_sequentially(monkeypatch):
+    monkeypatch.delenv("PDF_WORKERS", raising=False)
+    monkeypatch.setattr(pdf_parser, "PDF_WORKERS", 8)
+    monkeypatch.setattr(executor_module, "_worker_classifier", None)
+    monkeypatch.setattr(ClassifierAgent, "warm_up", lambda self: None)
+
+    executor_module._init_worker()
+
+    assert pdf_parser.PDF_WORKERS == 1
+    assert executor_module._worker_classifier is not None
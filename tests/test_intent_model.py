@@ -0,0 +1,64 @@
+from agents.classifier_agent import ClassifierAgent, model_loaded
+from memory.shared_memory import SharedMemory
+from utils.intent_model import IntentModel, load_model
+
+SAMPLES = [
+    ("please send your best price for the pumps", "rfq"),
+    ("what would it cost to supply two hundred valves", "rfq"),
+    ("kindly provide pricing for the spare parts", "rfq"),
+    ("the delivery was late and the box was broken", "complaint"),
+    ("your staff was rude and nothing was fixed", "complaint"),
+    ("we are unhappy with the broken parts you sent", "complaint"),
+    ("the meeting moved to thursday afternoon", "unknown"),
+    ("see you at the team lunch on friday", "unknown"),
+    ("the office is closed for the holiday", "unknown"),
+]
+
+
+def test_fit_predict_and_round_trip(tmp_path):
+    model = IntentModel.fit([text for text, _ in SAMPLES], [label for _, label in SAMPLES], n_features=1024, folds=3)
+    texts = ["could you send pricing for fifty pumps", "the parts arrived broken and late", "qwerty"]
+
+    probabilities = model.predict_proba(texts)
+    assert probabilities.shape == (3, 3)
+    assert abs(probabilities.sum(axis=1) - 1).max() < 1e-5
+    # Nine samples leave the held-out folds unsure, so the fitted temperature flattens the scores.
+    assert model.predict(texts, threshold=0.4) == ["rfq", "complaint", "unknown"]
+    assert model.predict(texts, threshold=1.0) == ["unknown"] * 3
+
+    path = tmp_path / "intent.npz"
+    model.save(path)
+    loaded = load_model(str(path))
+    assert loaded.labels == model.labels and loaded.digest
+    assert (loaded.predict_proba(texts) == probabilities).all()
+    assert load_model(str(tmp_path / "missing.npz")) is None
+
+
+def test_shipped_model_classifies_without_spacy(monkeypatch):
+    monkeypatch.setattr("agents.classifier_agent._models", {})
+    agent = ClassifierAgent(SharedMemory())
+    intents = agent.detect_intents([
+        "Invoice INV-1, payment due date 2024-01-31",
+        "This course will help you learn and study organic chemistry",
+        "See you at lunch tomorrow!",
+        # Handled by the keyword fallback the model replaced.
+        "I want to learn about the course",
+        "I want to learn python",
+        "How do I study for the exam?",
+    ])
+
+    assert intents == ["invoice", "syllabus", "unknown", "syllabus", "syllabus", "syllabus"]
+    assert agent.intent_model is not None
+    assert not model_loaded()
+
+
+def test_shipped_model_leaves_unmatched_business_prose_unknown():
+    agent = ClassifierAgent(SharedMemory())
+    intents = agent.detect_intents([
+        "Please find attached the quarterly report.",
+        "The shipment tracking number is attached.",
+        "Our board approved the budget for next year.",
+        "asdf qwer zxcv",
+    ])
+
+    assert intents == ["unknown"] * 4
@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from utils.jobs import Job, JobQueue, QueueFull, job_priority
+
+
+def test_job_priority_prefers_small_cheap_documents():
+    assert job_priority("json", 2_000) < job_priority("eml", 2_000) < job_priority("pdf", 2_000)
+    assert job_priority("pdf", 500_000) < job_priority("pdf", 300 * 1024 * 1024)
+    assert job_priority("json", 50 * 1024 * 1024) > job_priority("json", 50_000)
+
+
+def test_queue_runs_by_priority_and_rejects_when_full():
+    async def scenario():
+        order, finished = [], []
+
+        async def process(job):
+            order.append(job.id)
+            if job.file_type == "txt":
+                raise ValueError("unreadable")
+            return {"intent": "rfq"}
+
+        async def on_finish(job):
+            finished.append((job.id, job.status))
+
+        queue = JobQueue(process, on_finish=on_finish, workers=1, max_queue=4)
+        queue.start()
+        for job_id, file_type, size in [("big-pdf", "pdf", 300 * 1024 * 1024), ("pdf", "pdf", 10_000),
+                                        ("json", "json", 2_000), ("txt", "txt", 10)]:
+            queue.submit(Job(job_id, None, file_type, {"size": size}, job_priority(file_type, size)))
+        with pytest.raises(QueueFull):
+            queue.submit(Job("extra", None, "json", {}, 0))
+
+        await queue._queue.join()
+        await queue.stop()
+        return queue, order, finished
+
+    queue, order, finished = asyncio.run(scenario())
+
+    assert order == ["json", "txt", "pdf", "big-pdf"]
+    assert dict(finished) == {"json": "done", "txt": "failed", "pdf": "done", "big-pdf": "done"}
+    assert queue.get("json").to_dict()["result"] == {"intent": "rfq"}
+    assert queue.get("txt").error == "unreadable"
+
+
+def test_stop_fails_and_finishes_jobs_that_never_started():
+    async def scenario():
+        finished = []
+        started = asyncio.Event()
+
+        async def process(job):
+            started.set()
+            await asyncio.sleep(60)
+
+        async def on_finish(job):
+            finished.append((job.id, job.status))
+
+        queue = JobQueue(process, on_finish=on_finish, workers=1, max_queue=4)
+        queue.start()
+        for job_id in ("running", "waiting-1", "waiting-2"):
+            queue.submit(Job(job_id, b"upload", "txt", {}, 0))
+        await started.wait()
+        await queue.stop()
+        return queue, finished
+
+    queue, finished = asyncio.run(scenario())
+
+    assert dict(finished) == {"running": "failed", "waiting-1": "failed", "waiting-2": "failed"}
+    assert queue.get("waiting-2").error == "Cancelled at shutdown"
+    assert queue.get("waiting-2").content is None
+    assert queue.stats()["queued"] == 0
@@ -22,4 +22,37 @@ def test_process_json(json_agent):
     result = json_agent.process(invoice_json, "test-doc-1")
     assert result["status"] == "processed"
     assert result["intent"] == "invoice"
-    assert result["validation"]["is_valid"] == True
\ No newline at end of file
+    assert result["validation"]["is_valid"] == True
+
+
+def test_process_record_collections(json_agent, tmp_path):
+    from benchmarks.corpus import erp_records, write_records
+
+    for record_format in ("array", "ndjson"):
+        path = tmp_path / f"export.{record_format}"
+        write_records(str(path), erp_records(30, invalid_every=10), record_format)
+
+        result = json_agent.process(path, f"export-{record_format}")
+
+        assert result["status"] == "processed"
+        assert result["format"] == record_format
+        assert result["extracted_fields"] == {}
+        stats = result["stats"]
+        assert (stats["records"], stats["valid"], stats["invalid"]) == (30, 27, 3)
+        assert stats["intents"] == {"invoice": 10, "rfq": 10, "complaint": 10}
+        assert stats["missing_fields"] == {
+            "invoice": {"date": 1}, "rfq": {"request_date": 1}, "complaint": {"date_received": 1}
+        }
+        assert [r["index"] for r in result["invalid_records"]] == [0, 10, 20]
+
+
+def test_stream_parser_handles_records_split_across_chunks():
+    import io
+    from utils.json_stream import iter_json_records
+
+    records = [{"invoice_number": f"INV-{i}", "vendor": "Café " * i, "total_amount": 12345} for i in range(20)]
+    for payload in (json.dumps(records, indent=2), "\n".join(json.dumps(r) for r in records)):
+        assert list(iter_json_records(io.BytesIO(payload.encode()), chunk_size=3)) == records
+
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_records(io.BytesIO(b'[{"a": 1} {"b": 2}]')))
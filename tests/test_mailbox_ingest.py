@@ -0,0 +1,96 @@
+import json
+import mailbox
+import pytest
+from memory.shared_memory import SharedMemory
+from utils.mailbox_ingest import MailboxIngestor, iter_mailbox, iter_mbox
+
+
+def message(number):
+    return (
+        f"From: sender{number}@example.com\n"
+        f"Subject: Order {number}\n\n"
+        f"Body of message {number}.\nFrom here on it is still the body.\n"
+    )
+
+
+def write_mbox(path, count):
+    with open(path, "w") as fh:
+        for number in range(count):
+            fh.write(f"From sender{number}@example.com Mon Nov 13 14:25:30 2023\n{message(number)}\n")
+
+
+class RecordingClassifier:
+    """Stands in for ClassifierAgent.process_batch; can fail after some batches."""
+
+    def __init__(self, fail_after=None):
+        self.shared_memory = SharedMemory()
+        self.subjects = []
+        self.fail_after = fail_after
+
+    def process_batch(self, documents, batch_size=32):
+        if self.fail_after is not None and len(self.subjects) >= self.fail_after:
+            raise RuntimeError("worker crashed")
+        results = []
+        for document in documents:
+            subject = document["content"].split(b"Subject: ")[1].split(b"\n")[0].decode()
+            self.subjects.append(subject)
+            self.shared_memory.update(document["doc_id"], {"metadata": document["metadata"]})
+            results.append({"document_id": document["doc_id"], "intent": "rfq", "status": "processed"})
+        return results
+
+
+def test_mbox_messages_resume_from_offsets(tmp_path):
+    path = tmp_path / "inbox.mbox"
+    write_mbox(path, 5)
+
+    messages = list(iter_mbox(path))
+    assert len(messages) == 5
+    assert messages[0].raw.decode().startswith("From: sender0@example.com")
+    assert b"From here on it is still the body." in messages[0].raw
+
+    resumed = list(iter_mailbox(path, messages[2].resume))
+    assert [m.key for m in resumed] == [m.key for m in messages[3:]]
+
+
+def test_ingest_checkpoints_and_resumes_after_a_crash(tmp_path):
+    path = tmp_path / "inbox.mbox"
+    write_mbox(path, 10)
+    checkpoint = tmp_path / "inbox.checkpoint.json"
+
+    crashing = RecordingClassifier(fail_after=4)
+    with pytest.raises(RuntimeError):
+        MailboxIngestor(crashing, batch_size=2, workers=1, checkpoint_path=str(checkpoint)).ingest(path)
+    assert json.loads(checkpoint.read_text())["processed"] == 4
+
+    classifier = RecordingClassifier()
+    summary = MailboxIngestor(classifier, batch_size=2, workers=1, checkpoint_path=str(checkpoint)).ingest(path)
+
+    assert classifier.subjects == [f"Order {n}" for n in range(4, 10)]
+    assert summary["messages"] == 6
+    assert summary["total_processed"] == 10
+    assert summary["intents"] == {"rfq": 6}
+    assert summary["position"] == path.stat().st_size
+
+
+def test_maildir_messages_in_key_order(tmp_path):
+    maildir = mailbox.Maildir(tmp_path / "Maildir")
+    keys = sorted(maildir.add(message(number)) for number in range(3))
+
+    assert [m.key for m in iter_mailbox(tmp_path / "Maildir")] == keys
+    assert [m.key for m in iter_mailbox(tmp_path / "Maildir", keys[0])] == keys[1:]
+
+
+def test_single_worker_batches_go_through_the_hook(tmp_path):
+    path = tmp_path / "inbox.mbox"
+    write_mbox(path, 5)
+    classifier = RecordingClassifier()
+    sizes = []
+
+    def process_batch(documents, batch_size):
+        sizes.append(len(documents))
+        return classifier.process_batch(documents, batch_size=batch_size)
+
+    summary = MailboxIngestor(classifier, batch_size=2, workers=1, process_batch=process_batch).ingest(path)
+
+    assert sizes == [2, 2, 1]
+    assert summary["processed"] == 5
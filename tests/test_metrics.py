@@ -0,0 +1,38 @@
+from memory.shared_memory import SharedMemory
+from utils import metrics
+
+
+def test_collect_timings_records_nested_stages():
+    memory = SharedMemory()
+    assert metrics.timed("scan") is metrics.timed("nlp")  # shared no-op outside a collector
+
+    with metrics.collect_timings() as timings:
+        with metrics.timed("scan"):
+            pass
+        with memory.write_buffer():
+            memory.update("doc-1", {"classification": {"intent": "rfq"}})
+        with metrics.timed("scan"):
+            pass
+
+    assert set(timings) == {"scan", "memory_write", "total"}
+    assert timings["total"] >= timings["scan"] + timings["memory_write"]
+
+
+def test_registry_renders_prometheus_text():
+    registry = metrics.Registry()
+    latency = registry.register(metrics.Histogram("test_seconds", "Test latency.", ("stage",), buckets=(0.1, 1)))
+    errors = registry.register(metrics.Counter("test_errors_total", "Test errors.", ("reason",)))
+
+    latency.observe(0.05, "nlp")
+    latency.observe(0.5, "nlp")
+    latency.observe(5, "nlp")
+    errors.inc('say "hi"')
+
+    lines = registry.render().splitlines()
+    assert "# TYPE test_seconds histogram" in lines
+    assert 'test_seconds_bucket{stage="nlp",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="nlp",le="1"} 2' in lines
+    assert 'test_seconds_bucket{stage="nlp",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="nlp"} 3' in lines
+    assert 'test_seconds_sum{stage="nlp"} 5.550000' in lines
+    assert 'test_errors_total{reason="say \\"hi\\""} 1' in lines
@@ -0,0 +1,33 @@
+from utils.pattern_matcher import PatternMatcher
+
+
+def test_scan_counts_and_offsets_in_one_pass():
+    matcher = PatternMatcher(
+        patterns={
+            "intent": {"invoice": [r"\binvoice\b", r"due\s+date"], "complaint": [r"\bissue\b"]},
+            "email_signature": {"signature": [r"^dear\s+\w+"]},
+        },
+        keywords={"urgency": {"high": ["urgent", "asap"]}},
+    )
+    text = "Dear Invoice team,\nThis invoice is URGENT. Due date passed, one issue."
+
+    matches = matcher.scan(text)
+
+    assert matches.counts("intent") == {"invoice": 3, "complaint": 1}
+    assert matches.count("email_signature") == 1
+    assert matches.count("urgency", "high") == 1
+    assert matches.offsets("intent", "complaint") == [(text.index("issue"), text.index("issue") + 5)]
+    assert matches.best("intent", ["complaint", "invoice"]) == "invoice"
+
+
+def test_scan_counts_every_pattern_matching_at_one_offset():
+    matcher = PatternMatcher(patterns={
+        "intent": {"rfq": [r"request\s+for\s+quote"], "complaint": [r"\brequest\b"], "regulation": [r"(re|pro)quest"]},
+    })
+    text = "Request for quote: see request"
+
+    matches = matcher.scan(text)
+
+    assert matches.counts("intent") == {"rfq": 1, "complaint": 2, "regulation": 2}
+    assert matches.offsets("intent", "complaint") == [(0, 7), (23, 30)]
+    assert matcher.scan("İ request").counts("intent") == {"complaint": 1, "regulation": 1}
@@ -0,0 +1,51 @@
+from agents.pdf_agent import PDFAgent
+from benchmarks.corpus import make_pdf
+from memory.shared_memory import SharedMemory
+from utils import pdf_parser
+from utils.pdf_parser import PAGE_SEPARATOR, extract_pages, extract_text_from_pdf, iter_pdf_pages, open_pdf
+
+
+def test_pages_are_yielded_in_order_and_joined_with_form_feeds():
+    pdf = make_pdf(["Invoice INV-1", "second page", "", "Regards,"])
+
+    assert list(iter_pdf_pages(pdf)) == ["Invoice INV-1", "second page", "", "Regards,"]
+    assert list(iter_pdf_pages(pdf, start=3)) == ["Regards,"]
+    assert extract_text_from_pdf(pdf).split(PAGE_SEPARATOR)[1] == "second page"
+
+
+def test_pdf_agent_reports_real_page_count():
+    agent = PDFAgent(SharedMemory())
+    text = extract_text_from_pdf(make_pdf(["one", "two", "three"]))
+
+    assert agent.process(text, "doc-1")["pages"] == 3
+    partial = agent.process("one", "doc-2", page_count=40)
+    assert (partial["pages"], partial["pages_extracted"]) == (40, 1)
+
+
+def test_parallel_extraction_keeps_order_and_isolates_broken_pages(monkeypatch):
+    monkeypatch.setattr(pdf_parser, "PARALLEL_MIN_PAGES", 4)
+    pages = [f"page {number}" for number in range(1, 41)]
+    # Page 8 points at a content stream that does not exist.
+    pdf = make_pdf(pages).replace(b"/Contents 19 0 R", b"/Contents [19 0 R 999 0 R]")
+
+    try:
+        serial = extract_pages(pdf, workers=1)
+        parallel = extract_pages(pdf, workers=2)
+        tail = extract_pages(pdf, start=30, workers=2)
+    finally:
+        pdf_parser.shutdown_pool()
+
+    expected = pages[:7] + [""] + pages[8:]
+    assert serial == parallel == (expected, [8])
+    assert tail == (expected[30:], [])
+
+
+def test_extraction_reuses_an_open_reader(monkeypatch):
+    pdf = make_pdf(["one", "two", "three"])
+    reader = open_pdf(pdf)
+
+    def reparse(pdf):
+        raise AssertionError("the document was parsed again")
+
+    monkeypatch.setattr(pdf_parser, "open_pdf", reparse)
+    assert extract_pages(pdf, start=1, workers=1, reader=reader) == (["two", "three"], [])
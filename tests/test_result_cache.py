@@ -0,0 +1,17 @@
+from memory.result_cache import ResultCache
+
+
+def test_lru_evicts_by_size_and_counts_hits():
+    cache = ResultCache(max_bytes=60)
+    key_a = ResultCache.make_key(b"invoice-a", "pdf", "v1")
+    key_b = ResultCache.make_key(b"invoice-b", "pdf", "v1")
+
+    cache.put(key_a, {"result": "a" * 20})
+    cache.put(key_b, {"result": "b" * 20})
+
+    assert key_a != ResultCache.make_key(b"invoice-a", "txt", "v1")
+    assert cache.get(key_a) is None
+    assert cache.get(key_b) == {"result": "b" * 20}
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 1 and stats["misses"] == 1
@@ -0,0 +1,74 @@
+import json
+from agents.json_agent import JSONAgent
+from memory.shared_memory import SharedMemory
+from utils.schema_engine import SchemaEngine
+
+SCHEMAS = {
+    "invoice": {
+        "required": ["invoice_number", "date", "total_amount"],
+        "optional": ["line_items"],
+        "types": {"total_amount": "number", "line_items": "array"},
+    },
+    "rfq": {"required": ["rfq_number", "items"], "optional": []},
+}
+
+
+def test_batch_masks_and_summary():
+    engine = SchemaEngine(SCHEMAS)
+    records = [
+        {"invoice_number": "1", "date": "d", "total_amount": 10},
+        {"invoice_number": "2", "total_amount": "10", "note": "x"},
+        {"rfq_number": "R", "items": []},
+        {"something": "else"},
+        [1, 2],
+        {"invoice_number": "3", "date": "d", "total_amount": True},
+    ]
+
+    batch = engine.validate_batch(records)
+
+    assert [batch.intent(i) for i in range(len(batch))] == ["invoice", "invoice", "rfq", "unknown", "unknown", "invoice"]
+    assert [batch.is_valid(i) for i in range(len(batch))] == [True, False, True, False, False, False]
+    assert batch.describe(1, records[1]) == {
+        "is_valid": False,
+        "missing_fields": ["date"],
+        "anomalies": ["Expected number for field: total_amount", "Unexpected field: note"],
+    }
+    assert batch.describe(3)["anomalies"] == ["Unknown record type"]
+    assert batch.summary() == {
+        "records": 6,
+        "valid": 2,
+        "invalid": 4,
+        "intents": {"invoice": 3, "rfq": 1, "unknown": 2},
+        "missing_fields": {"invoice": {"date": 1}},
+    }
+
+
+def test_single_record_validation_matches_the_batch():
+    engine = SchemaEngine(SCHEMAS)
+    records = [
+        {"invoice_number": "1", "date": "d", "total_amount": 10},
+        {"invoice_number": "2", "total_amount": "10", "note": "x"},
+        {"something": "else"},
+        [1, 2],
+    ]
+
+    batch = engine.validate_batch(records)
+
+    for index, record in enumerate(records):
+        assert engine.validate(record) == {"intent": batch.intent(index), **batch.describe(index, record)}
+
+
+def test_unknown_intent_and_configured_schemas(tmp_path, monkeypatch):
+    agent = JSONAgent(SharedMemory())
+    result = agent.process(json.dumps({"po_number": "PO-1"}), "doc-unknown")
+    assert result["status"] == "processed"
+    assert result["intent"] == "unknown"
+    assert result["validation"]["is_valid"] is False
+
+    path = tmp_path / "schemas.json"
+    path.write_text(json.dumps({"purchase_order": {"required": ["po_number", "supplier"], "optional": []}}))
+    monkeypatch.setenv("JSON_SCHEMAS_PATH", str(path))
+    agent = JSONAgent(SharedMemory())
+    result = agent.process(json.dumps({"po_number": "PO-1"}), "doc-po")
+    assert result["intent"] == "purchase_order"
+    assert result["validation"]["missing_fields"] == ["supplier"]
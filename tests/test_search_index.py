@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from memory.search_index import Segment, SearchIndex, SearchIndexLocked, tokenize
+
+
+def purchase_order(number):
+    return (
+        f"Purchase order PO-{number} for industrial bearings.\n"
+        f"Please deliver {number % 40 + 1} units to the Springfield warehouse by the end of the month."
+    )
+
+
+def test_search_ranks_by_bm25_and_filters_by_file_type(tmp_path):
+    index = SearchIndex(str(tmp_path), segment_docs=100)
+    for number in range(4500, 4520):
+        index.add(f"po-{number}", purchase_order(number), "pdf" if number % 2 else "eml")
+    index.add("reminder", "Reminder: PO-4507 is overdue, PO-4507 was due last week.", "eml")
+
+    index.flush()
+    hits = index.search("PO-4507", limit=2)
+    assert [hit["document_id"] for hit in hits] == ["reminder", "po-4507"]
+    assert hits[0]["score"] > hits[1]["score"]
+
+    assert [hit["document_id"] for hit in index.search("4507", file_type="pdf")][:1] == ["po-4507"]
+    assert all(hit["file_type"] == "eml" for hit in index.search("bearings", limit=50, file_type="eml"))
+    assert index.search("nothing-like-this") == []
+    index.close()
+
+
+def test_segments_persist_and_merge(tmp_path):
+    index = SearchIndex(str(tmp_path), segment_docs=5, merge_factor=2)
+    for number in range(1000, 1030):
+        index.add(f"po-{number}", purchase_order(number), "pdf")
+    index.add("po-1003", purchase_order(1003), "pdf")  # reindexed under the same id
+    index.close()
+
+    assert index.merges > 0
+    files = [name for name in os.listdir(tmp_path) if name.startswith("segment-")]
+    assert len(files) <= 3
+
+    reopened = SearchIndex(str(tmp_path))
+    assert reopened.stats()["documents"] == 31
+    hits = reopened.search("PO-1003 bearings", limit=5)
+    assert hits[0]["document_id"] == "po-1003"
+    assert len({hit["document_id"] for hit in hits}) == len(hits)
+    reopened.close()
+
+
+def test_tokenize_keeps_numbers_and_lowercases():
+    assert tokenize("Invoice INV-2024/17 for ACME") == ["invoice", "inv", "2024", "17", "for", "acme"]
+
+
+def test_failed_segment_write_is_kept_and_retried(tmp_path, monkeypatch):
+    index = SearchIndex(str(tmp_path))
+    save = Segment.save
+
+    def failing_save(segment, path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(Segment, "save", failing_save)
+    index.add("po-1", purchase_order(1001), "pdf")
+    index.flush()
+    assert [hit["document_id"] for hit in index.search("1001")] == ["po-1"]
+    assert index.stats()["unflushed"] == 1
+
+    monkeypatch.setattr(Segment, "save", save)
+    index.add("po-2", purchase_order(1002), "pdf")
+    index.close()
+
+    reopened = SearchIndex(str(tmp_path))
+    assert reopened.stats()["documents"] == 2
+    assert [hit["document_id"] for hit in reopened.search("1001")] == ["po-1"]
+    reopened.close()
+
+
+def test_directory_can_only_be_opened_once(tmp_path):
+    index = SearchIndex(str(tmp_path))
+    with pytest.raises(SearchIndexLocked):
+        SearchIndex(str(tmp_path))
+    index.close()
+    SearchIndex(str(tmp_path)).close()
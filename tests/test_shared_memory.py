@@ -0,0 +1,238 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+import main
+from agents.classifier_agent import ClassifierAgent
+from memory.shared_memory import SharedMemory
+
+
+def test_in_memory_store_evicts_lru_and_reads_spill(tmp_path):
+    shared_memory = SharedMemory(max_entries=2, spill_dir=str(tmp_path))
+
+    shared_memory.update("doc-1", {"intent": "invoice"})
+    shared_memory.update("doc-2", {"intent": "rfq"})
+    shared_memory.get_document_history("doc-1")
+    shared_memory.update("doc-3", {"intent": "complaint"})
+
+    stats = shared_memory.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert "doc-2" not in shared_memory.in_memory_store
+    assert shared_memory.get_document_history("doc-2")["data"] == {"intent": "rfq"}
+
+
+def test_in_memory_store_expires_and_tracks_bytes():
+    shared_memory = SharedMemory(ttl=0.05)
+
+    shared_memory.update("doc-1", {"extracted_fields": {"vendor": "Acme"}})
+    assert shared_memory.stats()["bytes"] > 0
+    time.sleep(0.1)
+
+    assert shared_memory.get_document_history("doc-1") is None
+    assert shared_memory.stats()["expirations"] == 1
+    assert shared_memory.stats()["bytes"] == 0
+
+
+def test_write_buffer_merges_agent_updates_into_one_flush():
+    shared_memory = SharedMemory()
+
+    with shared_memory.write_buffer():
+        shared_memory.update("doc-1", {"email_processing": {"crm_action": "create_ticket"}})
+        shared_memory.update("doc-1", {"classification": {"intent": "complaint"}})
+        shared_memory.append_to_document("doc-1", {"extracted_fields": {"vendor": "Acme"}})
+        assert "doc-1" not in shared_memory.in_memory_store
+        assert shared_memory.get_document_history("doc-1")["data"]["extracted_fields"] == {"vendor": "Acme"}
+
+    shared_memory.append_to_document("doc-1", {"extracted_fields": {"total": 10}})
+    data = shared_memory.get_document_history("doc-1")["data"]
+    assert data["email_processing"] == {"crm_action": "create_ticket"}
+    assert data["classification"] == {"intent": "complaint"}
+    assert data["extracted_fields"] == {"vendor": "Acme", "total": 10}
+
+
+def test_redis_backend_round_trip_sync_and_async():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    shared_memory = SharedMemory(
+        use_redis=True,
+        key_prefix="test:",
+        redis_client=fakeredis.FakeRedis(server=server, decode_responses=True),
+        async_redis_client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+    )
+
+    with shared_memory.write_buffer():
+        shared_memory.update("doc-1", {"classification": {"intent": "invoice"}})
+        shared_memory.append_to_document("doc-1", {"extracted_fields": {"vendor": "Acme"}})
+
+    async def scenario():
+        await shared_memory.aappend_to_document("doc-1", {"extracted_fields": {"total": 10}})
+        return await shared_memory.aget_document_history("doc-1")
+
+    record = asyncio.run(scenario())
+    assert shared_memory.use_redis
+    assert shared_memory.redis_client.exists("test:doc-1")
+    assert record["data"] == {
+        "classification": {"intent": "invoice"},
+        "extracted_fields": {"vendor": "Acme", "total": 10},
+    }
+
+
+def test_unreachable_redis_falls_back_to_memory():
+    shared_memory = SharedMemory(use_redis=True, redis_url="redis://127.0.0.1:1/0", connect_timeout=0.2)
+
+    shared_memory.update("doc-1", {"intent": "rfq"})
+    assert not shared_memory.use_redis
+    assert shared_memory.get_document_history("doc-1")["data"] == {"intent": "rfq"}
+
+
+def test_sqlite_backend_persists_and_queries_indexed_columns(tmp_path):
+    path = str(tmp_path / "memory.db")
+    shared_memory = SharedMemory(sqlite_path=path)
+
+    shared_memory.update("doc-1", {"classification": {"intent": "complaint", "file_type": "eml"}})
+    shared_memory.update("doc-1", {"email_processing": {"crm_action": "create_support_case"}})
+    shared_memory.update("doc-2", {"classification": {"intent": "invoice", "file_type": "pdf"}})
+    assert shared_memory.get_document_history("doc-1")["data"]["email_processing"]
+    shared_memory.close()
+
+    reopened = SharedMemory(sqlite_path=path)
+    complaints = reopened.query(intent="complaint", since=time.time() - 7 * 86400)
+    assert [r["doc_id"] for r in complaints] == ["doc-1"]
+    assert reopened.query(crm_action="create_support_case")[0]["data"]["classification"]["file_type"] == "eml"
+    assert reopened.stats()["entries"] == 2
+    reopened.close()
+
+
+def write_emails(shared_memory):
+    for number in range(6):
+        shared_memory.update(f"doc-{number}", {
+            "classification": {"intent": "complaint" if number % 2 else "invoice", "file_type": "eml"},
+            "email_processing": {
+                "crm_action": "create_support_case" if number % 2 else "create_billing_record",
+                "extracted_fields": {"urgency": "high" if number < 3 else "normal"},
+            },
+            "metadata": {"sender": "Ann <ANN@example.com>" if number != 4 else "bob@example.com"},
+        })
+    # Re-filing doc-1 moves it to the front and out of the high-urgency index.
+    shared_memory.update("doc-1", {"email_processing": {"crm_action": "create_support_case",
+                                                        "extracted_fields": {"urgency": "normal"}}})
+
+
+def page_ids(shared_memory, limit, **filters):
+    ids, cursor = [], None
+    while True:
+        records = shared_memory.query(limit=limit, cursor=cursor, **filters)
+        ids.append([record["doc_id"] for record in records])
+        if len(records) < limit:
+            return ids
+        cursor = (records[-1]["timestamp"], records[-1]["doc_id"])
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_query_uses_secondary_indexes_with_cursors(backend):
+    if backend == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        shared_memory = SharedMemory(use_redis=True, key_prefix="q:",
+                                     redis_client=fakeredis.FakeRedis(decode_responses=True))
+    else:
+        shared_memory = SharedMemory(max_entries=100)
+
+    write_emails(shared_memory)
+
+    assert page_ids(shared_memory, 2) == [["doc-1", "doc-5"], ["doc-4", "doc-3"], ["doc-2", "doc-0"], []]
+    assert page_ids(shared_memory, 2, intent="complaint") == [["doc-1", "doc-5"], ["doc-3"]]
+    assert page_ids(shared_memory, 5, urgency="high") == [["doc-2", "doc-0"]]
+    assert page_ids(shared_memory, 5, intent="complaint", urgency="high") == [[]]
+    assert page_ids(shared_memory, 5, sender="ann@example.com", crm_action="create_billing_record") == [["doc-2", "doc-0"]]
+    assert shared_memory.query(since=time.time() + 60) == []
+    with pytest.raises(ValueError):
+        shared_memory.query(payload="x")
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_concurrent_writers_to_one_document_lose_nothing(backend, tmp_path):
+    shared_memory = SharedMemory(sqlite_path=str(tmp_path / "m.db") if backend == "sqlite" else None)
+    store_get = shared_memory.store.get
+
+    def slow_get(doc_id, record_stats=True):
+        record = store_get(doc_id, record_stats)
+        time.sleep(0.002)  # widen the read-merge-write window
+        return record
+
+    shared_memory.store.get = slow_get
+    writers = [
+        threading.Thread(target=shared_memory.append_to_document,
+                         args=("doc", {f"agent_{n}": n, "extracted_fields": {f"field_{n}": n}}))
+        for n in range(8)
+    ]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    data = shared_memory.get_document_history("doc")["data"]
+    assert {f"agent_{n}" for n in range(8)} <= set(data)
+    assert data["extracted_fields"] == {f"field_{n}": n for n in range(8)}
+    shared_memory.close()
+
+
+def test_in_memory_index_forgets_evicted_documents():
+    shared_memory = SharedMemory(max_entries=2)
+    for number in range(4):
+        shared_memory.update(f"doc-{number}", {"classification": {"intent": "rfq"}})
+
+    assert [r["doc_id"] for r in shared_memory.query(intent="rfq")] == ["doc-3", "doc-2"]
+    assert shared_memory.stats()["indexed"] == 2
+
+
+def test_json_documents_are_found_by_the_json_agent_intent(monkeypatch):
+    shared_memory = SharedMemory()
+    monkeypatch.setattr(main, "shared_memory", shared_memory)
+    invoice = {"invoice_number": "INV-1", "date": "2024-05-01", "total_amount": 120.5, "vendor": "Acme"}
+    ClassifierAgent(shared_memory).process(json.dumps(invoice), "json", "json-1")
+
+    client = TestClient(main.app)
+    assert [item["doc_id"] for item in client.get("/memory", params={"intent": "invoice"}).json()["items"]] == ["json-1"]
+    assert client.get("/memory", params={"intent": "unknown"}).json()["items"] == []
+
+
+def test_sqlite_backend_pages_and_migrates_old_databases(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE documents (doc_id TEXT PRIMARY KEY, timestamp REAL NOT NULL, intent TEXT, "
+                 "file_type TEXT, crm_action TEXT, sender TEXT, payload TEXT NOT NULL)")
+    record = {"doc_id": "old", "timestamp": 1.0, "data": {
+        "email_processing": {"extracted_fields": {"urgency": "high"}}, "metadata": {"sender": "Ann <Ann@X.com>"}}}
+    conn.execute("INSERT INTO documents VALUES ('old', 1.0, NULL, 'eml', NULL, 'Ann <Ann@X.com>', ?)",
+                 (json.dumps(record),))
+    conn.commit()
+    conn.close()
+
+    shared_memory = SharedMemory(sqlite_path=path)
+    write_emails(shared_memory)
+    shared_memory.store.flush()
+
+    assert [r["doc_id"] for r in shared_memory.query(urgency="high", sender="ann@x.com")] == ["old"]
+    assert page_ids(shared_memory, 2, intent="complaint") == [["doc-1", "doc-5"], ["doc-3"]]
+    shared_memory.close()
+
+
+def test_sqlite_query_sees_writes_not_yet_committed(tmp_path):
+    shared_memory = SharedMemory(sqlite_path=str(tmp_path / "m.db"))
+    shared_memory.update("doc-1", {"classification": {"intent": "rfq"}})
+    shared_memory.store.flush()
+    store_commit = shared_memory.store._commit
+    shared_memory.store._commit = lambda conn, batch: None  # hold every later write in the pending map
+
+    shared_memory.update("doc-1", {"classification": {"intent": "complaint"}})
+    shared_memory.update("doc-2", {"classification": {"intent": "complaint"}})
+
+    assert [r["doc_id"] for r in shared_memory.query(intent="complaint")] == ["doc-2", "doc-1"]
+    assert shared_memory.query(intent="rfq") == []
+    assert [r["doc_id"] for r in shared_memory.query(limit=1)] == ["doc-2"]
+    shared_memory.store._commit = store_commit
+    shared_memory.close()
@@ -0,0 +1,94 @@
+import zlib
+from agents.classifier_agent import ClassifierAgent
+from memory.shared_memory import SharedMemory
+from memory.template_index import TemplateIndex
+
+
+def invoice(number, vendor="Acme Industrial Supplies"):
+    lines = [
+        f"Invoice {number} from {vendor}",
+        f"Invoice date 2024-03-{number % 28 + 1:02d}, payment due date 2024-04-{number % 28 + 1:02d}.",
+        f"Bill to customer account {number * 7} at 12 Harbour Road, Springfield.",
+        f"Item {number % 9} industrial bearings, quantity {number % 50 + 1}, unit price {number % 300}.50 EUR.",
+        f"Total amount due {number * 13}.00 EUR including VAT of {number % 21}%.",
+        "Please pay by bank transfer quoting the invoice number as reference.",
+        "Late payments are subject to interest as stated in our terms and conditions.",
+        "Thank you for your business and for choosing our company as your supplier.",
+    ]
+    return "\n".join(lines)
+
+
+def complaint():
+    return (
+        "I am writing to file a formal complaint about the repeated delays in your delivery service. "
+        "The last three orders arrived weeks late, the packaging was damaged and nobody from your "
+        "support team answered my calls or messages. I am deeply dissatisfied with how this issue "
+        "has been handled and expect a full explanation together with compensation for the losses "
+        "my shop suffered while waiting for the goods to arrive at our warehouse."
+    )
+
+
+def test_lookup_matches_documents_differing_only_in_numbers():
+    index = TemplateIndex(threshold=0.8, min_words=20)
+    first = index.lookup(invoice(1))
+    assert first.template is None
+    index.add("tpl-1", first.signature, "invoice", ["industrial bearings"])
+
+    match = index.lookup(invoice(42))
+    assert match.template.id == "tpl-1"
+    assert match.similarity >= 0.8
+    assert index.lookup(complaint()).template is None
+    assert index.lookup("too short to tell").signature is None
+    assert index.stats()["matches"] == 1
+
+
+def test_signature_hashes_are_exact():
+    index = TemplateIndex(min_words=20)
+    words = complaint().lower().replace(",", "").replace(".", "").split()
+
+    signature = index.signature(" ".join(words))
+
+    shingles = {zlib.crc32(" ".join(words[i:i + 3]).encode()) for i in range(len(words) - 2)}
+    assert signature.tolist() == [
+        min((int(a) * x + int(b)) % 4294967311 for x in shingles) for a, b in zip(index._a[:, 0], index._b[:, 0])
+    ]
+    # Holds for any shingle, not just these: the largest crc32 cannot wrap uint64.
+    assert int(index._a.max()) * (2 ** 32 - 1) + int(index._b.max()) < 2 ** 64
+
+
+def test_index_drops_least_recently_matched_template():
+    index = TemplateIndex(threshold=0.8, min_words=20, max_templates=2)
+    index.add("tpl-invoice", index.lookup(invoice(1)).signature, "invoice", [])
+    index.add("tpl-complaint", index.lookup(complaint()).signature, "complaint", [])
+    index.lookup(invoice(2))
+    syllabus = index.lookup(" ".join(f"week {n} covers chapter {n} of the course outline" for n in range(10)))
+    assert syllabus.template is None
+    index.add("tpl-syllabus", syllabus.signature, "syllabus", [])
+
+    assert index.lookup(invoice(5)).template.id == "tpl-invoice"
+    assert index.lookup(complaint()).template is None
+    assert index.stats()["templates"] == 2
+
+
+def test_classifier_reuses_template_analysis():
+    memory = SharedMemory()
+    agent = ClassifierAgent(memory, template_index=TemplateIndex(threshold=0.8, min_words=20))
+    analysed = []
+
+    def classify_text(text, doc=None, matches=None, intent=None):
+        analysed.append(text)
+        return {"intent": "invoice", "key_phrases": ["industrial bearings"]}
+
+    agent.classify_text = classify_text
+
+    first = agent.process_text(invoice(1), "txt", "doc-1", {})
+    second = agent.process_text(invoice(2), "txt", "doc-2", {})
+
+    assert len(analysed) == 1
+    assert "template" not in first
+    assert second["template"]["id"] == "doc-1"
+    assert second["intent"] == "invoice"
+    assert second["key_phrases"] == ["industrial bearings"]
+    assert second["processing_steps"][0]["agent"] == "email_agent"
+    record = memory.get_document_history("doc-2")
+    assert record["data"]["classification"]["template_id"] == "doc-1"
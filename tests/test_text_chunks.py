@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+from agents.classifier_agent import ClassifierAgent
+from memory.shared_memory import SharedMemory
+from utils.text_chunks import iter_chunks
+
+
+def test_chunks_prefer_page_then_paragraph_breaks():
+    pages = ["First paragraph of page one.\n\nSecond paragraph.", "Page two " * 5, "x" * 70]
+    text = "\f\n".join(pages)
+    chunks = list(iter_chunks(text, 60))
+
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 60 for chunk in chunks)
+    assert chunks[0] == pages[0] + "\f\n"
+    assert chunks[-1] == "x" * 10
+    assert list(iter_chunks("  \n\n  ", 4)) == []
+
+
+def span(text, label=""):
+    return SimpleNamespace(text=text, label_=label)
+
+
+def fake_doc(phrases):
+    return SimpleNamespace(noun_chunks=[span(p) for p in phrases if " " in p],
+                           ents=[span(p, "ORG") for p in phrases if " " not in p])
+
+
+def test_key_phrases_ranked_by_frequency_and_stop_early():
+    agent = ClassifierAgent(SharedMemory())
+    chunks = [
+        ["supply contract", "Acme", "due date"],
+        ["due date", "Acme", "late delivery"],
+        ["due date", "Acme", "supply contract"],
+        ["never parsed"],
+    ]
+    parsed = []
+
+    def iter_docs(text):
+        for phrases in chunks:
+            parsed.append(phrases)
+            yield fake_doc(phrases)
+
+    agent.iter_docs = iter_docs
+    agent.PHRASE_CONFIDENT_COUNT = 2
+
+    assert agent.extract_key_phrases("long text", limit=3) == ["due date", "Acme", "supply contract"]
+    assert len(parsed) == 3
+    assert agent.extract_key_phrases("", limit=2, doc=fake_doc(["b c", "a b", "b c"])) == ["b c", "a b"]
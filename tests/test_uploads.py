@@ -0,0 +1,50 @@
+import io
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+from memory.result_cache import ResultCache
+from utils.email_parser import parse_email
+from utils.uploads import UploadLimitMiddleware, persist_upload
+
+
+def make_client(max_bytes):
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, max_bytes=max_bytes)
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": file.size}
+
+    return TestClient(app)
+
+
+def test_upload_limit_rejects_large_bodies_with_413():
+    client = make_client(max_bytes=4096)
+
+    small = client.post("/upload", files={"file": ("a.txt", b"x" * 100)})
+    assert small.json() == {"size": 100}
+
+    declared = client.post("/upload", files={"file": ("a.txt", b"x" * 10_000)})
+    assert declared.status_code == 413
+
+    def chunks():
+        yield b"--b\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.txt\"\r\n\r\n"
+        for _ in range(10):
+            yield b"x" * 1000
+        yield b"\r\n--b--\r\n"
+
+    streamed = client.post(
+        "/upload", content=chunks(), headers={"content-type": "multipart/form-data; boundary=b"}
+    )
+    assert streamed.status_code == 413
+
+
+def test_handles_and_paths_are_read_like_bytes(tmp_path):
+    raw = b"From: a@example.com\r\nSubject: Hello\r\n\r\nInvoice attached.\r\n"
+    handle = io.BytesIO(raw)
+    handle.read()
+    path = persist_upload(handle, directory=str(tmp_path))
+
+    assert path.read_bytes() == raw
+    assert parse_email(handle)["body"] == parse_email(path)["body"] == parse_email(raw)["body"]
+    keys = {ResultCache.make_key(content, "eml", "v1") for content in (raw, handle, path)}
+    assert len(keys) == 1
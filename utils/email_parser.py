@@ -1,40 +1,278 @@
-from email import message_from_bytes
-from email.header import decode_header
+import base64
+import binascii
+import html
+import io
+import mmap
+import re
+from contextlib import contextmanager
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+from tempfile import SpooledTemporaryFile
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
 import logging
-from typing import Dict, Any
+
+from utils.file_utils import Content, open_content
 
 logger = logging.getLogger("EmailParser")
 
+# Nested multiparts deeper than this are not descended into.
+MAX_MIME_DEPTH = 16
+# Span size for counting bytes in a memory-mapped message.
+COUNT_CHUNK = 1024 * 1024
+
+_header_parser = BytesHeaderParser()
+_HEADER_END = re.compile(rb"\r?\n\r?\n")
+_HTML_DROP = re.compile(r"<(script|style|head)\b.*?</\1\s*>|<!--.*?-->", re.IGNORECASE | re.DOTALL)
+_HTML_BREAK = re.compile(r"<(br|/p|/div|/li|/tr|/h[1-6])\b[^>]*>", re.IGNORECASE)
+_HTML_TAG = re.compile(r"<[^>]+>")
+_BLANK_RUNS = re.compile(r"[ \t\r\f\v]+")
+_LINE_BREAKS = re.compile(r" ?\n\s*")
+
+
+class _Part(NamedTuple):
+    """A leaf MIME part: its parsed headers and the span of its raw body."""
+    headers: Any
+    start: int
+    end: int
 
-def parse_email(raw_email: bytes) -> Dict[str, Any]:
+
+def decode_header_value(value: Optional[str]) -> str:
+    """RFC 2047 encoded-words of a header decoded to text ("" if missing)."""
+    if value is None:
+        return ""
     try:
-        msg = message_from_bytes(raw_email)
+        return str(make_header(decode_header(value)))
+    except (LookupError, UnicodeDecodeError, binascii.Error):
+        return str(value)
 
-        # Decode subject
-        subject, encoding = decode_header(msg["Subject"])[0]
-        if isinstance(subject, bytes):
-            subject = subject.decode(encoding if encoding else 'utf-8')
 
-        sender, encoding = decode_header(msg["From"])[0]
-        if isinstance(sender, bytes):
-            sender = sender.decode(encoding if encoding else 'utf-8')
+def html_to_text(markup: str) -> str:
+    """Cheap HTML to text: drop scripts/styles and tags, keep line breaks."""
+    text = _HTML_DROP.sub(" ", markup)
+    text = _HTML_BREAK.sub("\n", text)
+    text = html.unescape(_HTML_TAG.sub(" ", text))
+    text = _BLANK_RUNS.sub(" ", text)
+    return _LINE_BREAKS.sub(lambda m: "\n\n" if m.group().count("\n") > 1 else "\n", text).strip()
 
-        body = ""
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                if content_type == "text/plain":
-                    body = part.get_payload(decode=True).decode()
-                    break
-        else:
-            body = msg.get_payload(decode=True).decode()
-
-        return {
-            "subject": subject,
-            "sender": sender,
-            "body": body,
-            "headers": dict(msg.items())
-        }
+
+# ``data`` below is bytes or a read-only mmap of the message, so only
+# find(), slicing and regex searches are used on it directly.
+
+def _startswith(data: bytes, prefix: bytes, start: int, end: int) -> bool:
+    return start + len(prefix) <= end and data[start:start + len(prefix)] == prefix
+
+
+def _count(data: bytes, byte: bytes, start: int, end: int) -> int:
+    return sum(data[pos:min(pos + COUNT_CHUNK, end)].count(byte) for pos in range(start, end, COUNT_CHUNK))
+
+
+def _rstripped_end(data: bytes, start: int, end: int) -> int:
+    while end > start and data[end - 1:end].isspace():
+        end -= 1
+    return end
+
+
+def _split_headers(data: bytes, start: int, end: int):
+    """Parsed headers of the entity at ``start`` and where its body begins."""
+    if _startswith(data, b"\n", start, end):
+        return _header_parser.parsebytes(b""), start + 1
+    if _startswith(data, b"\r\n", start, end):
+        return _header_parser.parsebytes(b""), start + 2
+    match = _HEADER_END.search(data, start, end)
+    header_end = match.start() if match else end
+    body_start = match.end() if match else end
+    return _header_parser.parsebytes(data[start:header_end]), body_start
+
+
+def _child_spans(data: bytes, start: int, end: int, boundary: bytes):
+    """Spans of the body parts between the boundary lines of a multipart body."""
+    delimiter = b"--" + boundary
+    lines = [start] if _startswith(data, delimiter, start, end) else []
+    pos = data.find(b"\n" + delimiter, start, end)
+    while pos != -1:
+        lines.append(pos + 1)
+        pos = data.find(b"\n" + delimiter, pos + 1, end)
+
+    spans, part_start = [], None
+    for line in lines:
+        after = line + len(delimiter)
+        closing = _startswith(data, b"--", after, end)
+        # A longer boundary sharing this one as a prefix is not a delimiter.
+        if not closing and after < end and data[after:after + 1] not in (b"\r", b"\n", b" ", b"\t"):
+            continue
+        if part_start is not None:
+            part_end = line - 1
+            if part_end > part_start and data[part_end - 1:part_end] == b"\r":
+                part_end -= 1
+            spans.append((part_start, max(part_start, part_end)))
+        if closing:
+            break
+        newline = data.find(b"\n", after, end)
+        part_start = end if newline == -1 else newline + 1
+    return spans
+
+
+def _leaf_parts(data: bytes, start: int, end: int, headers, parts: List[_Part], depth: int = 0):
+    """Collect leaf parts depth-first; bodies are located, never decoded."""
+    boundary = headers.get_boundary() if headers.get_content_maintype() == "multipart" else None
+    if boundary is None or depth >= MAX_MIME_DEPTH:
+        parts.append(_Part(headers, start, end))
+        return
+    for child_start, child_end in _child_spans(data, start, end, boundary.encode("utf-8", "replace")):
+        child_headers, body_start = _split_headers(data, child_start, child_end)
+        _leaf_parts(data, body_start, child_end, child_headers, parts, depth + 1)
+
+
+def _transfer_encoding(headers) -> str:
+    return str(headers.get("Content-Transfer-Encoding", "")).strip().lower()
+
+
+def _decode_body(data: bytes, part: _Part) -> str:
+    payload = data[part.start:part.end]
+    encoding = _transfer_encoding(part.headers)
+    try:
+        if encoding == "base64":
+            payload = base64.b64decode(payload)
+        elif encoding == "quoted-printable":
+            payload = binascii.a2b_qp(payload)
+    except (binascii.Error, ValueError) as e:
+        logger.warning(f"Undecodable {encoding} body: {str(e)}")
+    charset = part.headers.get_content_charset() or "utf-8"
+    try:
+        return payload.decode(charset, errors="replace")
+    except LookupError:
+        return payload.decode("utf-8", errors="replace")
+
+
+def _base64_chars(data: bytes, start: int, end: int) -> int:
+    """Base64 characters in a span, excluding line breaks.
+
+    Encoders wrap at a fixed width, so the line layout is derived from the
+    first line and checked at the last full line; counting the breaks is
+    the fallback for irregular wrapping.
+    """
+    newline = data.find(b"\n", start, end)
+    if newline == -1:
+        return _rstripped_end(data, start, end) - start
+    line = newline + 1 - start
+    text = line - (2 if data[newline - 1:newline] == b"\r" else 1)
+    full_lines = (end - start) // line
+    tail = start + full_lines * line
+    if data[tail - 1:tail] == b"\n":
+        return full_lines * text + _rstripped_end(data, tail, end) - tail
+    return (end - start) - _count(data, b"\n", start, end) - _count(data, b"\r", start, end)
+
+
+def _decoded_size(data: bytes, part: _Part) -> int:
+    """Size of a part once decoded, computed from the encoded span alone."""
+    if _transfer_encoding(part.headers) != "base64":
+        return part.end - part.start
+    tail = data[max(part.start, part.end - 8):part.end].rstrip()
+    padding = len(tail) - len(tail.rstrip(b"="))
+    return max(_base64_chars(data, part.start, part.end) * 3 // 4 - padding, 0)
+
+
+def _is_attachment(headers) -> bool:
+    if headers.get_content_disposition() == "attachment" or headers.get_filename():
+        return True
+    return headers.get_content_maintype() != "text"
+
+
+def _attachment_info(data: bytes, part: _Part) -> Dict[str, Any]:
+    return {
+        "filename": decode_header_value(part.headers.get_filename()) or None,
+        "content_type": part.headers.get_content_type(),
+        "size": _decoded_size(data, part),
+    }
+
+
+def _routing_fields(headers) -> Dict[str, Any]:
+    return {
+        "subject": decode_header_value(headers["Subject"]),
+        "sender": decode_header_value(headers["From"]),
+        "headers": dict(headers.items()),
+    }
+
+
+def parse_email_headers(raw_email: Content) -> Dict[str, Any]:
+    """Subject, sender and headers only; stops reading at the end of the header block."""
+    with open_content(raw_email) as fh:
+        lines = []
+        for line in fh:
+            if line in (b"\n", b"\r\n"):
+                break
+            lines.append(line)
+    return _routing_fields(_header_parser.parsebytes(b"".join(lines)))
+
+
+@contextmanager
+def _message_buffer(raw_email: Content) -> Iterator[bytes]:
+    """The raw message: bytes as given, a read-only map of a file, else the handle's contents."""
+    if isinstance(raw_email, bytes):
+        yield raw_email
+        return
+    with open_content(raw_email) as fh:
+        # fileno() would roll an in-memory spooled upload over to disk.
+        target = fh._file if isinstance(fh, SpooledTemporaryFile) else fh
+        try:
+            mapped = mmap.mmap(target.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            # In-memory streams, and empty files (which cannot be mapped).
+            mapped = None
+        if mapped is None:
+            yield fh.read()
+            return
+        with mapped:
+            yield mapped
+
+
+def parse_email(raw_email: Content) -> Dict[str, Any]:
+    """Subject, sender, headers, body text and attachment metadata.
+
+    The MIME structure is located by scanning for boundaries; only the
+    chosen body part is decoded (with its declared charset), preferring
+    ``text/plain`` and falling back to ``text/html`` converted to text.
+    Attachments are described by name, type and decoded size without
+    decoding their payload. Files and file-backed handles are memory-mapped
+    rather than read.
+    """
+    try:
+        with _message_buffer(raw_email) as data:
+            return _parse_message(data)
     except Exception as e:
         logger.error(f"Failed to parse email: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+def _parse_message(data: bytes) -> Dict[str, Any]:
+    """Headers, chosen body and attachment metadata of ``data`` (bytes or a memory map)."""
+    headers, body_start = _split_headers(data, 0, len(data))
+    parts = []
+    _leaf_parts(data, body_start, len(data), headers, parts)
+
+    plain = markup = None
+    attachments = []
+    for part in parts:
+        if part.headers.get_content_maintype() == "multipart":
+            # A multipart without a usable boundary.
+            continue
+        if _is_attachment(part.headers):
+            attachments.append(_attachment_info(data, part))
+        elif part.headers.get_content_subtype() == "html":
+            if markup is None:
+                markup = part
+        elif plain is None:
+            plain = part
+
+    if plain is not None:
+        body = _decode_body(data, plain)
+    elif markup is not None:
+        body = html_to_text(_decode_body(data, markup))
+    else:
+        body = ""
+
+    return {
+        **_routing_fields(headers),
+        "body": body,
+        "attachments": attachments,
+    }
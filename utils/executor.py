@@ -0,0 +1,161 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Optional
+import logging
+
+logger = logging.getLogger("ClassifierExecutor")
+
+# Per-process classifier used by the "process" backend; built once by
+# _init_worker so every worker loads en_core_web_sm a single time.
+_worker_classifier = None
+
+
+def _init_worker():
+    global _worker_classifier
+    from agents.classifier_agent import ClassifierAgent
+    from memory.result_cache import ResultCache
+    from memory.search_index import SEARCH_INDEX_DIR, SearchIndexBuffer
+    from memory.shared_memory import SharedMemory
+    from memory.template_index import TemplateIndex
+    from utils import pdf_parser
+
+    # The pool already runs a worker per CPU; a PDF pool per worker on top
+    # would oversubscribe the machine unless PDF_WORKERS asks for it.
+    if not os.getenv("PDF_WORKERS"):
+        pdf_parser.PDF_WORKERS = 1
+
+    shared_memory = SharedMemory()
+    _worker_classifier = ClassifierAgent(
+        shared_memory,
+        ResultCache.from_env(shared_memory),
+        TemplateIndex.from_env(),
+        SearchIndexBuffer() if SEARCH_INDEX_DIR else None,
+    )
+    _worker_classifier.warm_up()
+
+
+def _call_in_worker(method: str, args: tuple, kwargs: dict):
+    """Run a classifier method in a worker and hand back its memory writes.
+
+    The worker's SharedMemory and search index buffer are private to the
+    process, so the records and texts it collected are returned to the
+    parent and replayed there.
+    """
+    memory = _worker_classifier.shared_memory
+    search_index = _worker_classifier.search_index
+    try:
+        result = getattr(_worker_classifier, method)(*args, **kwargs)
+        return result, dict(memory.in_memory_store.items()), search_index.drain() if search_index else []
+    finally:
+        memory.in_memory_store.clear()
+        if search_index is not None:
+            search_index.drain()
+
+
+def replay_search_documents(classifier_agent, documents):
+    """Add texts indexed in a worker process to the parent's search index."""
+    if documents and classifier_agent.search_index is not None:
+        classifier_agent.search_index.add_many(documents)
+
+
+class ExecutorSaturated(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Classifier executor is saturated")
+        self.retry_after = retry_after
+
+
+class ClassifierExecutor:
+    """Runs ClassifierAgent calls off the event loop.
+
+    ``backend`` is ``inline`` (call directly on the event loop), ``thread``
+    (thread pool sharing the loaded agent) or ``process`` (process pool, one
+    agent per worker). At most ``max_workers + max_queue`` calls may be
+    running or waiting; further calls raise ``ExecutorSaturated`` right away.
+    """
+
+    BACKENDS = ("inline", "thread", "process")
+
+    def __init__(self, classifier_agent, backend: str = "thread", max_workers: Optional[int] = None,
+                 max_queue: int = 32, timeout: Optional[float] = None, retry_after: int = 5):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown classifier backend '{backend}'")
+
+        self.classifier_agent = classifier_agent
+        self.backend = backend
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(self.max_workers + max_queue)
+
+        if backend == "thread":
+            self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="classifier")
+        elif backend == "process":
+            # Spawned, not forked: the parent may be mid warm-up in another
+            # thread, and a fork would inherit its locks in the held state.
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        else:
+            self.pool = None
+
+        logger.info(
+            f"Classifier backend '{backend}' with {self.max_workers} workers, "
+            f"queue depth {max_queue}, timeout {timeout}"
+        )
+
+    @classmethod
+    def from_env(cls, classifier_agent):
+        timeout = float(os.getenv("CLASSIFIER_TIMEOUT", "120"))
+        workers = int(os.getenv("CLASSIFIER_WORKERS", "0"))
+        return cls(
+            classifier_agent,
+            backend=os.getenv("CLASSIFIER_BACKEND", "thread"),
+            max_workers=workers or None,
+            max_queue=int(os.getenv("CLASSIFIER_QUEUE_DEPTH", "32")),
+            timeout=timeout or None,
+            retry_after=int(os.getenv("CLASSIFIER_RETRY_AFTER", "5")),
+        )
+
+    async def run(self, method: str, *args, **kwargs) -> Any:
+        """Await ``classifier_agent.<method>(*args, **kwargs)`` on the configured backend.
+
+        Raises ``ExecutorSaturated`` when the queue is full and
+        ``asyncio.TimeoutError`` when the call exceeds ``timeout``.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorSaturated(self.retry_after)
+
+        if self.pool is None:
+            try:
+                return getattr(self.classifier_agent, method)(*args, **kwargs)
+            finally:
+                self._slots.release()
+
+        if self.backend == "thread":
+            future = self.pool.submit(getattr(self.classifier_agent, method), *args, **kwargs)
+        else:
+            future = self.pool.submit(_call_in_worker, method, args, kwargs)
+        # The slot is freed when the work really finishes, not when the caller
+        # stops waiting, so timed-out calls still count against the bound.
+        future.add_done_callback(lambda _: self._slots.release())
+
+        result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        if self.backend == "process":
+            result, records, documents = result
+            await self.classifier_agent.shared_memory.aupdate_many(
+                {doc_id: record["data"] for doc_id, record in records.items()}
+            )
+            if documents:
+                # SearchIndex.add blocks while the indexer is behind; keep that off the loop.
+                await asyncio.to_thread(replay_search_documents, self.classifier_agent, documents)
+        return result
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
@@ -1,9 +1,16 @@
 import os
-from typing import Union
+from contextlib import contextmanager
+from io import BytesIO
+from typing import BinaryIO, Iterator, Union
 import logging
 
 logger = logging.getLogger("FileUtils")
 
+# Document content travels through the agents as bytes/str, a binary file
+# handle (the spooled upload) or a Path (a temp file for worker processes).
+Content = Union[bytes, str, BinaryIO, os.PathLike]
+
+
 def get_file_extension(filename: str) -> str:
     _, ext = os.path.splitext(filename)
     return ext.lower().lstrip('.')
@@ -26,7 +33,7 @@ async def read_file_content(file) -> Union[str, bytes]:
         content = await file.read()
         # If no content_type or it's text/JSON, try decoding
         if not getattr(file, 'content_type', None) or \
-           (file.content_type and file.content_type.startswith(('text/', 'application/json')):
+           (file.content_type and file.content_type.startswith(('text/', 'application/json'))):
             try:
                 return content.decode('utf-8')
             except UnicodeDecodeError:
@@ -34,4 +41,38 @@ async def read_file_content(file) -> Union[str, bytes]:
         return content
     except Exception as e:
         logger.error(f"Error reading file: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+def is_file_like(content) -> bool:
+    return hasattr(content, "read") and hasattr(content, "seek")
+
+
+@contextmanager
+def open_content(content: Content) -> Iterator[BinaryIO]:
+    """Binary, rewound handle over ``content`` without copying it.
+
+    Handles passed in are left open for their owner; paths are opened and
+    closed here.
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        # BytesIO shares the buffer of an immutable bytes object until written.
+        yield BytesIO(content)
+    elif isinstance(content, os.PathLike):
+        with open(content, "rb") as fh:
+            yield fh
+    elif is_file_like(content):
+        content.seek(0)
+        yield content
+    else:
+        raise TypeError(f"Unsupported content type {type(content).__name__}")
+
+
+def read_text(content: Content) -> str:
+    if isinstance(content, str):
+        return content
+    with open_content(content) as fh:
+        return fh.read().decode("utf-8", errors="replace")
+
@@ -0,0 +1,188 @@
+"""Hashed TF-IDF intent classifier: a NumPy softmax model trained offline.
+
+Retrain the shipped artifact after editing the labelled samples with
+``python -m utils.intent_model models/intent_samples.jsonl -o models/intent_model.npz``.
+"""
+import argparse
+import io
+import json
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("IntentModel")
+
+DEFAULT_MODEL_PATH = Path(__file__).resolve().parent.parent / "models" / "intent_model.npz"
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", str(DEFAULT_MODEL_PATH))
+# Below this probability (or when "unknown" wins) the answer is "unknown".
+INTENT_MODEL_THRESHOLD = float(os.getenv("INTENT_MODEL_THRESHOLD", "0.7"))
+
+N_FEATURES = 2 ** 13
+MAX_CHARS = 100_000  # the opening of a long document is enough to judge it
+BATCH_ROWS = 512  # rows per dense matrix, ~16 MB at N_FEATURES float32 columns
+UNKNOWN = "unknown"
+
+_WORDS = re.compile(r"[^\W\d_]+")
+
+
+def features(text: str) -> List[str]:
+    """Words, 5-letter word prefixes (a cheap stemmer) and word bigrams of ``text``."""
+    words = _WORDS.findall(text[:MAX_CHARS].lower())
+    return words + [f"~{word[:5]}" for word in words if len(word) > 5] + [
+        f"{first} {second}" for first, second in zip(words, words[1:])
+    ]
+
+
+def hashed_counts(texts: Sequence[str], n_features: int = N_FEATURES) -> np.ndarray:
+    counts = np.zeros((len(texts), n_features), dtype=np.float32)
+    for row, text in enumerate(texts):
+        columns = [zlib.crc32(feature.encode()) % n_features for feature in features(text)]
+        np.add.at(counts[row], columns, 1)
+    return counts
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class IntentModel:
+    """Linear softmax model over sublinear, L2-normalised hashed TF-IDF vectors.
+
+    ``predict_proba`` scores a batch with one matrix multiply per
+    ``BATCH_ROWS`` texts; probabilities are temperature-scaled with a
+    temperature fitted on held-out folds at training time.
+    """
+
+    def __init__(self, labels: Sequence[str], weights: np.ndarray, bias: np.ndarray, idf: np.ndarray,
+                 temperature: float = 1.0, digest: str = ""):
+        self.labels = list(labels)
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.idf = idf.astype(np.float32)
+        self.temperature = float(temperature)
+        self.digest = digest  # identifies the artifact in result-cache keys
+
+    @property
+    def n_features(self) -> int:
+        return self.idf.shape[0]
+
+    @classmethod
+    def load(cls, path=INTENT_MODEL_PATH) -> "IntentModel":
+        with open(path, "rb") as fh:
+            raw = fh.read()
+        with np.load(io.BytesIO(raw)) as data:
+            return cls(data["labels"].tolist(), data["weights"], data["bias"], data["idf"],
+                       float(data["temperature"]), digest=f"{zlib.crc32(raw):08x}")
+
+    def save(self, path):
+        with open(path, "wb") as fh:
+            np.savez_compressed(fh, labels=np.array(self.labels), weights=self.weights, bias=self.bias,
+                                idf=self.idf, temperature=np.float32(self.temperature))
+
+    def transform(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = hashed_counts(texts, self.n_features)
+        np.log1p(matrix, out=matrix)
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def logits(self, texts: Sequence[str]) -> np.ndarray:
+        return self.transform(texts) @ self.weights + self.bias
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """Calibrated probabilities, one row per text and one column per label."""
+        if not texts:
+            return np.zeros((0, len(self.labels)), dtype=np.float32)
+        return np.vstack([
+            _softmax(self.logits(texts[start:start + BATCH_ROWS]) / self.temperature)
+            for start in range(0, len(texts), BATCH_ROWS)
+        ])
+
+    def scores(self, texts: Sequence[str]) -> List[Dict[str, float]]:
+        return [dict(zip(self.labels, row.tolist())) for row in self.predict_proba(texts)]
+
+    def predict(self, texts: Sequence[str], threshold: float = INTENT_MODEL_THRESHOLD,
+                labels: Optional[Sequence[str]] = None) -> List[str]:
+        """Best label per text; "unknown" below ``threshold`` or when the best label is not in ``labels``."""
+        probabilities = self.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        return [
+            self.labels[column]
+            if probabilities[row, column] >= threshold and (labels is None or self.labels[column] in labels)
+            else UNKNOWN
+            for row, column in enumerate(best)
+        ]
+
+    @classmethod
+    def fit(cls, texts: Sequence[str], labels: Sequence[str], n_features: int = N_FEATURES,
+            epochs: int = 300, learning_rate: float = 2.0, l2: float = 1e-4, folds: int = 5) -> "IntentModel":
+        """Train on labelled texts; the temperature comes from ``folds``-fold held-out logits."""
+        classes = sorted(set(labels))
+        targets = np.array([classes.index(label) for label in labels])
+        counts = hashed_counts(texts, n_features)
+        document_frequency = (counts > 0).sum(axis=0)
+        idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        def train(rows):
+            model = cls(classes, np.zeros((n_features, len(classes))), np.zeros(len(classes)), idf)
+            matrix = model.transform([texts[row] for row in rows])
+            onehot = np.eye(len(classes), dtype=np.float32)[targets[rows]]
+            for _ in range(epochs):
+                error = (_softmax(matrix @ model.weights + model.bias) - onehot) / len(rows)
+                model.weights -= learning_rate * (matrix.T @ error + l2 * model.weights)
+                model.bias -= learning_rate * error.sum(axis=0)
+            return model
+
+        order = np.random.default_rng(0).permutation(len(texts))
+        held_out_logits = np.zeros((len(texts), len(classes)), dtype=np.float32)
+        for fold in range(folds):
+            test_rows = order[fold::folds]
+            train_rows = np.setdiff1d(order, test_rows)
+            held_out_logits[test_rows] = train(train_rows).logits([texts[row] for row in test_rows])
+
+        def nll(temperature):
+            probabilities = _softmax(held_out_logits / temperature)
+            return -np.log(probabilities[np.arange(len(texts)), targets] + 1e-12).mean()
+
+        temperature = min(np.linspace(0.05, 3.0, 60), key=nll)
+        accuracy = float((held_out_logits.argmax(axis=1) == targets).mean())
+        logger.info(f"Held-out accuracy {accuracy:.2%} over {len(texts)} samples, temperature {temperature:.2f}")
+
+        model = train(np.arange(len(texts)))
+        model.temperature = float(temperature)
+        return model
+
+
+def load_model(path: Optional[str] = None) -> Optional[IntentModel]:
+    """The shipped model, or None (logged) when the artifact is missing or unreadable."""
+    path = path or INTENT_MODEL_PATH
+    try:
+        return IntentModel.load(path)
+    except (OSError, KeyError, ValueError) as e:
+        logger.warning(f"Intent model unavailable at {path}: {str(e)}")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the hashed TF-IDF intent model")
+    parser.add_argument("samples", help="JSON lines with 'text' and 'intent' fields")
+    parser.add_argument("-o", "--output", default=str(DEFAULT_MODEL_PATH))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.samples, encoding="utf-8") as fh:
+        samples = [json.loads(line) for line in fh if line.strip()]
+    model = IntentModel.fit([s["text"] for s in samples], [s["intent"] for s in samples])
+    model.save(args.output)
+    logger.info(f"Wrote {args.output} ({os.path.getsize(args.output)} bytes, labels {model.labels})")
+
+
+if __name__ == "__main__":
+    main()
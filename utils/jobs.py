@@ -0,0 +1,165 @@
+import asyncio
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger("JobQueue")
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", "100"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "1000"))
+
+# Lower runs first. Cheap formats get ahead of PDFs (and whole mailboxes),
+# and every 10x of size above 1 MiB costs one more step, so small jobs never
+# wait behind big ones of the same kind.
+TYPE_PRIORITY = {"json": 0, "ndjson": 0, "jsonl": 0, "txt": 0, "eml": 1, "pdf": 2, "mailbox": 3}
+SIZE_STEP_BYTES = 1024 * 1024
+
+
+def job_priority(file_type: str, size: Optional[int]) -> int:
+    priority = TYPE_PRIORITY.get(file_type, 2)
+    if size and size > SIZE_STEP_BYTES:
+        priority += 1 + int(math.log10(size / SIZE_STEP_BYTES))
+    return priority
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Job queue is full")
+        self.retry_after = retry_after
+
+
+class Job:
+    """One queued document: its input, state and, once finished, result or error."""
+
+    def __init__(self, job_id: str, content, file_type: str, metadata: Dict[str, Any], priority: int):
+        self.id = job_id
+        self.content = content
+        self.file_type = file_type
+        self.metadata = metadata
+        self.priority = priority
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "document_id": self.id,
+            "status": self.status,
+            "file_type": self.file_type,
+            "priority": self.priority,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        if include_result and self.result is not None:
+            data["result"] = self.result
+        return data
+
+
+class JobQueue:
+    """Bounded priority queue of documents drained by ``workers`` asyncio tasks.
+
+    ``process(job)`` does the work (the app hands it to the classifier
+    executor) and ``on_finish(job)`` runs after every job, succeeded or not,
+    e.g. to delete the stored upload, including jobs still queued at
+    ``stop``, which fail without running. ``submit`` raises ``QueueFull`` once
+    ``max_queue`` jobs are waiting. Finished jobs are kept for lookup up to
+    ``history`` entries, oldest dropped first.
+    """
+
+    def __init__(self, process: Callable[[Job], Awaitable[Dict[str, Any]]],
+                 on_finish: Optional[Callable[[Job], Any]] = None, workers: int = JOB_WORKERS,
+                 max_queue: int = JOB_QUEUE_DEPTH, history: int = JOB_HISTORY, retry_after: int = 5):
+        self.process = process
+        self.on_finish = on_finish
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.history = history
+        self.retry_after = retry_after
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks = []
+        self._sequence = itertools.count()
+
+    def start(self):
+        """Start the workers; must be called on the running event loop."""
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._work(), name=f"job-worker-{n}") for n in range(self.workers)]
+        logger.info(f"Job queue started with {self.workers} workers, depth {self.max_queue}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while self._queue is not None and not self._queue.empty():
+            _, _, job = self._queue.get_nowait()
+            self._queue.task_done()
+            job.status, job.error = "failed", "Cancelled at shutdown"
+            job.finished_at = time.time()
+            await self._finish(job)
+
+    def full(self) -> bool:
+        return self._queue.full()
+
+    def submit(self, job: Job) -> Job:
+        try:
+            self._queue.put_nowait((job.priority, next(self._sequence), job))
+        except asyncio.QueueFull:
+            raise QueueFull(self.retry_after)
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        statuses = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {"workers": self.workers, "max_queue": self.max_queue,
+                "queued": self._queue.qsize() if self._queue else 0, "jobs": statuses}
+
+    async def _work(self):
+        while True:
+            _, _, job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await self.process(job)
+                job.status = "done"
+            except asyncio.CancelledError:
+                job.status, job.error = "failed", "Cancelled at shutdown"
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {str(e)}", exc_info=True)
+                job.status, job.error = "failed", str(e) or type(e).__name__
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+                await self._finish(job)
+
+    async def _finish(self, job: Job):
+        if self.on_finish is not None:
+            try:
+                await self.on_finish(job)
+            except Exception as e:
+                logger.error(f"Job {job.id} cleanup failed: {str(e)}")
+        job.content = None
+        self._forget_old()
+
+    def _forget_old(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
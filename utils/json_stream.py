@@ -0,0 +1,113 @@
+import codecs
+import json
+import re
+from typing import Any, BinaryIO, Iterator
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Array separator with the whitespace around it, consumed in one match.
+_SEPARATOR = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+
+
+class _Buffer:
+    """Text window over a binary stream, refilled on demand."""
+
+    def __init__(self, fh: BinaryIO, chunk_size: int):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size: int = None) -> bool:
+        """Read another chunk; False once the stream is exhausted."""
+        if self.eof:
+            return False
+        chunk = self.fh.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            self.text += self.decoder.decode(b"", final=True)
+            return False
+        # Drop what has been consumed so the window stays about one record wide.
+        self.text = self.text[self.pos:] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, or "" at the end of the stream."""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def value(self) -> Any:
+        """Decode the next JSON value."""
+        if self.pos >= len(self.text) or self.text[self.pos] in " \t\n\r":
+            self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+                # A value touching the end of the window (e.g. a number) may
+                # continue in the next chunk.
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow the read size so a record much larger than one chunk is
+            # not re-parsed once per chunk.
+            if not self.fill(size):
+                continue
+            size *= 2
+
+
+class JSONRecordReader:
+    """Records from a binary JSON stream, read without loading all of it.
+
+    A top-level array (``format == "array"``) yields its elements; anything
+    else is read as a sequence of whitespace-separated values
+    (``format == "stream"``), which covers NDJSON as well as a single
+    document. Memory stays bounded by the largest record.
+    """
+
+    def __init__(self, fh: BinaryIO, chunk_size: int = CHUNK_SIZE):
+        self._buffer = _Buffer(fh, chunk_size)
+        self.format = "array" if self._buffer.peek() == "[" else "stream"
+
+    def __iter__(self) -> Iterator[Any]:
+        buffer = self._buffer
+        if self.format == "stream":
+            while buffer.peek():
+                yield buffer.value()
+            return
+
+        buffer.pos += 1
+        if buffer.peek() == "]":
+            buffer.pos += 1
+        else:
+            while True:
+                yield buffer.value()
+                match = _SEPARATOR.match(buffer.text, buffer.pos)
+                if match is not None:
+                    separator = match.group(1)
+                    buffer.pos = match.end()
+                else:
+                    separator = buffer.peek()
+                    buffer.pos += 1
+                if separator == "]":
+                    break
+                if separator != ",":
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buffer.text, buffer.pos - 1)
+        if buffer.peek():
+            raise json.JSONDecodeError("Extra data", buffer.text, buffer.pos)
+
+
+def iter_json_records(fh: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    return iter(JSONRecordReader(fh, chunk_size))
@@ -0,0 +1,303 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional, Union
+import logging
+
+from utils.executor import _call_in_worker, _init_worker, replay_search_documents
+
+logger = logging.getLogger("MailboxIngest")
+
+MAILBOX_BATCH_SIZE = int(os.getenv("MAILBOX_BATCH_SIZE", "64"))
+MAILBOX_WORKERS = int(os.getenv("MAILBOX_WORKERS", "0")) or os.cpu_count() or 1
+
+Position = Union[int, str, None]
+
+
+class MailboxMessage(NamedTuple):
+    """One raw message; resuming from ``resume`` continues after it."""
+    key: str
+    raw: bytes
+    resume: Position
+
+
+def mailbox_format(path: Union[str, Path]) -> str:
+    path = Path(path)
+    if path.is_dir():
+        if not (path / "cur").is_dir() and not (path / "new").is_dir():
+            raise ValueError(f"{path} is a directory but not a Maildir")
+        return "maildir"
+    if path.is_file():
+        return "mbox"
+    raise FileNotFoundError(path)
+
+
+def iter_mbox(path: Union[str, Path], start: int = 0) -> Iterator[MailboxMessage]:
+    """Messages of an mbox file from byte offset ``start``, one at a time.
+
+    Only the current message is held in memory. Keys are the byte offset of
+    each message's ``From `` line, which is also what ``resume`` points at
+    for the next one.
+    """
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        offset = position = start
+        # A "From " line only separates messages after a blank line (or at
+        # the start); until the first one is seen there is no message.
+        lines, blank = None, True
+        for line in fh:
+            if blank and line.startswith(b"From "):
+                if lines:
+                    yield MailboxMessage(str(offset), b"".join(lines), position)
+                offset, lines = position, []
+            elif lines is not None:
+                lines.append(line)
+            blank = line in (b"\n", b"\r\n")
+            position += len(line)
+        if lines:
+            yield MailboxMessage(str(offset), b"".join(lines), position)
+
+
+def iter_maildir(path: Union[str, Path], after: Optional[str] = None) -> Iterator[MailboxMessage]:
+    """Messages of a Maildir in key order, starting after key ``after``.
+
+    Maildir keys begin with the delivery time, so key order is roughly
+    arrival order and stays stable while messages move from new/ to cur/.
+    """
+    import mailbox
+
+    maildir = mailbox.Maildir(path, factory=None, create=False)
+    for key in sorted(maildir.iterkeys()):
+        if after is not None and key <= after:
+            continue
+        try:
+            raw = maildir.get_bytes(key)
+        except KeyError:
+            # Deleted since the listing was taken.
+            continue
+        yield MailboxMessage(key, raw, key)
+
+
+def iter_mailbox(path: Union[str, Path], position: Position = None) -> Iterator[MailboxMessage]:
+    if mailbox_format(path) == "mbox":
+        return iter_mbox(path, position or 0)
+    return iter_maildir(path, position)
+
+
+def default_checkpoint_path(path: Union[str, Path]) -> str:
+    """Checkpoint file kept next to an mbox, or inside a Maildir (which ignores it)."""
+    path = Path(path)
+    if path.is_dir():
+        return str(path / ".ingest-checkpoint.json")
+    return f"{path}.checkpoint.json"
+
+
+def load_checkpoint(path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path: Union[str, Path], checkpoint: Dict[str, Any]):
+    """Write the checkpoint atomically, so a crash never leaves half a file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(checkpoint, fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+def _process_in_worker(documents, batch_size):
+    return _call_in_worker("process_batch", (documents,), {"batch_size": batch_size})
+
+
+class MailboxIngestor:
+    """Stream an mbox file or Maildir through ``ClassifierAgent.process_batch``.
+
+    Messages are read lazily and grouped into batches of ``batch_size``;
+    each batch is one ``nlp.pipe`` stream and one SharedMemory flush. With
+    ``workers > 1`` batches run in a spawned process pool (one loaded model
+    per worker) and their memory writes are replayed here. Batches are
+    committed in mailbox order, and after each one the checkpoint records
+    the position to resume from, so a crashed run repeats at most the
+    batches that were in flight. Document ids derive from the mailbox path
+    and message key, so repeated messages overwrite their earlier record.
+
+    With one worker, batches go to ``process_batch(documents, batch_size)``,
+    by default ``classifier_agent.process_batch`` in the calling thread.
+    """
+
+    def __init__(self, classifier_agent, batch_size: int = MAILBOX_BATCH_SIZE,
+                 workers: int = MAILBOX_WORKERS, checkpoint_path: Optional[str] = None,
+                 process_batch: Optional[Callable[[list, int], list]] = None):
+        self.classifier_agent = classifier_agent
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.checkpoint_path = checkpoint_path
+        self.process_batch = process_batch or (
+            lambda documents, batch_size: classifier_agent.process_batch(documents, batch_size=batch_size)
+        )
+
+    def _documents(self, source: str, messages) -> list:
+        return [
+            {
+                "content": message.raw,
+                "file_type": "eml",
+                "doc_id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}#{message.key}")),
+                "metadata": {
+                    "filename": f"{Path(source).name}#{message.key}",
+                    "mailbox": source,
+                    "mailbox_key": message.key,
+                    "size": len(message.raw),
+                },
+            }
+            for message in messages
+        ]
+
+    def ingest(self, path: Union[str, Path], resume: bool = True) -> Dict[str, Any]:
+        """Ingest every message after the checkpoint; returns run totals."""
+        source = str(Path(path).resolve())
+        mailbox_type = mailbox_format(source)
+        checkpoint = load_checkpoint(self.checkpoint_path) if resume and self.checkpoint_path else None
+        if checkpoint is not None and checkpoint.get("source") != source:
+            raise ValueError(f"Checkpoint {self.checkpoint_path} belongs to {checkpoint.get('source')}")
+        checkpoint = checkpoint or {"source": source, "format": mailbox_type, "position": None,
+                                    "processed": 0, "failed": 0}
+        resumed_from = checkpoint["position"]
+        if resumed_from is not None:
+            logger.info(f"Resuming {source} from {resumed_from} ({checkpoint['processed']} already processed)")
+
+        messages = iter_mailbox(source, resumed_from)
+        batches = iter(lambda: list(islice(messages, self.batch_size)), [])
+        intents = Counter()
+        processed = failed = 0
+        start = time.perf_counter()
+
+        for batch, results in self._run(source, batches):
+            batch_failed = sum(result.get("status") == "failed" for result in results)
+            failed += batch_failed
+            processed += len(results) - batch_failed
+            intents.update(
+                result.get("intent", "unknown") for result in results if result.get("status") != "failed"
+            )
+            checkpoint.update({
+                "position": batch[-1].resume,
+                "processed": checkpoint["processed"] + len(results) - batch_failed,
+                "failed": checkpoint["failed"] + batch_failed,
+                "updated": time.time(),
+            })
+            if self.checkpoint_path:
+                save_checkpoint(self.checkpoint_path, checkpoint)
+
+        elapsed = time.perf_counter() - start
+        count = processed + failed
+        logger.info(f"Ingested {count} messages from {source} in {elapsed:.2f}s ({failed} failed)")
+        return {
+            "source": source,
+            "format": mailbox_type,
+            "resumed_from": resumed_from,
+            "position": checkpoint["position"],
+            "messages": count,
+            "processed": processed,
+            "failed": failed,
+            "intents": dict(intents),
+            "total_processed": checkpoint["processed"],
+            "elapsed_s": round(elapsed, 3),
+            "messages_per_second": round(count / elapsed, 1) if elapsed else None,
+        }
+
+    def _run(self, source: str, batches):
+        """Yield ``(messages, results)`` per batch, in mailbox order."""
+        if self.workers == 1:
+            for batch in batches:
+                yield batch, self.process_batch(self._documents(source, batch), self.batch_size)
+            return
+
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        # Two batches per worker in flight keeps the pool busy while bounding
+        # how much of the mailbox is held in memory.
+        pending = deque()
+        try:
+            for batch in batches:
+                pending.append((batch, pool.submit(_process_in_worker, self._documents(source, batch),
+                                                   self.batch_size)))
+                if len(pending) >= 2 * self.workers:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _collect(self, batch, future):
+        results, records, documents = future.result()
+        self.classifier_agent.shared_memory.update_many(
+            {doc_id: record["data"] for doc_id, record in records.items()}
+        )
+        replay_search_documents(self.classifier_agent, documents)
+        return batch, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.mailbox_ingest",
+        description="Classify every message of an mbox file or Maildir into shared memory.",
+    )
+    parser.add_argument("path", help="mbox file or Maildir directory")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: next to the mailbox)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--batch-size", type=int, help=f"messages per batch (default {MAILBOX_BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, help=f"worker processes (default {MAILBOX_WORKERS})")
+    args = parser.parse_args(argv)
+
+    # The module-level defaults were read before .env was loaded.
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    from agents.classifier_agent import ClassifierAgent
+    from memory.result_cache import ResultCache
+    from memory.search_index import SEARCH_INDEX_DIR, SearchIndex
+    from memory.shared_memory import SharedMemory
+    from memory.template_index import TemplateIndex
+
+    search_index = SearchIndex.from_env()
+    if SEARCH_INDEX_DIR and search_index is None:
+        parser.error(f"search index {SEARCH_INDEX_DIR} is in use (by a running server?); "
+                     "ingest through POST /ingest/mailbox or stop it first")
+    shared_memory = SharedMemory.from_env()
+    classifier_agent = ClassifierAgent(shared_memory, ResultCache.from_env(shared_memory), TemplateIndex.from_env(),
+                                       search_index)
+    ingestor = MailboxIngestor(
+        classifier_agent,
+        batch_size=args.batch_size or int(os.getenv("MAILBOX_BATCH_SIZE", "0")) or MAILBOX_BATCH_SIZE,
+        workers=args.workers or int(os.getenv("MAILBOX_WORKERS", "0")) or MAILBOX_WORKERS,
+        checkpoint_path=args.checkpoint or default_checkpoint_path(args.path),
+    )
+    try:
+        summary = ingestor.ingest(args.path, resume=not args.restart)
+    finally:
+        if search_index is not None:
+            search_index.close()
+        shared_memory.close()
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger("Metrics")
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Stage name -> seconds spent in it for the document being processed; None
+# outside ``collect_timings`` (and always when metrics are disabled).
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("pipeline_timings", default=None)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1 KiB .. 256 MiB
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labels, labels)} {value:g}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _format_labels(self.labels, labels, f'le="{le}"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {total:.6f}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "docproc_stage_seconds", "Time spent in each pipeline stage.", ("stage", "file_type")))
+DOCUMENT_SECONDS = REGISTRY.register(Histogram(
+    "docproc_document_seconds", "End-to-end processing time per document.", ("file_type",)))
+DOCUMENT_BYTES = REGISTRY.register(Histogram(
+    "docproc_document_bytes", "Size of processed documents.", ("file_type",), buckets=SIZE_BUCKETS))
+DOCUMENTS = REGISTRY.register(Counter(
+    "docproc_documents_total", "Processed documents by detected intent.", ("file_type", "intent")))
+ERRORS = REGISTRY.register(Counter(
+    "docproc_errors_total", "Documents that failed or were rejected.", ("file_type", "reason")))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "docproc_cache_lookups_total", "Result cache lookups.", ("result",)))
+
+
+class _Stage:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings: Dict[str, float], name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.timings[self.name] = self.timings.get(self.name, 0.0) + elapsed
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+def timed(stage: str):
+    """Context adding its wall time to ``stage`` in the active timings.
+
+    Outside ``collect_timings`` (or with metrics disabled) this is a shared
+    no-op, so instrumented code costs one context variable lookup.
+    """
+    timings = _timings.get()
+    if timings is None:
+        return _NO_STAGE
+    return _Stage(timings, stage)
+
+
+@contextmanager
+def collect_timings(timings: Optional[Dict[str, float]] = None) -> Iterator[Optional[Dict[str, float]]]:
+    """Collect ``timed`` stages of the enclosed work into ``timings`` (a new dict by default).
+
+    Yields None when metrics are disabled. Passing the dict of an earlier
+    block resumes it. Stages may nest, so their sum can exceed the
+    ``total`` added on exit.
+    """
+    if not METRICS_ENABLED:
+        yield None
+        return
+    timings = {} if timings is None else timings
+    token = _timings.set(timings)
+    start = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+        timings["total"] = timings.get("total", 0.0) + time.perf_counter() - start
+
+
+def record_document(file_type: str, size: Optional[int], result: Dict[str, Any]):
+    """Feed one classifier result (with its ``timings``) into the metrics."""
+    if not METRICS_ENABLED:
+        return
+    timings = result.get("timings") or {}
+    for stage, seconds in timings.items():
+        if stage == "total":
+            DOCUMENT_SECONDS.observe(seconds, file_type)
+        else:
+            STAGE_SECONDS.observe(seconds, stage, file_type)
+    if size is not None:
+        DOCUMENT_BYTES.observe(size, file_type)
+    if "cache_hit" in result:
+        CACHE_LOOKUPS.inc("hit" if result["cache_hit"] else "miss")
+    if result.get("status") == "failed":
+        ERRORS.inc(file_type, "failed")
+    else:
+        DOCUMENTS.inc(file_type, result.get("intent") or "unknown")
+
+
+def record_error(file_type: str, reason: str):
+    if METRICS_ENABLED:
+        ERRORS.inc(file_type, reason)
+
+
+def attach_timings(result: Dict[str, Any], timings: Optional[Dict[str, float]]) -> Dict[str, Any]:
+    if timings is not None:
+        result["timings"] = {stage: round(seconds, 6) for stage, seconds in timings.items()}
+    return result
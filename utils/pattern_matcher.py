@@ -0,0 +1,150 @@
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger("PatternMatcher")
+
+
+class MatchResult:
+    """Hits from one scan, grouped as ``category -> label -> [(start, end), ...]``."""
+
+    def __init__(self):
+        self.hits = defaultdict(lambda: defaultdict(list))
+
+    def add(self, category: str, label: str, span: Tuple[int, int]):
+        self.hits[category][label].append(span)
+
+    def counts(self, category: str) -> Dict[str, int]:
+        return {label: len(spans) for label, spans in self.hits.get(category, {}).items()}
+
+    def count(self, category: str, label: Optional[str] = None) -> int:
+        if label is not None:
+            return len(self.hits.get(category, {}).get(label, []))
+        return sum(self.counts(category).values())
+
+    def offsets(self, category: str, label: str) -> List[Tuple[int, int]]:
+        return list(self.hits.get(category, {}).get(label, []))
+
+    def best(self, category: str, order: Iterable[str]) -> Optional[str]:
+        """Label with the most hits; ties go to the earliest label in ``order``."""
+        counts = self.counts(category)
+        if not counts:
+            return None
+        return max(order, key=lambda label: counts.get(label, 0))
+
+
+class PatternMatcher:
+    """Compiles every pattern into one alternation and scans text in a single pass.
+
+    ``patterns`` maps ``category -> label -> [regex, ...]``; ``keywords`` has
+    the same shape but holds literal substrings. Matching is case-insensitive
+    by lower-casing the text once, so regex patterns should be written in lower
+    case. Each alternative is wrapped in a lookahead so hits from different
+    categories may overlap (``Dear Invoice Team`` counts as both a signature
+    and an invoice hit).
+
+    Alternatives are grouped by their first literal character behind a
+    character-class guard, so positions that cannot start any pattern are
+    skipped without trying every branch. The alternation stops at the first
+    pattern that matches, so at each hit the patterns that could start at
+    the same position are tried together once more and every one that
+    matches is counted.
+    """
+
+    def __init__(self, patterns: Dict[str, Dict[str, List[str]]] = None,
+                 keywords: Dict[str, Dict[str, List[str]]] = None,
+                 flags: int = re.MULTILINE):
+        self.groups = {}
+
+        entries = [(category, label, pattern)
+                   for category, labels in (patterns or {}).items()
+                   for label, pats in labels.items()
+                   for pattern in pats]
+        entries += [(category, label, re.escape(keyword.lower()))
+                    for category, labels in (keywords or {}).items()
+                    for label, words in labels.items()
+                    for keyword in words]
+
+        by_first_char = defaultdict(list)
+        for index, (category, label, pattern) in enumerate(entries):
+            group = f"p{index}"
+            self.groups[group] = (category, label)
+            by_first_char[self._first_char(pattern)].append((group, pattern))
+
+        self.regex = self._compile(by_first_char, flags) if entries else None
+        self.siblings = self._compile_siblings(by_first_char, flags)
+        # str.lower() can change the length of a few characters (e.g. "\u0130"),
+        # which would shift offsets; such text is scanned case-insensitively.
+        self.regex_ignorecase = (
+            self._compile(by_first_char, flags | re.IGNORECASE) if entries else None
+        )
+        self.siblings_ignorecase = self._compile_siblings(by_first_char, flags | re.IGNORECASE)
+
+    @staticmethod
+    def _first_char(pattern: str) -> Optional[str]:
+        """The literal character every match must start with, if obvious."""
+        if "|" in pattern:
+            return None
+        while pattern.startswith(("^", r"\b")):
+            pattern = pattern[1:] if pattern[0] == "^" else pattern[2:]
+        if len(pattern) > 1 and pattern[1] in "?*{":
+            return None
+        if pattern[:1].isalnum():
+            return pattern[0]
+        if pattern[:1] == "\\" and pattern[1:2] and not pattern[1].isalnum():
+            return pattern[1]
+        return None
+
+    @staticmethod
+    def _compile(by_first_char, flags):
+        branches = []
+        for char, alternatives in by_first_char.items():
+            body = "|".join(f"(?=(?P<{group}>{pattern}))" for group, pattern in alternatives)
+            branches.append(body if char is None else f"(?={re.escape(char)})(?:{body})")
+        regex = "|".join(branches)
+        if None not in by_first_char:
+            guard = "".join(re.escape(char) for char in sorted(by_first_char))
+            regex = f"(?=[{guard}])(?:{regex})"
+        return re.compile(regex, flags)
+
+    @staticmethod
+    def _compile_siblings(by_first_char, flags):
+        """Per first character, one regex trying every pattern that may start there.
+
+        Each pattern is an optional lookahead, so a single ``match`` at a hit
+        position sets the group of every pattern matching at it. Characters
+        only one pattern can start with map to None: the hit is all there is.
+        """
+        shared = by_first_char.get(None, [])
+        siblings = {}
+        for char, alternatives in by_first_char.items():
+            candidates = alternatives + (shared if char is not None else [])
+            siblings[char] = re.compile(
+                "".join(f"(?:(?=(?P<{group}>{pattern})))?" for group, pattern in candidates), flags
+            ) if len(candidates) > 1 else None
+        return siblings
+
+    def scan(self, text: str) -> MatchResult:
+        result = MatchResult()
+        if self.regex is None or not text:
+            return result
+
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            regex, siblings, source = self.regex, self.siblings, lowered
+        else:
+            regex, siblings, source = self.regex_ignorecase, self.siblings_ignorecase, text
+
+        for match in regex.finditer(source):
+            position = match.start()
+            sibling = siblings.get(source[position].lower(), siblings.get(None))
+            found = sibling.match(source, position) if sibling is not None else None
+            if found is None or found.lastgroup is None:
+                # Only the hit itself (or a case-folding mismatch, e.g. "\u0130").
+                found = match
+            for group, value in found.groupdict().items():
+                if value is not None:
+                    category, label = self.groups[group]
+                    result.add(category, label, found.span(group))
+        return result
@@ -1,17 +1,137 @@
 from PyPDF2 import PdfReader
-from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple, Union
+import mmap
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
 import logging
 
+from utils.file_utils import Content, open_content
+
 logger = logging.getLogger("PDFParser")
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
+# Pages are joined with a form feed; the trailing newline keeps ``^``
+# anchors in MULTILINE patterns matching at the start of every page.
+PAGE_SEPARATOR = "\f\n"
+
+# Documents with fewer pages than this are extracted serially: below it the
+# cost of handing the file to worker processes outweighs the parallel gain.
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def open_pdf(pdf: Union[Content, PdfReader]) -> PdfReader:
+    """Reader over bytes, an open binary handle or a path, without copying the file."""
+    if isinstance(pdf, PdfReader):
+        return pdf
     try:
-        pdf_file = BytesIO(pdf_bytes)
-        reader = PdfReader(pdf_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text.strip()
+        if isinstance(pdf, os.PathLike):
+            # PdfReader(path) would read the whole file into memory.
+            with open(pdf, "rb") as fh:
+                return PdfReader(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ))
+        with open_content(pdf) as fh:
+            return PdfReader(fh)
     except Exception as e:
         logger.error(f"Failed to parse PDF: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+def _page_text(reader: PdfReader, number: int) -> Optional[str]:
+    """Text of one page, or None when the page cannot be decoded."""
+    try:
+        return (reader.pages[number].extract_text() or "").strip()
+    except Exception as e:
+        logger.error(f"Failed to parse PDF page {number + 1}: {str(e)}")
+        return None
+
+
+def iter_pdf_pages(pdf: Union[Content, PdfReader], start: int = 0) -> Iterator[str]:
+    """Yield the text of each page as it is decoded; broken pages yield ``""``."""
+    reader = open_pdf(pdf)
+    for number in range(start, len(reader.pages)):
+        yield _page_text(reader, number) or ""
+
+
+def _extract_range(path: str, start: int, stop: int) -> List[Optional[str]]:
+    # Runs in a pool worker: every worker maps the same temp file read-only,
+    # so the document is never copied into each process.
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        reader = PdfReader(mapped)
+        return [_page_text(reader, number) for number in range(start, stop)]
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def extract_pages(pdf: Union[Content, PdfReader], start: int = 0, workers: Optional[int] = None,
+                  reader: Optional[PdfReader] = None) -> Tuple[List[str], List[int]]:
+    """Text of pages ``start..end`` in order, plus the numbers of pages that failed.
+
+    Documents with at least ``PARALLEL_MIN_PAGES`` remaining pages are split
+    into contiguous page ranges extracted by a process pool. ``reader`` is
+    one the caller already opened over ``pdf``; it saves parsing the
+    document again (pool workers still open their own copy).
+    """
+    reader = reader or open_pdf(pdf)
+    total = len(reader.pages)
+    workers = workers or PDF_WORKERS
+
+    if workers < 2 or total - start < PARALLEL_MIN_PAGES or isinstance(pdf, PdfReader):
+        texts = [_page_text(reader, number) for number in range(start, total)]
+    else:
+        texts = _extract_parallel(pdf, start, total, workers)
+
+    failed = [start + offset + 1 for offset, text in enumerate(texts) if text is None]
+    return [text or "" for text in texts], failed
+
+
+def _extract_parallel(pdf: Content, start: int, stop: int, workers: int) -> List[Optional[str]]:
+    # A few ranges per worker keeps the pool busy when some pages are slower.
+    chunks = workers * 4
+    step = max(-(-(stop - start) // chunks), 1)
+    ranges = [(first, min(first + step, stop)) for first in range(start, stop, step)]
+
+    if isinstance(pdf, os.PathLike):
+        path, owned = os.fspath(pdf), False
+    else:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as fh, open_content(pdf) as source:
+            shutil.copyfileobj(source, fh, 1024 * 1024)
+        path, owned = fh.name, True
+    try:
+        pool = _get_pool(workers)
+        futures = [pool.submit(_extract_range, path, first, last) for first, last in ranges]
+        texts = []
+        for (first, last), future in zip(ranges, futures):
+            try:
+                texts.extend(future.result())
+            except Exception as e:
+                logger.error(f"Failed to parse PDF pages {first + 1}-{last}: {str(e)}")
+                texts.extend([None] * (last - first))
+        return texts
+    finally:
+        if owned:
+            os.unlink(path)
+
+
+def extract_text_from_pdf(pdf: Content, workers: Optional[int] = None) -> str:
+    pages, _ = extract_pages(pdf, workers=workers)
+    return PAGE_SEPARATOR.join(pages)
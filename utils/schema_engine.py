@@ -0,0 +1,254 @@
+import json
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+logger = logging.getLogger("SchemaEngine")
+
+# JSON type names usable in a schema's "types" map. Decoded JSON values are
+# exact built-in types, so membership by ``type()`` is enough (and keeps
+# booleans from passing as numbers).
+JSON_TYPES = {
+    "string": (str,),
+    "number": (int, float),
+    "integer": (int,),
+    "boolean": (bool,),
+    "array": (list,),
+    "object": (dict,),
+    "null": (type(None),),
+}
+
+_MISSING = object()
+
+# Batch masks of records no schema applies to.
+NOT_AN_OBJECT = -1
+UNKNOWN_RECORD = -2
+
+
+class CompiledSchema:
+    """One target schema, compiled once into bit positions and frozensets.
+
+    ``spec`` has ``required`` and ``optional`` field lists, an optional
+    ``types`` map of field -> JSON type name (or list of names) and an
+    optional ``discriminator`` key whose presence identifies a record of
+    this kind (the first required field by default).
+
+    A record's validation is an int bitmask: bit ``i`` is set when
+    ``required[i]`` is missing, the next bits flag typed fields holding the
+    wrong type and the top bit flags unexpected fields.
+    """
+
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        self.name = name
+        self.required = tuple(spec.get("required", ()))
+        self.optional = tuple(spec.get("optional", ()))
+        self.required_set = frozenset(self.required)
+        self.allowed = frozenset(self.required + self.optional)
+        self.discriminator = spec.get("discriminator") or (self.required[0] if self.required else None)
+
+        self.required_bits = [(1 << i, field) for i, field in enumerate(self.required)]
+        self.typed = []
+        for field, names in (spec.get("types") or {}).items():
+            names = [names] if isinstance(names, str) else names
+            unknown = [name for name in names if name not in JSON_TYPES]
+            if unknown:
+                raise ValueError(f"Schema '{name}': unknown type {unknown[0]!r} for field '{field}'")
+            types = frozenset(t for type_name in names for t in JSON_TYPES[type_name])
+            self.typed.append((1 << (len(self.required) + len(self.typed)), field, types, names))
+        self.unexpected_bit = 1 << (len(self.required) + len(self.typed))
+        # Unexpected fields are reported as anomalies but do not invalidate.
+        self.invalid_mask = self.unexpected_bit - 1
+        self.mask = self._compile_mask()
+
+    def _compile_mask(self):
+        """Generate ``mask(record) -> int`` with every check unrolled.
+
+        Plain ``in``/``type()`` tests on literal field names are several
+        times faster than looping over the schema for each record.
+        """
+        for field in self.allowed | {field for _, field, _, _ in self.typed}:
+            if not isinstance(field, str):
+                raise ValueError(f"Schema '{self.name}': field names must be strings, got {field!r}")
+
+        namespace = {"_MISSING": _MISSING, "_ALLOWED": self.allowed}
+        lines = ["def mask(record):", "    mask = 0"]
+        for bit, field in self.required_bits:
+            lines.append(f"    if {field!r} not in record: mask |= {bit}")
+        for number, (bit, field, types, _) in enumerate(self.typed):
+            namespace[f"_TYPES{number}"] = types
+            lines.append(f"    value = record.get({field!r}, _MISSING)")
+            lines.append(f"    if value is not _MISSING and type(value) not in _TYPES{number}: mask |= {bit}")
+        lines.append(f"    if not _ALLOWED.issuperset(record): mask |= {self.unexpected_bit}")
+        lines.append("    return mask")
+        exec("\n".join(lines), namespace)
+        return namespace["mask"]
+
+    def describe(self, mask: int, record: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Expand a bitmask into the ``is_valid``/``missing_fields``/``anomalies`` summary."""
+        if not mask:
+            return {"is_valid": True, "missing_fields": [], "anomalies": []}
+        anomalies = [
+            f"Expected {' or '.join(names)} for field: {field}"
+            for bit, field, _, names in self.typed if mask & bit
+        ]
+        if mask & self.unexpected_bit:
+            if record is None:
+                anomalies.append("Unexpected fields")
+            else:
+                anomalies.extend(f"Unexpected field: {field}" for field in record if field not in self.allowed)
+        return {
+            "is_valid": not mask & self.invalid_mask,
+            "missing_fields": [field for bit, field in self.required_bits if mask & bit],
+            "anomalies": anomalies,
+        }
+
+    def validate(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return self.describe(self.mask(record), record)
+
+
+def _unrecognized(anomaly: str) -> Dict[str, Any]:
+    return {"is_valid": False, "missing_fields": [], "anomalies": [anomaly]}
+
+
+class BatchValidation:
+    """Result of ``SchemaEngine.validate_batch``: one schema and bitmask per record.
+
+    ``schemas[i]`` is None for records no schema recognises; ``masks[i]`` is
+    then ``NOT_AN_OBJECT`` or ``UNKNOWN_RECORD``. A zero mask is a valid
+    record without anomalies.
+    """
+
+    def __init__(self, schemas: List[Optional[CompiledSchema]], masks: List[int]):
+        self.schemas = schemas
+        self.masks = masks
+
+    def __len__(self):
+        return len(self.masks)
+
+    def intent(self, index: int) -> str:
+        schema = self.schemas[index]
+        return schema.name if schema is not None else "unknown"
+
+    def is_valid(self, index: int) -> bool:
+        schema = self.schemas[index]
+        return schema is not None and not self.masks[index] & schema.invalid_mask
+
+    def describe(self, index: int, record: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        schema = self.schemas[index]
+        if schema is None:
+            return _unrecognized(
+                "Record is not an object" if self.masks[index] == NOT_AN_OBJECT else "Unknown record type"
+            )
+        return schema.describe(self.masks[index], record)
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts per intent, valid/invalid totals and missing-field histograms.
+
+        Records sharing a schema and mask are decoded once.
+        """
+        intents, missing_fields = Counter(), {}
+        valid = 0
+        for (schema, mask), count in Counter(zip(self.schemas, self.masks)).items():
+            name = schema.name if schema is not None else "unknown"
+            intents[name] += count
+            if schema is None:
+                continue
+            if not mask & schema.invalid_mask:
+                valid += count
+            for bit, field in schema.required_bits:
+                if mask & bit:
+                    histogram = missing_fields.setdefault(name, {})
+                    histogram[field] = histogram.get(field, 0) + count
+        return {
+            "records": len(self.masks),
+            "valid": valid,
+            "invalid": len(self.masks) - valid,
+            "intents": dict(intents),
+            "missing_fields": missing_fields,
+        }
+
+
+class SchemaEngine:
+    """Compiled target schemas with discriminator-based intent detection."""
+
+    def __init__(self, schemas: Dict[str, Dict[str, Any]]):
+        self.schemas = {name: CompiledSchema(name, spec) for name, spec in schemas.items()}
+        # Checked in schema order, so earlier schemas win when a record
+        # carries several discriminators.
+        self._discriminators = [
+            (schema.discriminator, schema) for schema in self.schemas.values() if schema.discriminator
+        ]
+        self._classify, self._validate_into = self._compile_dispatch()
+
+    def _compile_dispatch(self):
+        """Generate ``classify(record) -> (schema, mask)`` and the batch loop,
+        both with the discriminator dispatch unrolled."""
+        namespace = {"NOT_AN_OBJECT": NOT_AN_OBJECT, "UNKNOWN_RECORD": UNKNOWN_RECORD}
+        single = [
+            "def classify(record):",
+            "    if not isinstance(record, dict):",
+            "        return None, NOT_AN_OBJECT",
+        ]
+        batch = [
+            "def validate_into(records, schemas, masks):",
+            "    add_schema, add_mask = schemas.append, masks.append",
+            "    for record in records:",
+            "        if type(record) is not dict:",
+            "            add_schema(None)",
+            "            add_mask(NOT_AN_OBJECT)",
+        ]
+        for number, (key, schema) in enumerate(self._discriminators):
+            if not isinstance(key, str):
+                raise ValueError(f"Schema '{schema.name}': discriminator must be a string, got {key!r}")
+            namespace[f"_SCHEMA{number}"] = schema
+            namespace[f"_MASK{number}"] = schema.mask
+            single += [
+                f"    if {key!r} in record:",
+                f"        return _SCHEMA{number}, _MASK{number}(record)",
+            ]
+            batch += [
+                f"        elif {key!r} in record:",
+                f"            add_schema(_SCHEMA{number})",
+                f"            add_mask(_MASK{number}(record))",
+            ]
+        single.append("    return None, UNKNOWN_RECORD")
+        batch += [
+            "        else:",
+            "            add_schema(None)",
+            "            add_mask(UNKNOWN_RECORD)",
+        ]
+        exec("\n".join(single), namespace)
+        exec("\n".join(batch), namespace)
+        return namespace["classify"], namespace["validate_into"]
+
+    @staticmethod
+    def load_specs(path: Optional[str]) -> Dict[str, Dict[str, Any]]:
+        """Schema specs from a JSON file mapping schema name to spec."""
+        if not path:
+            return {}
+        with open(path, encoding="utf-8") as fh:
+            specs = json.load(fh)
+        logger.info(f"Loaded {len(specs)} schemas from {path}")
+        return specs
+
+    def detect(self, record: Dict[str, Any]) -> Optional[CompiledSchema]:
+        for key, schema in self._discriminators:
+            if key in record:
+                return schema
+        return None
+
+    def validate(self, record: Any) -> Dict[str, Any]:
+        """``intent`` plus the ``is_valid``/``missing_fields``/``anomalies`` summary."""
+        schema, mask = self._classify(record)
+        if schema is None:
+            anomaly = "Record is not an object" if mask == NOT_AN_OBJECT else "Unknown record type"
+            return {"intent": "unknown", **_unrecognized(anomaly)}
+        if not mask:
+            return {"intent": schema.name, "is_valid": True, "missing_fields": [], "anomalies": []}
+        return {"intent": schema.name, **schema.describe(mask, record)}
+
+    def validate_batch(self, records: Iterable[Any]) -> BatchValidation:
+        """Detect and validate every record in one pass; see ``BatchValidation``."""
+        schemas, masks = [], []
+        self._validate_into(records, schemas, masks)
+        return BatchValidation(schemas, masks)
@@ -0,0 +1,31 @@
+from typing import Iterator
+
+# Preferred cut points, best first: page break (PDF pages are joined with a
+# form feed), paragraph, line, word.
+_BOUNDARIES = ("\f\n", "\f", "\n\n", "\n", " ")
+
+
+def iter_chunks(text: str, max_chars: int) -> Iterator[str]:
+    """Split ``text`` into chunks of at most ``max_chars`` characters.
+
+    Each chunk ends at the last page break in its window, else the last
+    paragraph, line or word break, as long as that keeps it at least half
+    full; a run without any of them is cut hard. Chunks are produced
+    lazily and whitespace-only chunks are skipped.
+    """
+    if max_chars <= 0:
+        raise ValueError("max_chars must be positive")
+    start, length = 0, len(text)
+    while start < length:
+        end = start + max_chars
+        if end < length:
+            floor = start + max_chars // 2
+            for boundary in _BOUNDARIES:
+                cut = text.rfind(boundary, floor, end)
+                if cut != -1:
+                    end = cut + len(boundary)
+                    break
+        chunk = text[start:end]
+        if not chunk.isspace():
+            yield chunk
+        start = end
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Optional
+from fastapi import HTTPException
+
+# Uploads are spooled to disk by the multipart parser; this caps the request
+# body so oversized files are refused before they are read at all.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+
+
+def persist_upload(fileobj: BinaryIO, directory: Optional[str] = None) -> Path:
+    """Copy a spooled upload to a named temp file (in chunks) and return its path.
+
+    Worker processes cannot share an open handle, so they get the path.
+    The caller deletes the file when done.
+    """
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="upload-", dir=directory, delete=False) as fh:
+        shutil.copyfileobj(fileobj, fh, 1024 * 1024)
+    return Path(fh.name)
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=413, detail=f"Upload exceeds the {max_bytes} byte limit")
+
+
+class UploadLimitMiddleware:
+    """Refuse request bodies larger than ``max_bytes`` with 413.
+
+    A declared Content-Length over the limit is rejected before any of the
+    body is read; otherwise bytes are counted as they stream in and the
+    request is cut off as soon as the limit is crossed.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.max_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside body parsing, which turns it into the 413.
+                    raise UploadTooLarge(self.max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, send):
+        body = f'{{"detail":"Upload exceeds the {self.max_bytes} byte limit"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -2,27 +2,68 @@ import streamlit as st
 import requests
 import os
 import json
-from io import BytesIO
+import time
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+# (connect, read) seconds for each HTTP call; the job itself may run longer.
+REQUEST_TIMEOUT = (5, 30)
+JOB_TIMEOUT = float(os.getenv("UI_JOB_TIMEOUT", "600"))
+POLL_INTERVAL = 1.0
 
 st.set_page_config(page_title="Document Processor", layout="wide")
 st.title("Multi-Agent Document Processor")
 
-def process_file(uploaded_file):
+
+def submit_job(uploaded_file):
+    """Queue the upload with ``POST /jobs``; returns the job or None after reporting why."""
     try:
-        file_bytes = uploaded_file.read()
-        file_for_upload = (uploaded_file.name, BytesIO(file_bytes))
         response = requests.post(
-            "http://localhost:8000/process",
-            files={"file": file_for_upload}
+            f"{API_URL}/jobs",
+            files={"file": (uploaded_file.name, uploaded_file.getvalue())},
+            timeout=REQUEST_TIMEOUT
         )
-        return response
-    except Exception as e:
-        st.error(f"File processing error: {str(e)}")
+    except requests.Timeout:
+        st.error("The server did not respond in time. Try again later.")
+        return None
+    except requests.RequestException as e:
+        st.error(f"Could not reach the server: {str(e)}")
+        return None
+
+    if response.status_code in (429, 503):
+        retry_after = response.headers.get("Retry-After", "a few")
+        st.warning(f"The server is busy. Retry in {retry_after} seconds.")
         return None
+    if response.status_code != 202:
+        try:
+            detail = response.json().get("detail", response.status_code)
+        except ValueError:
+            detail = response.status_code
+        st.error(f"Upload rejected: {detail}")
+        return None
+    return response.json()
+
+
+def wait_for_job(job_id):
+    """Poll ``GET /jobs/{id}`` until the job finishes or ``JOB_TIMEOUT`` passes."""
+    deadline = time.monotonic() + JOB_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            response = requests.get(f"{API_URL}/jobs/{job_id}", timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            st.error(f"Lost contact with the server: {str(e)}")
+            return None
+        job = response.json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(POLL_INTERVAL)
+    st.error(f"Still processing after {JOB_TIMEOUT:.0f}s; check back later with job id {job_id}.")
+    return None
+
 
 uploaded_file = st.file_uploader(
     "Choose a document file",
-    type=["pdf", "json", "eml", "txt"],
+    type=["pdf", "json", "ndjson", "jsonl", "eml", "txt"],
     accept_multiple_files=False
 )
 
@@ -31,15 +72,17 @@ if uploaded_file:
 
     if st.button("Process Document"):
         with st.spinner("Processing..."):
-            response = process_file(uploaded_file)
+            job = submit_job(uploaded_file)
+            if job:
+                job = wait_for_job(job["job_id"])
 
-            if response and response.status_code == 200:
-                result = response.json()
+            if job and job["status"] == "done":
+                result = job["result"]
                 st.session_state.result = result
                 st.success("Processing successful!")
                 st.json(result)
-            else:
-                st.error("Processing failed. See server logs for details.")
+            elif job:
+                st.error(f"Processing failed: {job.get('error', 'see server logs for details')}")
 
 if 'result' in st.session_state:
     st.download_button(